@@ -0,0 +1,113 @@
+"""API latency benchmarks on a realistically sized database.
+
+Not part of the regular test run. Run with:
+
+    python manage.py test api.benchmarks
+
+API_BENCH_TEACHERS teachers with API_BENCH_EVENTS events each (default 20
+and 2000) are seeded once, then every operation runs API_BENCH_ROUNDS times
+through the test client. Each one reports mean/p50/p95 latency and queries
+per request. Query budgets are enforced by api.tests, this shows where the
+time goes. API_BENCH_OUTPUT writes the results to a JSON file for comparing runs.
+"""
+import json
+import os
+import statistics
+import time
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+from planner.models import Group, Subject
+from planner.testing import EVENT_DURATION, first_seed_day, free_slot, seed_teachers
+from users.tokens import CachedRefreshToken
+
+
+def bench_setting(name, default):
+    return int(os.getenv(f'API_BENCH_{name}', default))
+
+
+@override_settings(AUTH_USER_CACHE_BACKEND='memory', AUTH_TOKEN_BLACKLIST_CACHE=False)
+class ApiLatencyBenchmark(TestCase):
+    results = []
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teachers_count = bench_setting('TEACHERS', 20)
+        cls.events_count = bench_setting('EVENTS', 2000)
+        cls.user = seed_teachers(cls.teachers_count, events=cls.events_count)[0]
+        cls.group = Group.objects.filter(user=cls.user).first()
+        cls.subject = Subject.objects.filter(user=cls.user).first()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        header = f"{'operation':<24}{'rounds':>8}{'mean, ms':>10}{'p50, ms':>10}{'p95, ms':>10}{'queries':>9}"
+        print('\n' + header + '\n' + '-' * len(header))
+        for row in cls.results:
+            print(f"{row['operation']:<24}{row['rounds']:>8}{row['mean'] * 1000:>10.2f}"
+                  f"{row['p50'] * 1000:>10.2f}{row['p95'] * 1000:>10.2f}{row['queries']:>9}")
+        output = os.getenv('API_BENCH_OUTPUT')
+        if output:
+            with open(output, 'w') as f:
+                json.dump(cls.results, f, indent=2)
+
+    def setUp(self):
+        self.rounds = bench_setting('ROUNDS', 50)
+        self.client.cookies['access_token'] = str(AccessToken.for_user(self.user))
+
+    def measure(self, operation, request, prepare=None):
+        """Runs request() self.rounds times, prepare(i) before each round is not timed."""
+        timings = []
+        queries = 0
+        for i in range(self.rounds):
+            args = prepare(i) if prepare else ()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = request(*args)
+                timings.append(time.perf_counter() - started)
+            self.assertLess(response.status_code, 300, getattr(response, 'data', response.content))
+            queries = len(captured)
+        timings.sort()
+        self.results.append({
+            'operation': operation,
+            'rounds': self.rounds,
+            'teachers': self.teachers_count,
+            'events_per_teacher': self.events_count,
+            'mean': statistics.fmean(timings),
+            'p50': statistics.median(timings),
+            'p95': timings[max(0, int(len(timings) * 0.95) - 1)],
+            'queries': queries,
+        })
+
+    def test_reads(self):
+        month_start = first_seed_day()
+        month_range = {'start': month_start.isoformat(), 'end': (month_start + EVENT_DURATION * 480).isoformat()}
+        self.measure('events list', lambda: self.client.get('/api/events/'))
+        self.measure('events by date range', lambda: self.client.get('/api/events/by-date-range/', month_range))
+        self.measure('stats by month', lambda: self.client.get(
+            '/api/stats/by_month/', {'month': month_start.month, 'year': month_start.year}
+        ))
+        self.measure('bootstrap', lambda: self.client.get('/api/bootstrap/'))
+        self.measure('current user', lambda: self.client.get('/api/auth/user/'))
+
+    def test_event_create(self):
+        def event_data(i):
+            start = free_slot(i)
+            return ({
+                'title': 'Lecture', 'group': self.group.id, 'subject': self.subject.id, 'type': 'lecture',
+                'start': start.isoformat(), 'end': (start + EVENT_DURATION).isoformat(),
+            },)
+
+        self.measure(
+            'event create', lambda data: self.client.post('/api/events/', data, content_type='application/json'),
+            prepare=event_data,
+        )
+
+    def test_auth_refresh(self):
+        def new_refresh_token(i):
+            # Ротация заносит прошлый токен в blacklist, каждому раунду нужен свой
+            self.client.cookies['refresh_token'] = str(CachedRefreshToken.for_user(self.user))
+            return ()
+
+        self.measure('auth refresh', lambda: self.client.post('/api/auth/refresh/'), prepare=new_refresh_token)
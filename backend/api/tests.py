@@ -1,3 +1,176 @@
-from django.test import TestCase
+from datetime import timedelta
+from importlib import import_module
+from unittest import mock
+from allauth.socialaccount.models import SocialApp
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver
+from rest_framework_simplejwt.tokens import AccessToken
+from planner.models import Event, Group, Plan, Subject
+from planner.testing import EVENT_DURATION, first_seed_day, free_slot, seed_teachers
+from users.tokens import CachedRefreshToken
 
-# Create your tests here.
+# Запросов к БД на запрос к API, с аутентификацией (кеш пользователей выключен: +1 запрос).
+# Новый эндпоинт в planner.urls или users.urls должен появиться здесь
+QUERY_BUDGETS = {
+    ('api-root', 'GET'): 1,
+    ('subject-list', 'GET'): 3,
+    ('subject-list', 'POST'): 2,
+    ('subject-detail', 'GET'): 2,
+    ('subject-detail', 'PATCH'): 3,
+    ('group-list', 'GET'): 3,
+    ('group-list', 'POST'): 2,
+    ('group-detail', 'GET'): 2,
+    ('group-detail', 'PATCH'): 3,
+    ('plan-list', 'GET'): 3,
+    ('plan-list', 'POST'): 4,
+    ('plan-detail', 'GET'): 2,
+    ('plan-detail', 'PATCH'): 5,
+    ('event-list', 'GET'): 3,
+    ('event-list', 'POST'): 10,
+    ('event-detail', 'GET'): 2,
+    ('event-detail', 'PATCH'): 12,
+    ('event-detail', 'DELETE'): 4,
+    ('event-by-date-range', 'GET'): 2,
+    ('stat-list', 'GET'): 2,
+    ('stat-by-month', 'GET'): 2,
+    ('bootstrap', 'GET'): 6,
+    ('analytics-load', 'GET'): 7,
+    ('schedule-preview', 'POST'): 4,
+    ('schedule-commit', 'POST'): 7,
+    ('get_user', 'GET'): 1,
+    ('refresh_token', 'POST'): 12,
+    ('logout', 'POST'): 8,
+    ('google_login', 'POST'): 14,
+}
+
+
+def route_names(urlconf):
+    names = set()
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns)
+            elif pattern.name:
+                names.add(pattern.name)
+
+    walk(import_module(urlconf).urlpatterns)
+    return names
+
+
+@override_settings(AUTH_USER_CACHE_BACKEND='off', AUTH_TOKEN_BLACKLIST_CACHE=False)
+class QueryBudgetTests(TestCase):
+    """Every endpoint of planner.urls and users.urls stays within QUERY_BUDGETS.
+
+    Several teachers with a thousand events each: a query per row (N+1) or
+    per event in validation blows the budget.
+    """
+    TEACHERS = 3
+    EVENTS = 1000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_teachers(cls.TEACHERS, events=cls.EVENTS)[0]
+        cls.subject = Subject.objects.filter(user=cls.user).first()
+        cls.group = Group.objects.filter(user=cls.user).first()
+        cls.plan = Plan.objects.get(user=cls.user, group=cls.group, subject=cls.subject)
+        cls.event = Event.objects.filter(user=cls.user, group=cls.group).first()
+
+    def setUp(self):
+        self.client.cookies['access_token'] = str(AccessToken.for_user(self.user))
+
+    def assertWithinBudget(self, name, method, path, data=None):
+        budget = QUERY_BUDGETS[(name, method)]
+        request = getattr(self.client, method.lower())
+        with CaptureQueriesContext(connection) as queries:
+            response = request(path, data, content_type='application/json') if method != 'GET' else request(path, data)
+        self.assertLess(response.status_code, 300, getattr(response, 'data', response.content))
+        sql = '\n'.join(query['sql'] for query in queries.captured_queries)
+        self.assertLessEqual(len(queries), budget, f'{method} {path}: {len(queries)} queries\n{sql}')
+
+    def event_data(self, index):
+        start = free_slot(index)
+        return {
+            'title': 'New lecture', 'group': self.group.id, 'subject': self.subject.id, 'type': 'lecture',
+            'start': start.isoformat(), 'end': (start + EVENT_DURATION).isoformat(),
+        }
+
+    def schedule_params(self):
+        first_day = free_slot(10).date()
+        return {
+            'start_date': first_day.isoformat(), 'end_date': (first_day + timedelta(days=30)).isoformat(),
+            'slots': ['20:40'], 'plans': [self.plan.id],
+        }
+
+    def test_every_endpoint_has_a_budget(self):
+        budgeted = {name for name, _ in QUERY_BUDGETS}
+        for urlconf in ('planner.urls', 'users.urls'):
+            self.assertEqual(route_names(urlconf) - budgeted, set(), urlconf)
+
+    def test_planner_reads(self):
+        month_start = first_seed_day()
+        cases = [
+            ('api-root', '/api/', None),
+            ('subject-list', '/api/subjects/', None),
+            ('subject-detail', f'/api/subjects/{self.subject.id}/', None),
+            ('group-list', '/api/groups/', None),
+            ('group-detail', f'/api/groups/{self.group.id}/', None),
+            ('plan-list', '/api/plans/', None),
+            ('plan-detail', f'/api/plans/{self.plan.id}/', None),
+            ('event-list', '/api/events/', None),
+            ('event-detail', f'/api/events/{self.event.id}/', None),
+            ('event-by-date-range', '/api/events/by-date-range/', {
+                'start': month_start.isoformat(), 'end': (month_start + EVENT_DURATION * 500).isoformat(),
+            }),
+            ('stat-list', '/api/stats/', None),
+            ('stat-by-month', '/api/stats/by_month/', {'month': month_start.month, 'year': month_start.year}),
+            ('bootstrap', '/api/bootstrap/', None),
+        ]
+        for name, path, params in cases:
+            with self.subTest(name):
+                self.assertWithinBudget(name, 'GET', path, params)
+
+    def test_planner_writes(self):
+        cases = [
+            ('subject-list', 'POST', '/api/subjects/', {'name': 'Physics'}),
+            ('subject-detail', 'PATCH', f'/api/subjects/{self.subject.id}/', {'description': 'Updated'}),
+            ('group-list', 'POST', '/api/groups/', {'name': 'IT-99', 'color': '#112233'}),
+            ('group-detail', 'PATCH', f'/api/groups/{self.group.id}/', {'description': 'Updated'}),
+            ('plan-list', 'POST', '/api/plans/', {
+                'name': 'Physics plan', 'group': self.group.id,
+                'subject': Subject.objects.exclude(pk=self.subject.pk).filter(user=self.user).first().id,
+            }),
+            ('plan-detail', 'PATCH', f'/api/plans/{self.plan.id}/', {'lecture_hours': 5000}),
+            ('event-list', 'POST', '/api/events/', self.event_data(0)),
+            ('event-detail', 'PATCH', f'/api/events/{self.event.id}/', self.event_data(1)),
+            ('event-detail', 'DELETE', f'/api/events/{self.event.id}/', None),
+            ('schedule-preview', 'POST', '/api/schedule/preview/', self.schedule_params()),
+            ('schedule-commit', 'POST', '/api/schedule/commit/', self.schedule_params()),
+        ]
+        for name, method, path, data in cases:
+            with self.subTest(name, method=method):
+                self.assertWithinBudget(name, method, path, data)
+
+    def test_staff_endpoints(self):
+        staff = get_user_model().objects.create(username='head@example.com', email='head@example.com', is_staff=True)
+        self.client.cookies['access_token'] = str(AccessToken.for_user(staff))
+        self.assertWithinBudget('analytics-load', 'GET', '/api/analytics/load/')
+
+    def test_users_endpoints(self):
+        SocialApp.objects.create(provider='google', name='Google', client_id='id', secret='secret')
+        self.assertWithinBudget('get_user', 'GET', '/api/auth/user/')
+
+        self.client.cookies['refresh_token'] = str(CachedRefreshToken.for_user(self.user))
+        self.assertWithinBudget('refresh_token', 'POST', '/api/auth/refresh/')
+        self.assertWithinBudget('logout', 'POST', '/api/auth/logout/')
+        self.client.cookies.clear()
+
+        with mock.patch('users.views.auth._handle_google_tokens_exchange') as exchange, \
+                mock.patch('users.views.auth._handle_user_info_from_id_token') as idinfo, \
+                mock.patch('users.views.auth.create_google_calendar_task.delay'):
+            exchange.return_value = {'access_token': 'a', 'refresh_token': 'r', 'id_token': 'i', 'expires_in': 3600}
+            idinfo.return_value = {'email': self.user.email, 'sub': '1', 'name': 'Teacher'}
+            self.assertWithinBudget('google_login', 'POST', '/api/auth/google/', {'code': 'code'})
@@ -2,6 +2,7 @@ from django.urls import path, include
 
 urlpatterns = [
     path('auth/', include('users.urls')),
+    path('sync/', include('googlecalendar.urls')),
     path('', include('planner.urls')),
     path('health/', include('health_check.urls')),
 ]
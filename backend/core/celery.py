@@ -8,11 +8,26 @@ app = Celery('core')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
+# task_prerun/task_postrun профилирования (PROFILING_ENABLED)
+import core.profiling  # noqa: E402,F401
+
 CELERY_BEAT_SCHEDULE = {
     'sync-google-calendars-every-minute': {
         'task': 'googlecalendar.tasks.periodic_full_sync',
         'schedule': crontab(),  # каждую минуту #'schedule': 120 600  - 10 мин
     }, 
+    'prune-google-sync-runs-daily': {
+        'task': 'googlecalendar.tasks.prune_sync_runs',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'prune-expired-refresh-tokens-daily': {
+        'task': 'users.tasks.prune_expired_tokens',
+        'schedule': crontab(hour=4, minute=0),
+    },
+    'sync-token-blacklist-to-redis': {
+        'task': 'users.tasks.sync_token_blacklist_task',
+        'schedule': crontab(minute='*/5'),  # AUTH_TOKEN_BLACKLIST_SYNC_INTERVAL
+    },
 }
 
 app.conf.beat_schedule = CELERY_BEAT_SCHEDULE #Для запуска Shedule
\ No newline at end of file
@@ -0,0 +1,127 @@
+"""Non-blocking logging (LOGGING in core.settings).
+
+Loggers write to AsyncHandler: the calling thread (request, Celery task,
+sync loop) renders the message and puts the record on a queue. Formatting
+the lines and writing to the console and the JSON log file happen in a
+listener thread.
+
+Every process (gunicorn workers, Celery prefork children) appends to the
+same file, so the file isn't rotated from Python: RotatingFileHandler in
+several processes renames the file under the others and loses lines.
+Rotation is left to logrotate, WatchedFileHandler reopens the file when
+it has been moved.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+
+# Атрибуты LogRecord, все остальное пришло через extra= и попадает в JSON как есть
+RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and the extra= fields."""
+
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRS and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exc_info'] = record.exc_text
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+_exception_formatter = logging.Formatter()
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Очередь может быть полна: ждем, пока поток ее разберет, а не падаем
+        self.queue.put(self._sentinel)
+
+
+class AsyncHandler(QueueHandler):
+    """Hands records to a listener thread that runs the real handlers.
+
+    The message is rendered before the record is queued, as the stdlib
+    QueueHandler does: args may be mutable objects that change (or hold DB
+    state) by the time the listener gets to them. Only records that pass the
+    handler's level get that far. When the queue is full records are
+    dropped rather than blocking the caller.
+    Forked processes (Celery prefork) get their own queue and listener.
+    """
+
+    def __init__(self, handlers, queue_size=10000):
+        self.targets = handlers
+        self.queue_size = queue_size
+        self.dropped = 0
+        super().__init__(queue.Queue(queue_size))
+        self._start()
+        atexit.register(self.stop)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._restart)
+
+    def _start(self):
+        self.listener = _Listener(self.queue, *self.targets, respect_handler_level=True)
+        self.listener.start()
+        self.running = True
+
+    def _restart(self):
+        # Поток слушателя не переживает fork: в дочернем процессе нужны своя очередь и свой поток
+        self.queue = queue.Queue(self.queue_size)
+        self.lock = threading.RLock()
+        self._start()
+
+    def stop(self):
+        """Writes out what is queued and stops the listener thread."""
+        if self.running:
+            self.running = False
+            self.listener.stop()
+
+    def prepare(self, record):
+        # Копия с готовым текстом вместо msg/args и трейсбеком строкой: ничего из
+        # вызывающего кода (аргументы, кадры стека) не живет в очереди.
+        # Форматирование строк (JSON, консоль) остается слушателю
+        message = record.getMessage()
+        record = copy.copy(record)
+        record.msg = record.message = message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def async_handler(filename, console=True):
+    """Factory for LOGGING['handlers']: JSON file (+ plain console) behind a queue, rotated by logrotate."""
+    file_handler = WatchedFileHandler(filename, encoding='utf-8')
+    file_handler.setFormatter(JsonFormatter())
+    handlers = [file_handler]
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s', '%Y-%m-%d %H:%M:%S'))
+        handlers.append(console_handler)
+    # Уровень задается самому AsyncHandler ('level' в LOGGING), сюда доходят только прошедшие его записи
+    return AsyncHandler(handlers)
@@ -0,0 +1,240 @@
+"""Opt-in profiling of API requests and Celery tasks (PROFILING_ENABLED).
+
+Every request and task gets a Profile: SQL queries and their time (an
+execute wrapper on every DB connection), Google API calls and their time
+(track_google() around the calls) and the total time. Requests return it
+in a Server-Timing header, tasks log it.
+
+A PROFILING_SAMPLE_RATE fraction of sync requests and tasks also runs under
+cProfile and is dumped to PROFILING_DIR, open the dumps with
+`python -m pstats <file>` or snakeviz. cProfile has to be on from the start
+of the call, so a call slower than PROFILING_SLOW_MS can't be dumped after
+the fact: it is logged and the next call of the same view or task is
+profiled instead. Async views get timings only, a cProfile in the event
+loop thread would mix in every other request.
+"""
+import cProfile
+import logging
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+MAX_ARMED = 1000
+
+_current = ContextVar('profile', default=None)
+# Имена вызовов, превысивших PROFILING_SLOW_MS без cProfile: следующий вызов профилируется
+_armed = set()
+# task_id -> (Profile, token): prerun и postrun - разные обработчики
+_tasks = {}
+
+
+class Profile:
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.google_calls = 0
+        self.google_time = 0.0
+        self.total = None
+        self.dump_path = None
+        self.profiler = None
+        self._started = time.perf_counter()
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;desc="{self.db_queries} queries";dur={self.db_time * 1000:.1f}',
+            f'google;desc="{self.google_calls} calls";dur={self.google_time * 1000:.1f}',
+            f'total;dur={self.total * 1000:.1f}',
+        ])
+
+    def as_dict(self):
+        return {
+            'kind': self.kind,
+            'name': self.name,
+            'db_queries': self.db_queries,
+            'db_ms': round(self.db_time * 1000, 1),
+            'google_calls': self.google_calls,
+            'google_ms': round(self.google_time * 1000, 1),
+            'total_ms': round(self.total * 1000, 1),
+            'dump': str(self.dump_path) if self.dump_path else None,
+        }
+
+
+def current_profile():
+    return _current.get()
+
+
+def _record_query(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.db_queries += 1
+        profile.db_time += time.perf_counter() - started
+
+
+def _install_query_recorder(sender=None, connection=None, **kwargs):
+    # В начало списка: connection.execute_wrapper() снимает свою обертку через pop()
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+connection_created.connect(_install_query_recorder)
+
+
+def install_query_recorder():
+    """Covers connections opened before this module was imported, new ones get it from connection_created."""
+    for connection in connections.all(initialized_only=True):
+        _install_query_recorder(connection=connection)
+
+
+@contextmanager
+def track_google():
+    """Counts the block as one Google API call of the current profile, if there is one."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.google_calls += 1
+        profile.google_time += time.perf_counter() - started
+
+
+def _should_dump(name):
+    if name in _armed:
+        _armed.discard(name)
+        return True
+    return random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+def start(kind, name, allow_cprofile=True):
+    """Starts a Profile in the current context, None if one is already running (nested call)."""
+    if _current.get() is not None:
+        return None, None
+    profile = Profile(kind, name)
+    if allow_cprofile and _should_dump(name):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            profile.profiler = profiler
+        except ValueError:
+            # Уже работает другой профилировщик (sys.monitoring в 3.12+)
+            pass
+    return profile, _current.set(profile)
+
+
+def finish(profile, token):
+    profile.total = time.perf_counter() - profile._started
+    if profile.profiler is not None:
+        profile.profiler.disable()
+        profile.dump_path = _dump(profile)
+    try:
+        _current.reset(token)
+    except ValueError:
+        # task_postrun в другом контексте, чем task_prerun
+        _current.set(None)
+
+    slow = profile.total * 1000 >= settings.PROFILING_SLOW_MS
+    if slow and profile.profiler is None and len(_armed) < MAX_ARMED:
+        _armed.add(profile.name)
+    if slow or profile.dump_path:
+        logger.info(
+            f"{profile.kind} {profile.name} took {profile.total * 1000:.0f} ms", extra={'profile': profile.as_dict()}
+        )
+    return profile
+
+
+def _dump(profile):
+    directory = settings.PROFILING_DIR
+    name = re.sub(r'[^\w.-]+', '_', profile.name).strip('_')
+    path = directory / f"{profile.kind}-{name}-{datetime.now():%Y%m%d-%H%M%S-%f}-{profile.total * 1000:.0f}ms.prof"
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        profile.profiler.dump_stats(path)
+        return path
+    except OSError as e:
+        logger.warning(f"Failed to write profile {path}: {str(e)}")
+        return None
+
+
+def request_name(request):
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return f'{request.method} unresolved'
+    return f'{request.method} {match.view_name or match.route}'
+
+
+class ProfilingMiddleware:
+    """Server-Timing on every response and sampled cProfile dumps, when PROFILING_ENABLED."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        install_query_recorder()
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not settings.PROFILING_ENABLED:
+            return self.get_response(request)
+        profile, token = start('request', request_name(request))
+        if profile is None:
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            finish(profile, token)
+        response['Server-Timing'] = profile.server_timing()
+        return response
+
+    async def __acall__(self, request):
+        if not settings.PROFILING_ENABLED:
+            return await self.get_response(request)
+        profile, token = start('request', request_name(request), allow_cprofile=False)
+        if profile is None:
+            return await self.get_response(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish(profile, token)
+        response['Server-Timing'] = profile.server_timing()
+        return response
+
+
+@task_prerun.connect
+def _start_task_profile(task_id=None, task=None, **kwargs):
+    if not settings.PROFILING_ENABLED:
+        return
+    profile, token = start('task', task.name)
+    if profile is not None:
+        _tasks[task_id] = (profile, token)
+
+
+@task_postrun.connect
+def _finish_task_profile(task_id=None, **kwargs):
+    started = _tasks.pop(task_id, None)
+    if started is not None:
+        finish(*started)
@@ -0,0 +1,16 @@
+import redis
+from django.conf import settings
+
+_client = None
+
+def get_redis():
+    """Shared Redis client for the process (one connection pool per worker)."""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            decode_responses=True,
+        )
+    return _client
@@ -38,44 +38,37 @@ GOOGLE_OAUTH_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 
 LOG_DIR = BASE_DIR / 'logs'  # Use Path for log directory
 
+# Логи пишет поток-слушатель (core/log.py): вызывающий код только кладет запись в очередь.
+# В файле - JSON по строке на запись, в консоли - обычный текст. Файл пишут все процессы,
+# ротация внешняя (logrotate, без copytruncate): WatchedFileHandler переоткрывает файл сам.
+# Построчные логи синхронизации по каждому событию - DEBUG, в проде (INFO) они не создаются вовсе
+LOG_LEVEL = os.getenv('DJANGO_LOG_LEVEL', 'INFO')
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
-    'formatters': {
-        'standard': {
-            'format': '%(asctime)s [%(levelname)s] %(name)s: %(message)s',
-            'datefmt': '%Y-%m-%d %H:%M:%S'
-        },
-    },
     'handlers': {
-        'console': {
-            'level': os.getenv('DJANGO_LOG_LEVEL', 'INFO'),
-            'formatter': 'standard',
-            'class': 'logging.StreamHandler',
-        },
-        'file': {
-            'level': 'DEBUG',
-            'formatter': 'standard',
-            'class': 'logging.FileHandler',
-            'filename': LOG_DIR / 'debug.log',  # Use Path for filename
+        'async': {
+            '()': 'core.log.async_handler',
+            'filename': LOG_DIR / 'app.jsonl',
+            'level': LOG_LEVEL,
         },
     },
     'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
-            'level': os.getenv('DJANGO_LOG_LEVEL', 'INFO'),
-            'propagate': True,
-        },
-        'users': {
-            'handlers': ['console', 'file'],
-            'level': 'DEBUG',
+            'handlers': ['async'],
+            'level': LOG_LEVEL,
             'propagate': False,
         },
-        'core': {  # Корневой логгер для проекта
-            'handlers': ['console', 'file'],
-            'level': 'INFO',
+        'celery': {
+            'handlers': ['async'],
+            'level': LOG_LEVEL,
             'propagate': False,
         },
+        **{
+            app: {'handlers': ['async'], 'level': LOG_LEVEL, 'propagate': False}
+            for app in ('core', 'users', 'planner', 'googlecalendar')
+        },
     },
 }
 
@@ -116,6 +109,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -146,16 +140,50 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'core.wsgi.application'
+ASGI_APPLICATION = 'core.asgi.application'
+
+# Async-версии чтений дашборда (planner/async_views.py): события за период, статистика, bootstrap.
+# Включать при запуске под ASGI-сервером (uvicorn core.asgi:application), под WSGI остаются DRF-версии
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'False').lower() == 'true'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=postgres - профиль для продакшена: запись из API и воркеров Celery идет параллельно
+# (SQLite блокирует базу на каждую запись), пересечения событий запрещает exclusion constraint
+# (planner/migrations/0004_event_no_overlap.py).
+# Веб-процессы берут соединения из пула psycopg. Воркерам Celery (prefork) пул не нужен -
+# с DB_POOL=false у них постоянные соединения на DB_CONN_MAX_AGE секунд.
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+DB_POOL = os.getenv('DB_POOL', 'true').lower() == 'true'
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB', 'teacher_planner'),
+            'USER': os.getenv('POSTGRES_USER', 'teacher_planner'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+            'PORT': os.getenv('POSTGRES_PORT', '5432'),
+            'CONN_HEALTH_CHECKS': True,
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', 600)),
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+                    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+                    'timeout': 10,
+                },
+            } if DB_POOL else {},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
     }
-}
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -228,6 +256,7 @@ SIMPLE_JWT = {
     'AUTH_COOKIE_SECURE': not DEBUG,
     'AUTH_COOKIE_HTTP_ONLY': True,
     'AUTH_COOKIE_SAMESITE': 'Lax' if DEBUG else 'Strict',
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.CachedTokenRefreshSerializer',
 }
 
 SITE_ID = 1
@@ -260,16 +289,121 @@ ACCOUNT_LOGIN_METHODS = {"email"}
 
 ACCOUNT_SIGNUP_FIELDS = ['email*', 'password1*', 'password2*']
 
-CELERY_BROKER_URL = 'redis://localhost:6379/0'
-CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+REDIS_SOCKET_TIMEOUT = 2
+
+CELERY_BROKER_URL = REDIS_URL
+CELERY_RESULT_BACKEND = REDIS_URL
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 
+# Очереди синхронизации: интерактивные отправки, фоновые полные синхронизации, создание календарей
+# (googlecalendar/routing.py). На каждую партицию N по одному процессу, чтобы задачи пользователя шли по очереди:
+#   celery -A core worker -Q gcal.interactive.N -c 1
+#   celery -A core worker -Q gcal.bulk.N -c 1
+#   celery -A core worker -Q gcal.provisioning,gcal.maintenance -c 2
+CELERY_TASK_ROUTES = (
+    'googlecalendar.routing.route_task',
+    {
+        'users.tasks.prune_expired_tokens': {'queue': 'gcal.maintenance', 'priority': 9},
+        'users.tasks.sync_token_blacklist_task': {'queue': 'gcal.maintenance', 'priority': 9},
+    },
+)
+CELERY_TASK_DEFAULT_PRIORITY = 5
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'queue_order_strategy': 'priority',
+    'priority_steps': list(range(10)),
+    'sep': ':',
+}
+# Воркер не забирает задачи впрок, иначе свежие отправки ждут за уже взятыми.
+# acks_late задан у идемпотентных задач синхронизации (googlecalendar/tasks.py), не глобально
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
 
 GOOGLE_CALENDAR_NAME_PREFIX = 'TeacherPlanner'
 
+# Общие для всех воркеров лимиты запросов к Google API (token bucket в Redis)
+# rate - токенов в секунду, capacity - размер всплеска
+GOOGLE_API_RATE_LIMIT_ENABLED = os.getenv('GOOGLE_API_RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+GOOGLE_API_RATE_LIMITS = {
+    'project': {'rate': 50, 'capacity': 100},
+    'user': {'rate': 5, 'capacity': 10},
+}
+GOOGLE_API_MAX_RETRIES = 5
+GOOGLE_API_BACKOFF_BASE = 1  # seconds
+GOOGLE_API_BACKOFF_MAX = 64  # seconds
+
+# Lease на синхронизацию пользователя: одновременно идет только одна синхронизация
+GOOGLE_SYNC_LEASE_TTL = 120  # seconds, продлевается heartbeat'ом пока синхронизация идет
+# Состояние "событие отправляется в Google" (вместо флага Event.is_syncing), истекает само
+GOOGLE_SYNC_EVENT_LEASE_TTL = 60  # seconds
+# 'redis' - общее для всех воркеров, 'memory' - в пределах процесса (один воркер, тесты)
+GOOGLE_SYNC_LEASE_BACKEND = os.getenv('GOOGLE_SYNC_LEASE_BACKEND', 'redis')
+
+# 'sync' - full_sync_user на каждого пользователя, 'async' - пачки пользователей на asyncio (full_sync_users_chunk)
+GOOGLE_SYNC_ENGINE = os.getenv('GOOGLE_SYNC_ENGINE', 'sync')
+GOOGLE_SYNC_CHUNK_SIZE = 50  # пользователей в одной задаче
+GOOGLE_SYNC_ASYNC_CONCURRENCY = 20  # одновременных синхронизаций в одном процессе
+GOOGLE_SYNC_HTTP_TIMEOUT = 30  # seconds
+GOOGLE_SYNC_QUEUE_PARTITIONS = int(os.getenv('GOOGLE_SYNC_QUEUE_PARTITIONS', 4))
+GOOGLE_SYNC_BULK_TASK_EXPIRES = 55  # seconds, меньше интервала periodic_full_sync
+# Первичная отправка событий в только что подключенный календарь (backfill_calendar)
+GOOGLE_SYNC_BACKFILL_BATCH_SIZE = 50  # событий в одном batch-запросе к Google
+GOOGLE_SYNC_BACKFILL_TIMEOUT = 60 * 60  # seconds, после этого backfill считается зависшим
+
+# Circuit breaker для аккаунтов с отозванным токеном или удаленным календарем
+GOOGLE_SYNC_CIRCUIT_THRESHOLD = 3  # ошибок подряд
+GOOGLE_SYNC_CIRCUIT_COOLDOWN = 300  # seconds, удваивается с каждой следующей ошибкой
+GOOGLE_SYNC_CIRCUIT_MAX_COOLDOWN = 24 * 60 * 60  # seconds
+
+# Окно синхронизации из Google: события вне [now - PAST, now + FUTURE] не запрашиваются и не проверяются
+GOOGLE_SYNC_WINDOW_PAST_DAYS = int(os.getenv('GOOGLE_SYNC_WINDOW_PAST_DAYS', 30))
+GOOGLE_SYNC_WINDOW_FUTURE_DAYS = int(os.getenv('GOOGLE_SYNC_WINDOW_FUTURE_DAYS', 365))
+GOOGLE_SYNC_PAGE_SIZE = 2500  # максимум maxResults в Calendar API
+# Partial response: только поля, которые читает _parse_google_event
+GOOGLE_SYNC_LIST_FIELDS = 'nextPageToken,nextSyncToken,items(id,status,updated,summary,description,location,start,end,extendedProperties)'
+# Запрашивать из Google только события с меткой планировщика (privateExtendedProperty).
+# События, заведенные прямо в Google Calendar, тогда не импортируются и не удаляются
+GOOGLE_SYNC_ONLY_PLANNER_EVENTS = os.getenv('GOOGLE_SYNC_ONLY_PLANNER_EVENTS', 'False').lower() == 'true'
+
+# История синхронизаций (SyncRun), старые записи удаляет prune_sync_runs
+GOOGLE_SYNC_RUN_RETENTION_DAYS = 30
+
+# Архив прошлых семестров (planner/archive.py, manage.py archive_events)
+# Граница должна быть старше окна синхронизации GOOGLE_SYNC_WINDOW_PAST_DAYS
+PLANNER_ARCHIVE_AFTER_DAYS = int(os.getenv('PLANNER_ARCHIVE_AFTER_DAYS', 180))
+PLANNER_ARCHIVE_BATCH_SIZE = 1000  # событий в одной транзакции
+
+# Нагрузка кафедры за учебный год (planner/analytics.py)
+ANALYTICS_ACADEMIC_YEAR_START_MONTH = 9  # учебный год начинается 1 сентября
+ANALYTICS_CHUNK_SIZE = 10000  # строк из курсора за раз
+ANALYTICS_CACHE_SIZE = 16  # отчетов в кеше процесса
+
+# Кеш пользователей для JWTCookieAuthentication (users/cache.py)
+# 'redis' - локальный кеш процесса + общий в Redis, 'memory' - только в процессе, 'off' - всегда из БД
+AUTH_USER_CACHE_BACKEND = os.getenv('AUTH_USER_CACHE_BACKEND', 'redis')
+AUTH_USER_CACHE_SIZE = 10000  # пользователей в кеше процесса
+AUTH_USER_CACHE_TTL = 10  # seconds, столько другие процессы могут видеть пользователя до сброса
+AUTH_USER_CACHE_SHARED_TTL = 60  # seconds
+
+# Blacklist refresh-токенов дублируется в Redis (users/tokens.py), просроченные токены удаляет prune_expired_tokens
+AUTH_TOKEN_BLACKLIST_CACHE = os.getenv('AUTH_TOKEN_BLACKLIST_CACHE', 'true').lower() == 'true'
+AUTH_TOKEN_BLACKLIST_SYNC_INTERVAL = 300  # seconds, период sync_token_blacklist_task
+AUTH_TOKEN_PRUNE_BATCH_SIZE = 5000
+
+# Профилирование запросов и задач Celery (core/profiling.py): заголовок Server-Timing,
+# для доли вызовов - дамп cProfile в PROFILING_DIR
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() == 'true'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0.01))
+PROFILING_SLOW_MS = int(os.getenv('PROFILING_SLOW_MS', 1000))  # медленный вызов логируется, следующий такой же профилируется
+PROFILING_DIR = Path(os.getenv('PROFILING_DIR', BASE_DIR / 'profiles'))
+
+# HTTP к Google при входе (users/google_oauth.py): общий пул соединений, таймауты (connect, read)
+GOOGLE_OAUTH_HTTP_TIMEOUT = (3.05, 10)  # seconds
+GOOGLE_OAUTH_POOL_SIZE = 10
+
 
 SOCIALACCOUNT_PROVIDERS = {
     'google': {
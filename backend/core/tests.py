@@ -0,0 +1,149 @@
+import json
+import logging
+import pstats
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from planner.models import Subject
+from users.tasks import prune_expired_tokens
+from . import profiling
+from .log import AsyncHandler, JsonFormatter
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.threads = []
+
+    def emit(self, record):
+        self.records.append(self.format(record))
+        self.threads.append(threading.current_thread())
+
+
+class AsyncLoggingTests(SimpleTestCase):
+    def make_logger(self, handler):
+        logger = logging.getLogger(f'core.tests.{self._testMethodName}')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        return logger
+
+    def test_records_are_written_by_listener_thread(self):
+        target = RecordingHandler()
+        handler = AsyncHandler([target])
+        logger = self.make_logger(handler)
+        logger.info('synced %s events', 3)
+        handler.stop()
+        self.assertEqual(target.records, ['synced 3 events'])
+        self.assertIsNot(target.threads[0], threading.current_thread())
+
+    def test_args_are_rendered_before_queueing(self):
+        target = RecordingHandler()
+        handler = AsyncHandler([target])
+        handler.stop()
+        logger = self.make_logger(handler)
+        events = [1]
+        logger.info('events %s', events)
+        events.append(2)
+
+        record = handler.queue.get_nowait()
+        self.assertEqual((record.msg, record.args), ('events [1]', None))
+        self.assertEqual(target.format(record), 'events [1]')
+
+    def test_exception_is_queued_as_text(self):
+        handler = AsyncHandler([RecordingHandler()])
+        self.addCleanup(handler.stop)
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            record = logging.LogRecord('x', logging.ERROR, __file__, 1, 'failed', (), sys.exc_info())
+
+        prepared = handler.prepare(record)
+
+        self.assertIsNone(prepared.exc_info)
+        self.assertIn('ValueError: boom', prepared.exc_text)
+        self.assertIn('ValueError: boom', json.loads(JsonFormatter().format(prepared))['exc_info'])
+
+    def test_full_queue_drops_records(self):
+        handler = AsyncHandler([RecordingHandler()], queue_size=1)
+        handler.stop()
+        logger = self.make_logger(handler)
+        logger.info('first')
+        logger.info('second')
+        self.assertEqual(handler.dropped, 1)
+
+    def test_json_formatter_includes_extra_fields(self):
+        record = logging.LogRecord('googlecalendar.sync', logging.INFO, __file__, 1, 'user %s', (5,), None)
+        record.user_id = 5
+        data = json.loads(JsonFormatter().format(record))
+        self.assertEqual(data['message'], 'user 5')
+        self.assertEqual(data['level'], 'INFO')
+        self.assertEqual(data['user_id'], 5)
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=0, PROFILING_SLOW_MS=60000, AUTH_USER_CACHE_BACKEND='off')
+class ProfilingTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.profiles = Path(directory.name)
+        self.enterContext(self.settings(PROFILING_DIR=self.profiles))
+        self.addCleanup(profiling._armed.clear)
+        user = get_user_model().objects.create(username='t@example.com', email='t@example.com')
+        Subject.objects.create(user=user, name='Math')
+        self.client.cookies['access_token'] = str(AccessToken.for_user(user))
+
+    def server_timing(self, response):
+        return dict(
+            (part.split(';')[0], part) for part in response['Server-Timing'].split(', ')
+        )
+
+    def test_server_timing_counts_queries(self):
+        response = self.client.get('/api/subjects/')
+        timing = self.server_timing(response)
+        # Пользователь, count и сама выборка
+        self.assertIn('desc="3 queries"', timing['db'])
+        self.assertIn('desc="0 calls"', timing['google'])
+        self.assertIn('total;dur=', timing['total'])
+        self.assertEqual(list(self.profiles.iterdir()), [])
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/subjects/'))
+
+    def test_sampled_request_is_dumped(self):
+        with self.settings(PROFILING_SAMPLE_RATE=1):
+            self.client.get('/api/subjects/')
+        dump, = self.profiles.iterdir()
+        self.assertTrue(dump.name.startswith('request-GET_subject-list-'))
+        self.assertTrue(pstats.Stats(str(dump)).total_calls)
+
+    def test_slow_call_profiles_the_next_one(self):
+        with self.settings(PROFILING_SLOW_MS=0), self.assertLogs('core.profiling', 'INFO') as logs:
+            self.client.get('/api/subjects/')
+        self.assertEqual(list(self.profiles.iterdir()), [])
+        self.assertEqual(logs.records[0].profile['name'], 'GET subject-list')
+        self.client.get('/api/subjects/')
+        self.assertEqual(len(list(self.profiles.iterdir())), 1)
+
+    def test_google_calls_are_timed(self):
+        profile, token = profiling.start('task', 'test', allow_cprofile=False)
+        with profiling.track_google(), profiling.track_google():
+            pass
+        profiling.finish(profile, token)
+        self.assertEqual(profile.google_calls, 2)
+        self.assertIsNone(profiling.current_profile())
+
+    def test_celery_task_is_profiled(self):
+        with self.settings(PROFILING_SLOW_MS=0), self.assertLogs('core.profiling', 'INFO') as logs:
+            prune_expired_tokens.apply()
+        profile = logs.records[0].profile
+        self.assertEqual(profile['kind'], 'task')
+        self.assertEqual(profile['name'], 'users.tasks.prune_expired_tokens')
+        self.assertGreater(profile['db_queries'], 0)
@@ -1,8 +1,65 @@
 from django.contrib import admin
-from .models import GoogleCalendar
+from planner.admin_tools import autocomplete_filter, autocomplete_filter_media
+from .models import GoogleCalendar, SyncRun
+from .metrics import skipped_run_counts, summarize_sync_runs
+from .tasks import resync_users
 # Register your models here.
 
 @admin.register(GoogleCalendar)
 class GoogleCalendarAdmin(admin.ModelAdmin):
-    list_display = ('calendar_id', 'user', 'created_at')
-    list_filter = ('created_at', 'user')
\ No newline at end of file
+    list_display = ('calendar_id', 'user', 'created_at', 'last_sync', 'sync_failures', 'circuit_open_until', 'last_failure_reason')
+    list_filter = ('created_at', 'last_failure_reason', autocomplete_filter('user'))
+    list_select_related = ('user',)
+    search_fields = ('calendar_id', 'user__email')
+    actions = ['reset_circuit', 'resync_calendars']
+
+    @property
+    def media(self):
+        return super().media + autocomplete_filter_media(self, 'user')
+
+    @admin.action(description='Reset sync circuit breaker')
+    def reset_circuit(self, request, queryset):
+        queryset.update(sync_failures=0, circuit_open_until=None, last_failure_reason='', last_error='')
+
+    @admin.action(description='Re-sync selected calendars')
+    def resync_calendars(self, request, queryset):
+        queued, running = resync_users(queryset.values_list('user_id', flat=True))
+        self.message_user(request, f"Re-sync queued for {queued} users, {running} already running")
+
+
+@admin.register(SyncRun)
+class SyncRunAdmin(admin.ModelAdmin):
+    list_display = (
+        'started_at', 'user', 'kind', 'direction', 'status', 'duration_ms', 'api_calls', 'db_queries',
+        'events_created', 'events_updated', 'events_deleted', 'events_rejected', 'lag_ms', 'error_class',
+    )
+    list_filter = ('kind', 'direction', 'status', 'started_at', 'error_class')
+    search_fields = ('user__email', 'error_class')
+    date_hierarchy = 'started_at'
+    list_select_related = ('user',)
+    SKIPPED_DAYS = 7
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        try:
+            # Сводка по текущей выборке фильтров changelist'а
+            runs = response.context_data['cl'].queryset
+        except (AttributeError, KeyError):
+            return response
+        # Пропуски не пишутся в SyncRun: счетчики всех пользователей за SKIPPED_DAYS, без фильтров
+        skipped = skipped_run_counts(self.SKIPPED_DAYS)
+        response.context_data['skipped_days'] = self.SKIPPED_DAYS
+        response.context_data['sync_summary'] = [
+            ('All runs', {**summarize_sync_runs(runs), 'skipped': sum(skipped.values())}),
+            *(
+                (label, {**summarize_sync_runs(runs.filter(kind=kind)), 'skipped': skipped.get(kind, 0)})
+                for kind, label in SyncRun.KINDS
+            ),
+        ]
+        return response
\ No newline at end of file
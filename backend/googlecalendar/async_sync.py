@@ -0,0 +1,307 @@
+import asyncio
+import logging
+from collections import Counter
+from urllib.parse import quote
+import httplib2
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from googleapiclient.errors import HttpError
+from core.profiling import track_google
+from planner.models import Event
+from .metrics import SyncRunRecorder
+from .leases import Lease, user_lease_key, event_lease_key, pop_deferred_pushes
+from .ratelimit import GoogleApiRateLimiter, backoff_delay, is_rate_limit_error, record_stat
+from .sync import GoogleCalendarSync
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+
+async def _stat(name, amount=1):
+    await sync_to_async(record_stat, thread_sensitive=False)(name, amount)
+
+
+async def _acquire_lease(lease):
+    return await sync_to_async(lease.acquire, thread_sensitive=False)()
+
+
+async def _release_lease(lease):
+    await sync_to_async(lease.release, thread_sensitive=False)()
+
+
+class AsyncGoogleCalendarSync(GoogleCalendarSync):
+    """GoogleCalendarSync on asyncio, for syncing many users in one process.
+
+    Google is called through a shared httpx.AsyncClient, so a worker doesn't
+    sit idle on network latency. Parsing, validation and DB writes are the
+    GoogleCalendarSync methods, run in a thread through sync_to_async.
+    The user's calendar must already exist (create_google_calendar_task).
+    """
+    BASE_URL = 'https://www.googleapis.com/calendar/v3'
+
+    def __init__(self, user, client):
+        self.user = user
+        self.client = client
+        self.limiter = GoogleApiRateLimiter(user.id)
+        self.stats = Counter()
+        self._lookup_cache = None
+        self.credentials = None
+        self.calendar_id = user.google_calendar.calendar_id
+        self._deferred_deletes = []
+
+    async def prepare(self):
+        # Токен, истекающий в ближайшие минуты, обновляется здесь же (_load_credentials)
+        self.credentials = await sync_to_async(self._load_credentials)()
+
+    async def _refresh(self):
+        await sync_to_async(self._refresh_credentials)(self.credentials)
+
+    def _events_path(self, event_id=None):
+        path = f"/calendars/{quote(self.calendar_id, safe='')}/events"
+        if event_id:
+            path += f"/{quote(event_id, safe='')}"
+        return path
+
+    async def _acquire(self):
+        waited = 0
+        while True:
+            wait = await sync_to_async(self.limiter.try_acquire, thread_sensitive=False)()
+            if not wait:
+                break
+            wait = min(wait, settings.GOOGLE_API_BACKOFF_MAX)
+            waited += wait
+            await asyncio.sleep(wait)
+        if waited:
+            await _stat('throttled')
+            await _stat('throttled_ms', int(waited * 1000))
+
+    async def _request(self, method, path, params=None, body=None):
+        """Calls the Calendar API with the same rate limiting and backoff as the sync engine.
+
+        Errors are raised as googleapiclient HttpError, so the shared
+        status handling works unchanged.
+        """
+        url = f"{self.BASE_URL}{path}"
+        self.stats['api_calls'] += 1
+        max_retries = settings.GOOGLE_API_MAX_RETRIES
+        refreshed = False
+        attempt = 0
+        while True:
+            await self._acquire()
+            with track_google():
+                response = await self.client.request(
+                    method, url, params=params, json=body,
+                    headers={'Authorization': f'Bearer {self.credentials.token}'},
+                )
+            if response.status_code < 400:
+                return response.json() if response.content else {}
+
+            # Токен отозван или истек раньше expiry: одно обновление и повтор, как у googleapiclient
+            if response.status_code == 401 and not refreshed and self.credentials.refresh_token:
+                refreshed = True
+                await self._refresh()
+                continue
+
+            error = HttpError(httplib2.Response({'status': response.status_code}), response.content, uri=url)
+            if not is_rate_limit_error(error):
+                raise error
+            if attempt == max_retries:
+                await _stat('exhausted')
+                raise error
+            delay = backoff_delay(attempt)
+            attempt += 1
+            await _stat('backoff')
+            await _stat('backoff_ms', int(delay * 1000))
+            logger.warning(f"Google API rate limit hit for user {self.user.id} (status {response.status_code}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def _delete_google_event(self, event_id):
+        # Вызывается из общей валидации в потоке, сам запрос уходит позже из event loop
+        self._deferred_deletes.append(event_id)
+
+    async def _delete_google_event_async(self, event_id):
+        try:
+            await self._request('DELETE', self._events_path(event_id))
+            logger.debug("Deleted Google event: %s", event_id)
+        except HttpError as e:
+            if e.resp.status in (404, 410):
+                logger.warning(f"Event {event_id} not found or already deleted in Google Calendar.")
+                await Event.objects.filter(google_event_id=event_id).aupdate(google_event_id=None)
+            else:
+                logger.error(f"Google API error deleting event {event_id}: {str(e)}")
+        except Exception as e:
+            logger.error(f"Failed to delete Google event {event_id}: {str(e)}")
+
+    async def _flush_deferred_deletes(self):
+        event_ids = list(dict.fromkeys(self._deferred_deletes))
+        self._deferred_deletes = []
+        for event_id in event_ids:
+            await self._delete_google_event_async(event_id)
+
+    async def _list_google_events_async(self):
+        params = {
+            key: str(value).lower() if isinstance(value, bool) else value
+            for key, value in self._list_params().items()
+        }
+        events_from_google = []
+        while True:
+            result = await self._request('GET', self._events_path(), params=params)
+            events_from_google.extend(result.get('items', []))
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                break
+            params['pageToken'] = page_token
+        return events_from_google
+
+    async def _check_stale_event_async(self, stale_event):
+        logger.debug("Checking existence for stale event %s (Google ID: %s)", stale_event.id, stale_event.google_event_id)
+        try:
+            await self._request('GET', self._events_path(stale_event.google_event_id), params={'fields': 'id'})
+        except HttpError as e:
+            if e.resp.status in (404, 410):
+                logger.debug("Deleting stale local event %s (Google ID: %s)", stale_event.id, stale_event.google_event_id)
+                await stale_event.adelete()
+                self.stats['deleted'] += 1
+            else:
+                logger.error(f"Google API error checking event {stale_event.google_event_id}: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error checking event existence: {str(e)}")
+
+    async def sync_google_to_local_async(self):
+        try:
+            logger.info(f"Starting async sync_google_to_local for user {self.user.id}")
+            events_from_google = await self._list_google_events_async()
+            logger.info(f"Total events to check: {len(events_from_google)}")
+
+            processed_google_ids = await sync_to_async(self._apply_google_events)(events_from_google)
+            await self._flush_deferred_deletes()
+
+            for stale_event in await sync_to_async(self._stale_local_events)(processed_google_ids):
+                await self._check_stale_event_async(stale_event)
+
+            await sync_to_async(self._mark_synced)()
+        except Exception as e:
+            logger.error(f"Async Google to local sync failed for user {self.user.id}: {str(e)}")
+            raise
+
+    async def sync_local_to_google_async(self, event):
+        if event.google_event_id:
+            try:
+                google_event = await self._request(
+                    'GET', self._events_path(event.google_event_id), params={'fields': 'id,updated'}
+                )
+                if not self._local_is_newer(event, google_event):
+                    logger.debug("Skipping older local event: %s (google_id: %s) for sync to Google.", event.id, event.google_event_id)
+                    return
+            except HttpError as e:
+                if e.resp.status != 404:
+                    logger.error(f"Google API error checking event {event.google_event_id}: {str(e)}")
+                    return
+
+        event_data = self._event_body(event)
+        try:
+            if event.google_event_id:
+                updated_g_event = await self._request('PUT', self._events_path(event.google_event_id), body=event_data)
+                self.stats['updated'] += 1
+                logger.debug("Updated event %s in Google Calendar (google_id: %s)", event.id, updated_g_event.get('id'))
+            else:
+                created_g_event = await self._request('POST', self._events_path(), body=event_data)
+                event.google_event_id = created_g_event.get('id')
+                self.stats['created'] += 1
+                logger.debug("Created new event %s in Google Calendar (google_id: %s)", event.id, event.google_event_id)
+            await sync_to_async(self._store_google_ids)(event)
+        except HttpError as e:
+            logger.error(f"Google API error syncing event {event.id} to Google: {str(e)}")
+            if e.resp.status == 404 and event.google_event_id:
+                logger.warning(f"Event {event.google_event_id} not found in Google. Clearing local google_event_id.")
+                event.google_event_id = None
+                await Event.objects.filter(pk=event.pk).aupdate(google_event_id=None)
+            raise
+
+    async def _push_event(self, event):
+        lease = Lease(event_lease_key(event.id), settings.GOOGLE_SYNC_EVENT_LEASE_TTL)
+        if not await _acquire_lease(lease):
+            logger.debug("Event %s is already syncing. Skipping.", event.id)
+            return False
+        try:
+            await self.sync_local_to_google_async(event)
+            return True
+        finally:
+            await _release_lease(lease)
+
+    async def sync_local_to_google_all_async(self):
+        events = [
+            event async for event in Event.objects.filter(user=self.user).select_related('group', 'subject')
+        ]
+        logger.info(f"Starting async sync_local_to_google_all for user {self.user.id}. Total events to check: {len(events)}")
+        synced_count = 0
+        for event in events:
+            try:
+                if await self._push_event(event):
+                    synced_count += 1
+            except Exception as e:
+                logger.error(f"Error syncing event {event.id}: {str(e)}")
+        logger.info(f"Async local to Google sync all complete. Processed: {synced_count}, Total: {len(events)}")
+
+    async def push_deferred_async(self):
+        """Pushes events folded into this run by sync_single_event."""
+        event_ids = await sync_to_async(pop_deferred_pushes, thread_sensitive=False)(self.user.id)
+        if not event_ids:
+            return
+        async for event in Event.objects.filter(user=self.user, id__in=event_ids).select_related('group', 'subject'):
+            try:
+                await self._push_event(event)
+            except Exception as e:
+                logger.error(f"Error pushing deferred event {event.id}: {str(e)}")
+
+    async def full_sync_async(self):
+        await self.prepare()
+        await self.sync_google_to_local_async()
+        await self.sync_local_to_google_all_async()
+        await self.push_deferred_async()
+
+
+async def _sync_user(user, client, semaphore):
+    async with semaphore:
+        # Запросы к БД идут из общих потоков sync_to_async, поэтому здесь их не считаем
+        run = SyncRunRecorder(user.id, 'full', 'both', count_queries=False)
+        lease = Lease(user_lease_key(user.id), settings.GOOGLE_SYNC_LEASE_TTL)
+        if not await _acquire_lease(lease):
+            logger.info(f"Sync already running for user {user.id}. Skipping duplicate run.")
+            run.skip()
+            await sync_to_async(run.save)()
+            return 'skipped'
+        lease.start_heartbeat()
+        try:
+            await run.track(AsyncGoogleCalendarSync(user, client)).full_sync_async()
+            return 'synced'
+        except Exception as e:
+            run.fail(e)
+            raise
+        finally:
+            lease.stop_heartbeat()
+            await _release_lease(lease)
+            await sync_to_async(run.save)()
+
+
+async def run_full_syncs(user_ids, concurrency=None, transport=None):
+    """Full sync of many users concurrently, at most `concurrency` at a time.
+
+    Returns {user_id: 'synced' | 'skipped' | exception}.
+    """
+    concurrency = concurrency or settings.GOOGLE_SYNC_ASYNC_CONCURRENCY
+    users = [
+        user async for user in User.objects.filter(
+            id__in=user_ids, google_calendar__isnull=False
+        ).select_related('google_calendar')
+    ]
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=settings.GOOGLE_SYNC_HTTP_TIMEOUT, limits=limits, transport=transport) as client:
+        results = await asyncio.gather(
+            *(_sync_user(user, client, semaphore) for user in users),
+            return_exceptions=True,
+        )
+    return {user.id: result for user, result in zip(users, results)}
@@ -0,0 +1,68 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from planner.models import Event
+from .models import CalendarBackfill
+
+logger = logging.getLogger(__name__)
+
+
+def pending_events(user):
+    return Event.objects.filter(user=user, google_event_id__isnull=True).select_related('group', 'subject')
+
+
+def start_backfill(user):
+    """Creates the progress record and queues the backfill of the user's existing events."""
+    from .tasks import backfill_calendar
+
+    backfill = CalendarBackfill.objects.create(user=user, total=pending_events(user).count())
+    backfill_calendar.delay(user_id=user.id, backfill_id=backfill.id)
+    logger.info(f"Queued calendar backfill {backfill.id} for user {user.id}: {backfill.total} events")
+    return backfill
+
+
+def backfill_new_events(user):
+    """Pushes events written in bulk (no post_save, no per-event sync) to Google.
+
+    A backfill that is already running picks them up itself: it reads pending events by id.
+    """
+    if active_backfill_users().filter(user=user).exists():
+        return None
+    return start_backfill(user)
+
+
+def active_backfill_users():
+    """Users whose backfill is still going; periodic_full_sync leaves them to it.
+
+    Backfills older than GOOGLE_SYNC_BACKFILL_TIMEOUT are treated as dead.
+    """
+    return CalendarBackfill.objects.filter(
+        status__in=['pending', 'running'],
+        created_at__gt=timezone.now() - timedelta(seconds=settings.GOOGLE_SYNC_BACKFILL_TIMEOUT),
+    ).values('user_id')
+
+
+def run_backfill(backfill, sync):
+    """Pushes the user's unsynced events in chunks with batched inserts, recording progress.
+
+    Must run under the user's sync lease. Chunks are read by id (keyset) rather
+    than with one open cursor, since rows are updated while iterating.
+    """
+    CalendarBackfill.objects.filter(pk=backfill.pk).update(status='running', started_at=timezone.now())
+    events = pending_events(backfill.user).order_by('id')
+    chunk_size = settings.GOOGLE_SYNC_BACKFILL_BATCH_SIZE
+    last_id = 0
+    while True:
+        chunk = list(events.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+        created, failed = sync.push_new_events(chunk)
+        CalendarBackfill.objects.filter(pk=backfill.pk).update(pushed=F('pushed') + created, failed=F('failed') + failed)
+
+    CalendarBackfill.objects.filter(pk=backfill.pk).update(status='done', finished_at=timezone.now())
+    backfill.refresh_from_db()
+    logger.info(f"Calendar backfill {backfill.id} for user {backfill.user_id} done: {backfill.pushed} pushed, {backfill.failed} failed")
+    return backfill
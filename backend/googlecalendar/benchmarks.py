@@ -0,0 +1,94 @@
+"""Sync benchmarks against the fake Google Calendar server.
+
+Not part of the regular test run. Run with:
+
+    python manage.py test googlecalendar.benchmarks
+
+Every scenario reports wall time, Google API calls, DB queries, listing pages
+and response bytes, so regressions show up as numbers. SYNC_BENCH_SIZES
+selects the calendar sizes (default 100,1000,10000) and SYNC_BENCH_OUTPUT
+writes the results to a JSON file for comparing runs.
+"""
+import json
+import os
+import time
+from unittest import mock
+from django.db import connection
+from planner.models import Event, Plan
+from .tasks import sync_single_event
+from .testing import google_event_body, slot_start
+from .tests import GoogleSyncTestCase
+
+EVENT_TYPES = ['lecture', 'practice', 'lab']
+
+
+def bench_sizes():
+    return [int(size) for size in os.getenv('SYNC_BENCH_SIZES', '100,1000,10000').split(',')]
+
+
+class SyncBenchmark(GoogleSyncTestCase):
+    results = []
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        header = f"{'scenario':<28}{'events':>8}{'wall, s':>10}{'api calls':>11}{'db queries':>12}{'pages':>7}{'bytes':>12}"
+        print('\n' + header + '\n' + '-' * len(header))
+        for row in cls.results:
+            print(f"{row['scenario']:<28}{row['events']:>8}{row['wall']:>10.3f}{row['api_calls']:>11}"
+                  f"{row['db_queries']:>12}{row['pages']:>7}{row['bytes']:>12}")
+        output = os.getenv('SYNC_BENCH_OUTPUT')
+        if output:
+            with open(output, 'w') as f:
+                json.dump(cls.results, f, indent=2)
+
+    def measure(self, scenario, size, func):
+        self.server.reset_counters()
+        # Не CaptureQueriesContext: его журнал ограничен 9000 запросами
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            started = time.perf_counter()
+            func()
+            wall = time.perf_counter() - started
+        self.results.append({
+            'scenario': scenario,
+            'events': size,
+            'wall': wall,
+            'api_calls': self.server.total_calls(),
+            'db_queries': len(queries),
+            'pages': self.server.pages,
+            'bytes': self.server.bytes_sent,
+        })
+
+    def seed_google(self, size):
+        Plan.objects.filter(user=self.user).update(lecture_hours=size * 2, practice_hours=size * 2, lab_hours=size * 2)
+        for i in range(size):
+            body = google_event_body(
+                f'Event {i}', slot_start(i, self.first_day), 'IT-21', 'Math', EVENT_TYPES[i % len(EVENT_TYPES)]
+            )
+            self.server.add_event(self.calendar_id, body)
+
+    def test_sync_scenarios(self):
+        for size in bench_sizes():
+            # Горизонт синхронизации должен покрывать все засеянные события (4 в день)
+            with self.subTest(size=size), self.settings(GOOGLE_SYNC_WINDOW_FUTURE_DAYS=size // 4 + 2):
+                Event.objects.filter(user=self.user).delete()
+                self.server.calendars[self.calendar_id]['events'].clear()
+                self.seed_google(size)
+                sync = self.make_sync(self.user)
+
+                self.measure('sync_google_to_local', size, sync.sync_google_to_local)
+                self.assertEqual(Event.objects.filter(user=self.user).count(), size)
+
+                self.measure('sync_local_to_google_all', size, sync.sync_local_to_google_all)
+
+                event = Event.objects.filter(user=self.user).first()
+                event.title = 'Edited'
+                event.save()
+                with mock.patch('googlecalendar.tasks.GoogleCalendarSync', side_effect=self.make_sync):
+                    self.measure('sync_single_event', size, lambda: sync_single_event.apply(args=[event.id]))
@@ -0,0 +1,100 @@
+"""Per-user circuit breaker for Google accounts that keep failing.
+
+A revoked refresh token, a disconnected social account or a deleted
+calendar fails on every run. After GOOGLE_SYNC_CIRCUIT_THRESHOLD such
+failures in a row the circuit opens: periodic_full_sync skips the user
+for an exponentially growing cool-down and signals stop queuing pushes.
+A successful run or a reconnect through GoogleOAuthCallbackView closes it.
+"""
+import logging
+import re
+from datetime import timedelta
+from allauth.socialaccount.models import SocialAccount, SocialToken
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from google.auth.exceptions import RefreshError
+from googleapiclient.errors import HttpError
+from planner.models import ArchivedEvent, Event
+from .models import GoogleCalendar
+from .ratelimit import is_rate_limit_error
+
+logger = logging.getLogger(__name__)
+
+# Ошибка по конкретному событию (404 на events/<id>) - это не потерянный календарь
+EVENT_URI_RE = re.compile(r'/calendars/[^/]+/events/[^/?]+')
+
+
+def failure_reason(error):
+    """'auth' or 'not_found' for errors that will repeat until the user reconnects, else None."""
+    if isinstance(error, RefreshError):
+        return None if getattr(error, 'retryable', False) else 'auth'
+    if isinstance(error, (SocialAccount.DoesNotExist, SocialToken.DoesNotExist)):
+        return 'auth'
+    if isinstance(error, HttpError):
+        if error.resp.status == 401 or (error.resp.status == 403 and not is_rate_limit_error(error)):
+            return 'auth'
+        if error.resp.status in (404, 410) and not EVENT_URI_RE.search(error.uri or ''):
+            return 'not_found'
+    return None
+
+
+def cooldown(failures):
+    steps = failures - settings.GOOGLE_SYNC_CIRCUIT_THRESHOLD
+    return min(settings.GOOGLE_SYNC_CIRCUIT_COOLDOWN * 2 ** steps, settings.GOOGLE_SYNC_CIRCUIT_MAX_COOLDOWN)
+
+
+def is_tripped(calendar):
+    """The account failed too often; stays true until a successful run or a reconnect."""
+    return calendar.sync_failures >= settings.GOOGLE_SYNC_CIRCUIT_THRESHOLD
+
+
+def is_open(calendar):
+    """Tripped and still cooling down: no sync attempts at all."""
+    return bool(calendar.circuit_open_until and calendar.circuit_open_until > timezone.now())
+
+
+def record_failure(user_id, error):
+    """Counts an account failure. Returns the failure reason, None if the error doesn't count."""
+    reason = failure_reason(error)
+    if reason is None:
+        return None
+    calendar = GoogleCalendar.objects.filter(user_id=user_id)
+    # Инкремент в БД: параллельные задачи пользователя не теряют сбои друг друга.
+    # Строка заблокирована UPDATE до конца транзакции, так что читаем свое значение
+    with transaction.atomic():
+        if not calendar.update(
+            sync_failures=F('sync_failures') + 1, last_failure_reason=reason, last_error=str(error)[:255]
+        ):
+            return reason
+        failures = calendar.values_list('sync_failures', flat=True).get()
+        if failures >= settings.GOOGLE_SYNC_CIRCUIT_THRESHOLD:
+            seconds = cooldown(failures)
+            calendar.update(circuit_open_until=timezone.now() + timedelta(seconds=seconds))
+            logger.warning(f"Circuit open for user {user_id} after {failures} failures ({reason}), cooling down {seconds}s")
+    return reason
+
+
+def record_success(user_id):
+    GoogleCalendar.objects.filter(user_id=user_id, sync_failures__gt=0).update(
+        sync_failures=0, circuit_open_until=None, last_failure_reason='', last_error=''
+    )
+
+
+def reset_circuit(user):
+    """Closes the circuit when the user reconnects their Google account.
+
+    A calendar that was gone in Google is dropped, so provisioning creates a new one.
+    """
+    calendar = GoogleCalendar.objects.filter(user=user).first()
+    if calendar is None or not calendar.sync_failures:
+        return
+    if is_tripped(calendar) and calendar.last_failure_reason == 'not_found':
+        logger.info(f"Dropping missing Google calendar {calendar.calendar_id} of user {user.id}")
+        calendar.delete()
+        # Старые google_event_id указывают в удаленный календарь, события уйдут в новый заново
+        Event.objects.filter(user=user).update(google_event_id=None, google_calendar_id=None)
+        ArchivedEvent.objects.filter(user=user).update(google_event_id=None, google_calendar_id=None)
+        return
+    record_success(user.id)
@@ -0,0 +1,246 @@
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from django.conf import settings
+from redis.exceptions import RedisError
+from core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+EXTEND_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def user_lease_key(user_id):
+    return f'gcal:lease:user:{user_id}'
+
+
+def event_lease_key(event_id):
+    return f'gcal:lease:event:{event_id}'
+
+
+def pending_pushes_key(user_id):
+    return f'gcal:pending:user:{user_id}'
+
+
+class RedisLeaseStore:
+    """Leases shared by every worker. Fails open when Redis is unreachable."""
+
+    def acquire(self, key, token, ttl):
+        try:
+            return bool(get_redis().set(key, token, nx=True, ex=ttl))
+        except RedisError as e:
+            # Без Redis работаем как раньше, без блокировки
+            logger.warning(f"Lease store unavailable, running {key} without a lease: {str(e)}")
+            return True
+
+    def extend(self, key, token, ttl):
+        try:
+            return bool(get_redis().eval(EXTEND_SCRIPT, 1, key, token, ttl))
+        except RedisError as e:
+            logger.warning(f"Failed to extend lease {key}: {str(e)}")
+            return False
+
+    def release(self, key, token):
+        try:
+            get_redis().eval(RELEASE_SCRIPT, 1, key, token)
+        except RedisError as e:
+            logger.warning(f"Failed to release lease {key}: {str(e)}")
+
+    def held(self, keys):
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for key in keys:
+                pipe.exists(key)
+            return [bool(held) for held in pipe.execute()]
+        except RedisError as e:
+            logger.warning(f"Could not check leases: {str(e)}")
+            return [False] * len(keys)
+
+    def add_pending(self, key, member, ttl):
+        try:
+            pipe = get_redis().pipeline()
+            pipe.sadd(key, member)
+            pipe.expire(key, ttl)
+            pipe.execute()
+            return True
+        except RedisError as e:
+            logger.warning(f"Could not add {member} to {key}: {str(e)}")
+            return False
+
+    def pop_pending(self, key):
+        try:
+            pipe = get_redis().pipeline()
+            pipe.smembers(key)
+            pipe.delete(key)
+            members, _ = pipe.execute()
+            return members
+        except RedisError as e:
+            logger.warning(f"Could not read {key}: {str(e)}")
+            return set()
+
+
+class MemoryLeaseStore:
+    """Process-local leases, for a single worker or tests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._leases = {}
+        self._pending = {}
+
+    def _alive(self, key):
+        lease = self._leases.get(key)
+        if lease and lease[1] <= time.monotonic():
+            del self._leases[key]
+            return None
+        return lease
+
+    def acquire(self, key, token, ttl):
+        with self._lock:
+            if self._alive(key):
+                return False
+            self._leases[key] = (token, time.monotonic() + ttl)
+            return True
+
+    def extend(self, key, token, ttl):
+        with self._lock:
+            lease = self._alive(key)
+            if not lease or lease[0] != token:
+                return False
+            self._leases[key] = (token, time.monotonic() + ttl)
+            return True
+
+    def release(self, key, token):
+        with self._lock:
+            lease = self._alive(key)
+            if lease and lease[0] == token:
+                del self._leases[key]
+
+    def held(self, keys):
+        with self._lock:
+            return [bool(self._alive(key)) for key in keys]
+
+    def add_pending(self, key, member, ttl):
+        with self._lock:
+            self._pending.setdefault(key, set()).add(str(member))
+            return True
+
+    def pop_pending(self, key):
+        with self._lock:
+            return self._pending.pop(key, set())
+
+
+_store = None
+
+def get_lease_store():
+    global _store
+    if _store is None:
+        if settings.GOOGLE_SYNC_LEASE_BACKEND == 'memory':
+            _store = MemoryLeaseStore()
+        else:
+            _store = RedisLeaseStore()
+    return _store
+
+
+class Lease:
+    """Lease with a TTL in the sync lease store.
+
+    Only the holder (identified by a random token) can extend or release it,
+    so a run that outlived its TTL can't drop a lease taken over by another
+    worker. With a heartbeat, a thread keeps extending the TTL while held.
+    """
+
+    def __init__(self, key, ttl):
+        self.key = key
+        self.ttl = ttl
+        self.token = uuid.uuid4().hex
+        self.store = get_lease_store()
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def acquire(self):
+        return self.store.acquire(self.key, self.token, self.ttl)
+
+    def extend(self):
+        return self.store.extend(self.key, self.token, self.ttl)
+
+    def release(self):
+        self.store.release(self.key, self.token)
+
+    def _beat(self):
+        interval = max(1, self.ttl // 3)
+        while not self._stop.wait(interval):
+            if not self.extend():
+                logger.warning(f"Lease {self.key} was lost while running")
+
+    def start_heartbeat(self):
+        self._heartbeat = threading.Thread(target=self._beat, name=f'lease-{self.key}', daemon=True)
+        self._heartbeat.start()
+
+    def stop_heartbeat(self):
+        self._stop.set()
+        if self._heartbeat:
+            self._heartbeat.join(timeout=1)
+
+
+@contextmanager
+def user_sync_lease(user_id):
+    """Single-flight guard for a user's sync. Yields None if another run holds it."""
+    lease = Lease(user_lease_key(user_id), settings.GOOGLE_SYNC_LEASE_TTL)
+    if not lease.acquire():
+        yield None
+        return
+    lease.start_heartbeat()
+    try:
+        yield lease
+    finally:
+        lease.stop_heartbeat()
+        lease.release()
+
+
+@contextmanager
+def event_sync_lease(event_id):
+    """Marks an event push as in flight. Yields None if it is already being pushed.
+
+    Replaces the old Event.is_syncing flag: the state expires on its own if a
+    worker dies, and taking it never writes to the event row.
+    """
+    lease = Lease(event_lease_key(event_id), settings.GOOGLE_SYNC_EVENT_LEASE_TTL)
+    if not lease.acquire():
+        yield None
+        return
+    try:
+        yield lease
+    finally:
+        lease.release()
+
+
+def running_user_syncs(user_ids):
+    """Returns the ids of users whose sync lease is currently held."""
+    user_ids = list(user_ids)
+    held = get_lease_store().held([user_lease_key(user_id) for user_id in user_ids])
+    return {user_id for user_id, is_held in zip(user_ids, held) if is_held}
+
+
+def defer_event_push(user_id, event_id):
+    """Folds an event push into the sync currently holding the user's lease."""
+    return get_lease_store().add_pending(
+        pending_pushes_key(user_id), event_id, settings.GOOGLE_SYNC_LEASE_TTL * 10
+    )
+
+
+def pop_deferred_pushes(user_id):
+    return sorted(int(event_id) for event_id in get_lease_store().pop_pending(pending_pushes_key(user_id)))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from googlecalendar.ratelimit import get_throttle_stats, reset_throttle_stats
+
+
+class Command(BaseCommand):
+    help = 'Shows how much Google API throttling happens across all workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after printing them')
+
+    def handle(self, *args, **options):
+        stats = get_throttle_stats()
+        if not stats:
+            self.stdout.write('No rate limiter stats recorded')
+        for name in sorted(stats):
+            self.stdout.write(f"{name}: {stats[name]}")
+        if options['reset']:
+            reset_throttle_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
@@ -0,0 +1,190 @@
+import logging
+import math
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import Aggregate, Count, IntegerField, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from redis.exceptions import RedisError
+from core.redis_client import get_redis
+from .models import SyncRun
+
+logger = logging.getLogger(__name__)
+
+# Пропущенные запуски (lease занят) - только счетчики по дням, без строк SyncRun
+SKIPPED_KEY = 'gcal:syncruns:skipped:{day}'
+
+
+class SyncRunRecorder:
+    """Collects the numbers of one sync run and saves them as a SyncRun.
+
+    Also works as a DB execute wrapper, counting the queries made by the run.
+    """
+
+    def __init__(self, user_id, kind, direction, count_queries=True):
+        self.user_id = user_id
+        self.kind = kind
+        self.direction = direction
+        self.status = 'ok'
+        self.error_class = ''
+        self.lag_ms = None
+        self.db_queries = 0 if count_queries else None
+        self.started_at = timezone.now()
+        self._started = time.perf_counter()
+        self._syncs = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.db_queries += 1
+        return execute(sql, params, many, context)
+
+    def track(self, sync):
+        """Adds the stats of a GoogleCalendarSync to this run."""
+        self._syncs.append(sync)
+        return sync
+
+    def skip(self):
+        self.status = 'skipped'
+
+    def fail(self, error):
+        self.status = 'error'
+        self.error_class = type(error).__name__
+
+    def set_lag(self, last_update):
+        self.lag_ms = max(0, int((timezone.now() - last_update).total_seconds() * 1000))
+
+    def save(self):
+        if self.status == 'skipped':
+            count_skipped_run(self.kind)
+            return None
+        stats = Counter()
+        for sync in self._syncs:
+            stats.update(sync.stats)
+        try:
+            return SyncRun.objects.create(
+                user_id=self.user_id,
+                kind=self.kind,
+                direction=self.direction,
+                status=self.status,
+                started_at=self.started_at,
+                duration_ms=int((time.perf_counter() - self._started) * 1000),
+                api_calls=stats['api_calls'],
+                db_queries=self.db_queries,
+                events_created=stats['created'],
+                events_updated=stats['updated'],
+                events_deleted=stats['deleted'],
+                events_rejected=stats['rejected'],
+                lag_ms=self.lag_ms,
+                error_class=self.error_class,
+            )
+        except Exception as e:
+            # Метрики не должны ронять синхронизацию
+            logger.error(f"Failed to record sync run for user {self.user_id}: {str(e)}")
+
+
+@contextmanager
+def record_sync_run(user_id, kind, direction):
+    """Records a SyncRun for the block, including the error class if it raises."""
+    recorder = SyncRunRecorder(user_id, kind, direction)
+    try:
+        with connection.execute_wrapper(recorder):
+            yield recorder
+    except Exception as e:
+        recorder.fail(e)
+        raise
+    finally:
+        recorder.save()
+
+
+def count_skipped_run(kind):
+    key = SKIPPED_KEY.format(day=timezone.now().date().isoformat())
+    try:
+        pipe = get_redis().pipeline()
+        pipe.hincrby(key, kind, 1)
+        pipe.expire(key, timedelta(days=settings.GOOGLE_SYNC_RUN_RETENTION_DAYS + 1))
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Could not count skipped {kind} sync run: {str(e)}")
+
+
+def skipped_run_counts(days):
+    """Skipped runs of every user over the last `days` days (today included), by kind."""
+    today = timezone.now().date()
+    # Старше срока хранения счетчиков уже нет
+    days = min(days, settings.GOOGLE_SYNC_RUN_RETENTION_DAYS + 1)
+    try:
+        pipe = get_redis().pipeline()
+        for offset in range(days):
+            pipe.hgetall(SKIPPED_KEY.format(day=(today - timedelta(days=offset)).isoformat()))
+        daily = pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Could not read skipped sync runs: {str(e)}")
+        return {}
+    counts = Counter()
+    for day in daily:
+        counts.update({kind: int(value) for kind, value in day.items()})
+    return dict(counts)
+
+
+class PercentileDisc(Aggregate):
+    """PostgreSQL ordered-set aggregate, the same nearest rank as percentile()."""
+    function = 'PERCENTILE_DISC'
+    template = '%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = IntegerField()
+
+    def __init__(self, expression, q, **extra):
+        super().__init__(expression, fraction=float(q) / 100, **extra)
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list, None if empty."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _ranked_value(runs, field, count, q):
+    """percentile() without loading the column: one ORDER BY ... OFFSET query."""
+    if not count:
+        return None
+    rank = max(1, math.ceil(q / 100 * count))
+    return runs.filter(**{f'{field}__isnull': False}).order_by(field).values_list(field, flat=True)[rank - 1]
+
+
+def summarize_sync_runs(runs):
+    """Aggregates for a SyncRun queryset: counts, p50/p95 duration and local edit to Google lag.
+
+    Everything is computed in the DB: one aggregate query on PostgreSQL,
+    elsewhere an aggregate plus one indexed lookup per percentile.
+    """
+    # Строки 'skipped' от старых версий не учитываем, пропуски теперь в skipped_run_counts
+    runs = runs.exclude(status='skipped').order_by()
+    aggregates = {
+        'runs': Count('id'),
+        'errors': Count('id', filter=Q(status='error')),
+        'api_calls': Coalesce(Sum('api_calls'), 0),
+        'lags': Count('lag_ms'),
+    }
+    postgres = connections[runs.db].vendor == 'postgresql'
+    if postgres:
+        for field in ('duration_ms', 'lag_ms'):
+            for q in (50, 95):
+                aggregates[f'{field}_p{q}'] = PercentileDisc(field, q)
+    row = runs.aggregate(**aggregates)
+    summary = {'runs': row['runs'], 'errors': row['errors'], 'api_calls': row['api_calls']}
+    for field, count in (('duration_ms', row['runs']), ('lag_ms', row['lags'])):
+        summary[field] = {
+            f'p{q}': row[f'{field}_p{q}'] if postgres else _ranked_value(runs, field, count, q)
+            for q in (50, 95)
+        }
+    return summary
+
+
+def prune_old_sync_runs(days=None):
+    days = days if days is not None else settings.GOOGLE_SYNC_RUN_RETENTION_DAYS
+    deleted, _ = SyncRun.objects.filter(started_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
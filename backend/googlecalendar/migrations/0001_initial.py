@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-19 05:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoogleCalendar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('calendar_id', models.CharField(max_length=255, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_sync', models.DateTimeField(null=True)),
+            ],
+            options={
+                'verbose_name': 'Google Calendar',
+                'verbose_name_plural': 'Google Calendars',
+            },
+        ),
+    ]
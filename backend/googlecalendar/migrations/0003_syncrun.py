@@ -0,0 +1,40 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('googlecalendar', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('full', 'Full sync'), ('event', 'Single event'), ('backfill', 'Backfill')], max_length=10)),
+                ('direction', models.CharField(choices=[('google_to_local', 'Google to local'), ('local_to_google', 'Local to Google'), ('both', 'Both')], max_length=20)),
+                ('status', models.CharField(choices=[('ok', 'OK'), ('error', 'Error'), ('skipped', 'Skipped')], default='ok', max_length=10)),
+                ('started_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('duration_ms', models.PositiveIntegerField(default=0)),
+                ('api_calls', models.PositiveIntegerField(default=0)),
+                ('db_queries', models.PositiveIntegerField(blank=True, null=True)),
+                ('events_created', models.PositiveIntegerField(default=0)),
+                ('events_updated', models.PositiveIntegerField(default=0)),
+                ('events_deleted', models.PositiveIntegerField(default=0)),
+                ('events_rejected', models.PositiveIntegerField(default=0)),
+                ('lag_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('error_class', models.CharField(blank=True, max_length=100)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_runs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Sync run',
+                'verbose_name_plural': 'Sync runs',
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('googlecalendar', '0003_syncrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='googlecalendar',
+            name='sync_failures',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='googlecalendar',
+            name='circuit_open_until',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='googlecalendar',
+            name='last_failure_reason',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='googlecalendar',
+            name='last_error',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
@@ -11,10 +11,89 @@ class GoogleCalendar(models.Model):
     calendar_id = models.CharField(max_length=255, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     last_sync = models.DateTimeField(null=True)
+    # Circuit breaker (circuit.py): подряд идущие ошибки доступа к аккаунту/календарю
+    sync_failures = models.PositiveIntegerField(default=0)
+    circuit_open_until = models.DateTimeField(null=True, blank=True, db_index=True)
+    last_failure_reason = models.CharField(max_length=20, blank=True)
+    last_error = models.CharField(max_length=255, blank=True)
 
     class Meta:
         verbose_name = "Google Calendar"
         verbose_name_plural = "Google Calendars"
 
     def __str__(self):
-        return f"Calendar {self.calendar_id} for {self.user.email}"
\ No newline at end of file
+        return f"Calendar {self.calendar_id} for {self.user.email}"
+
+
+class SyncRun(models.Model):
+    KINDS = [
+        ('full', 'Full sync'),
+        ('event', 'Single event'),
+        ('backfill', 'Backfill'),
+    ]
+    DIRECTIONS = [
+        ('google_to_local', 'Google to local'),
+        ('local_to_google', 'Local to Google'),
+        ('both', 'Both'),
+    ]
+    STATUSES = [
+        ('ok', 'OK'),
+        ('error', 'Error'),
+        ('skipped', 'Skipped'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sync_runs')
+    kind = models.CharField(max_length=10, choices=KINDS)
+    direction = models.CharField(max_length=20, choices=DIRECTIONS)
+    status = models.CharField(max_length=10, choices=STATUSES, default='ok')
+    started_at = models.DateTimeField(default=timezone.now, db_index=True)
+    duration_ms = models.PositiveIntegerField(default=0)
+    api_calls = models.PositiveIntegerField(default=0)
+    db_queries = models.PositiveIntegerField(null=True, blank=True)
+    events_created = models.PositiveIntegerField(default=0)
+    events_updated = models.PositiveIntegerField(default=0)
+    events_deleted = models.PositiveIntegerField(default=0)
+    events_rejected = models.PositiveIntegerField(default=0)
+    # Время от локального изменения события до записи в Google (только для kind=event)
+    lag_ms = models.PositiveIntegerField(null=True, blank=True)
+    error_class = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+        verbose_name = "Sync run"
+        verbose_name_plural = "Sync runs"
+
+    def __str__(self):
+        return f"{self.get_kind_display()} sync for user {self.user_id} at {self.started_at:%Y-%m-%d %H:%M:%S}"
+
+
+class CalendarBackfill(models.Model):
+    """Progress of pushing existing local events into a newly connected calendar."""
+    STATUSES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='calendar_backfills')
+    status = models.CharField(max_length=10, choices=STATUSES, default='pending')
+    total = models.PositiveIntegerField(default=0)
+    pushed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Backfill for user {self.user_id}: {self.status} {self.percent}%"
+
+    @property
+    def percent(self):
+        if not self.total:
+            return 100 if self.status == 'done' else 0
+        return min(100, (self.pushed + self.failed) * 100 // self.total)
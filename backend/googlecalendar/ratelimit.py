@@ -0,0 +1,194 @@
+import json
+import logging
+import random
+import time
+from django.conf import settings
+from googleapiclient.errors import HttpError
+from redis.exceptions import RedisError
+from core.profiling import track_google
+from core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded', 'quotaExceeded'}
+STATS_KEY = 'gcal:ratelimit:stats'
+
+# Token bucket over several keys at once (project + user). Tokens are taken
+# from every bucket or from none, so a user can't drain the project budget
+# while waiting on its own one. The last key is STATS_KEY: granted tokens are
+# counted there in the same round trip. Returns the seconds to wait as a string.
+TOKEN_BUCKET_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local n = #KEYS - 1
+local requested = tonumber(ARGV[2 * n + 1])
+local levels = {}
+local wait = 0
+for i = 1, n do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local capacity = tonumber(ARGV[2 * i])
+    local bucket = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < requested then
+        wait = math.max(wait, (requested - tokens) / rate)
+    end
+end
+for i = 1, n do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local capacity = tonumber(ARGV[2 * i])
+    local tokens = levels[i]
+    if wait == 0 then
+        tokens = tokens - requested
+    end
+    redis.call('HSET', KEYS[i], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[i], math.ceil(capacity / rate) + 1)
+end
+if wait == 0 then
+    redis.call('HINCRBY', KEYS[n + 1], 'acquired', requested)
+end
+return tostring(wait)
+"""
+
+
+class GoogleApiRateLimiter:
+    """Cluster-wide token buckets for Google Calendar API calls.
+
+    Every worker shares the same per-project bucket and a per-user bucket
+    in Redis. If Redis is unreachable the limiter fails open, so sync keeps
+    working (and backoff on 429/403 still applies).
+    """
+
+    _script = None
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        limits = settings.GOOGLE_API_RATE_LIMITS
+        self.buckets = [
+            ('gcal:ratelimit:project', limits['project']),
+            (f'gcal:ratelimit:user:{user_id}', limits['user']),
+        ]
+
+    @property
+    def enabled(self):
+        return settings.GOOGLE_API_RATE_LIMIT_ENABLED
+
+    def _get_script(self):
+        if GoogleApiRateLimiter._script is None:
+            GoogleApiRateLimiter._script = get_redis().register_script(TOKEN_BUCKET_SCRIPT)
+        return GoogleApiRateLimiter._script
+
+    def try_acquire(self, tokens=1):
+        """Takes `tokens` if available. Returns 0, or the seconds to wait before retrying."""
+        if not self.enabled:
+            return 0
+        keys = [key for key, _ in self.buckets] + [STATS_KEY]
+        args = []
+        for _, limit in self.buckets:
+            args.extend([limit['rate'], limit['capacity']])
+        args.append(tokens)
+        try:
+            return float(self._get_script()(keys=keys, args=args))
+        except RedisError as e:
+            logger.warning(f"Rate limiter unavailable, proceeding without it: {str(e)}")
+            return 0
+
+    def acquire(self, tokens=1):
+        """Blocks until `tokens` are granted by every bucket."""
+        # A request bigger than the smallest bucket would never fit, take it in parts
+        chunk = max(1, int(min(limit['capacity'] for _, limit in self.buckets)))
+        while tokens > 0:
+            step = min(tokens, chunk)
+            waited = 0
+            while True:
+                wait = self.try_acquire(step)
+                if not wait:
+                    break
+                wait = min(wait, settings.GOOGLE_API_BACKOFF_MAX)
+                waited += wait
+                time.sleep(wait)
+            if waited:
+                record_stat('throttled')
+                record_stat('throttled_ms', int(waited * 1000))
+            tokens -= step
+
+
+def record_stat(name, amount=1):
+    if not settings.GOOGLE_API_RATE_LIMIT_ENABLED:
+        return
+    try:
+        get_redis().hincrby(STATS_KEY, name, amount)
+    except RedisError:
+        pass
+
+
+def get_throttle_stats():
+    """Counters for how much throttling happens across the cluster."""
+    try:
+        stats = get_redis().hgetall(STATS_KEY)
+    except RedisError as e:
+        logger.warning(f"Could not read rate limiter stats: {str(e)}")
+        return {}
+    return {key: int(value) for key, value in stats.items()}
+
+
+def reset_throttle_stats():
+    try:
+        get_redis().delete(STATS_KEY)
+    except RedisError as e:
+        logger.warning(f"Could not reset rate limiter stats: {str(e)}")
+
+
+def is_rate_limit_error(error):
+    if not isinstance(error, HttpError):
+        return False
+    if error.resp.status == 429:
+        return True
+    if error.resp.status != 403:
+        return False
+    try:
+        data = json.loads(error.content.decode('utf-8'))
+        errors = data.get('error', {}).get('errors', [])
+        return any(item.get('reason') in RATE_LIMIT_REASONS for item in errors)
+    except (ValueError, AttributeError):
+        return any(reason.encode() in error.content for reason in RATE_LIMIT_REASONS)
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter."""
+    ceiling = min(settings.GOOGLE_API_BACKOFF_MAX, settings.GOOGLE_API_BACKOFF_BASE * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+def execute_with_backoff(request, limiter, cost=1):
+    """Runs a googleapiclient request under the rate limiter.
+
+    429 and 403 rateLimitExceeded responses are retried with exponential
+    backoff and jitter, up to GOOGLE_API_MAX_RETRIES times.
+    """
+    max_retries = settings.GOOGLE_API_MAX_RETRIES
+    for attempt in range(max_retries + 1):
+        limiter.acquire(cost)
+        try:
+            with track_google():
+                return request.execute()
+        except HttpError as e:
+            if not is_rate_limit_error(e):
+                raise
+            if attempt == max_retries:
+                record_stat('exhausted')
+                raise
+            delay = backoff_delay(attempt)
+            record_stat('backoff')
+            record_stat('backoff_ms', int(delay * 1000))
+            logger.warning(f"Google API rate limit hit for user {limiter.user_id} (status {e.resp.status}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def retry_countdown(error, retries, default):
+    """Countdown for a Celery retry: backoff with jitter for rate limits, `default` otherwise."""
+    if is_rate_limit_error(error):
+        return max(1, int(backoff_delay(retries + 3)))
+    return default
@@ -0,0 +1,70 @@
+"""Celery routing for the Google sync tasks (CELERY_TASK_ROUTES).
+
+Interactive pushes, periodic full syncs and calendar provisioning go to
+separate queues, so a teacher's edit never waits behind the minute beat.
+Interactive and bulk queues are split into GOOGLE_SYNC_QUEUE_PARTITIONS
+partitions by user id: all tasks of one user land in the same partition,
+and with one worker process per partition they run one after another.
+Between the interactive and bulk partition of the same user the sync
+leases (leases.py) keep runs from overlapping.
+
+The router only reads the user from keyword arguments: callers pass
+user_id= (user_ids= for chunks, which queue_full_syncs fills with users of
+one partition, so the first one routes them all). Positional arguments mean different
+things per task (sync_single_event takes the event id first), a task
+queued without them goes to partition 0.
+"""
+from django.conf import settings
+
+INTERACTIVE_QUEUE = 'gcal.interactive'
+BULK_QUEUE = 'gcal.bulk'
+PROVISIONING_QUEUE = 'gcal.provisioning'
+MAINTENANCE_QUEUE = 'gcal.maintenance'
+
+# Для Redis меньшее число - выше приоритет (0..9)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_PROVISIONING = 3
+PRIORITY_BULK = 6
+PRIORITY_MAINTENANCE = 9
+
+
+def partition(user_id):
+    return int(user_id) % settings.GOOGLE_SYNC_QUEUE_PARTITIONS
+
+
+def partition_queue(base, user_id):
+    return f'{base}.{partition(user_id)}'
+
+
+def all_queues():
+    """Every queue the sync tasks can be routed to, e.g. for `celery worker -Q`."""
+    partitions = range(settings.GOOGLE_SYNC_QUEUE_PARTITIONS)
+    return (
+        [f'{INTERACTIVE_QUEUE}.{i}' for i in partitions]
+        + [f'{BULK_QUEUE}.{i}' for i in partitions]
+        + [PROVISIONING_QUEUE, MAINTENANCE_QUEUE]
+    )
+
+
+def _user_id(kwargs):
+    if kwargs.get('user_id') is not None:
+        return kwargs['user_id']
+    user_ids = kwargs.get('user_ids')
+    return user_ids[0] if user_ids else 0
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    if not name.startswith('googlecalendar.tasks.'):
+        return None
+    task_name = name.rsplit('.', 1)[1]
+
+    kwargs = kwargs or {}
+    if task_name == 'sync_single_event':
+        return {'queue': partition_queue(INTERACTIVE_QUEUE, _user_id(kwargs)), 'priority': PRIORITY_INTERACTIVE}
+    if task_name in ('full_sync_user', 'full_sync_users_chunk'):
+        return {'queue': partition_queue(BULK_QUEUE, _user_id(kwargs)), 'priority': PRIORITY_BULK}
+    if task_name in ('create_google_calendar_task', 'backfill_calendar'):
+        return {'queue': PROVISIONING_QUEUE, 'priority': PRIORITY_PROVISIONING}
+    if task_name in ('periodic_full_sync', 'prune_sync_runs'):
+        return {'queue': MAINTENANCE_QUEUE, 'priority': PRIORITY_MAINTENANCE}
+    return None
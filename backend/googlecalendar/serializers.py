@@ -0,0 +1,19 @@
+from rest_framework import serializers
+from .models import SyncRun, CalendarBackfill
+
+class SyncRunSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SyncRun
+        fields = [
+            'id', 'kind', 'direction', 'status', 'started_at', 'duration_ms', 'api_calls', 'db_queries',
+            'events_created', 'events_updated', 'events_deleted', 'events_rejected', 'lag_ms', 'error_class',
+        ]
+        read_only_fields = fields
+
+class CalendarBackfillSerializer(serializers.ModelSerializer):
+    percent = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = CalendarBackfill
+        fields = ['id', 'status', 'total', 'pushed', 'failed', 'percent', 'error', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
@@ -1,58 +1,99 @@
 import logging
-from datetime import timedelta, datetime
+import time
+from collections import Counter
+from datetime import timedelta, datetime, timezone as dt_timezone
 from django.utils import timezone
 from googleapiclient.discovery import build
 from google.oauth2.credentials import Credentials
 from googleapiclient.errors import HttpError
 from google.auth.transport.requests import Request
-from allauth.socialaccount.models import SocialAccount, SocialApp
-from planner.models import Event, Group, Subject, Plan
+from allauth.socialaccount.models import SocialAccount, SocialApp, SocialToken
+from planner.models import Event, Group, Subject, Plan, overlap_enforced_by_db, is_overlap_violation
 from .models import GoogleCalendar
+from .ratelimit import GoogleApiRateLimiter, execute_with_backoff, is_rate_limit_error, backoff_delay
+from .leases import event_sync_lease
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.db.models import Q
+from core.profiling import track_google
 
 logger = logging.getLogger(__name__)
 
+# Метка событий, созданных планировщиком, в extendedProperties.private
+PRIVATE_SOURCE = 'teacher_planner'
+
+
+def _private_id(private, key):
+    try:
+        return int(private[key])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
 class GoogleCalendarSync:
     FIXED_DURATION = timedelta(hours=1, minutes=30)
     GOOGLE_API_VERSION = 'v3'
     GOOGLE_API_SERVICE_NAME = 'calendar'
     
-    def __init__(self, user):
+    def __init__(self, user, service=None):
         self.user = user
-        self.service = self._initialize_service()
+        self.limiter = GoogleApiRateLimiter(user.id)
+        # Счетчики для SyncRun: api_calls, created, updated, deleted, rejected
+        self.stats = Counter()
+        self._lookup_cache = None
+        self.service = service or self._initialize_service()
         self.calendar_id = self._get_or_create_calendar()
 
+    def _load_credentials(self):
+        social_app = SocialApp.objects.get(provider='google')
+        social_account = SocialAccount.objects.get(user=self.user, provider='google')
+        social_token = social_account.socialtoken_set.first()
+        if social_token is None:
+            raise SocialToken.DoesNotExist(f"No Google token for user {self.user.id}")
+        
+        expiry = social_token.expires_at
+        credentials = Credentials(
+            token=social_token.token,
+            refresh_token=social_token.token_secret,
+            token_uri='https://oauth2.googleapis.com/token',
+            client_id=social_app.client_id,
+            client_secret=social_app.secret,
+            # google-auth сравнивает expiry в naive UTC; без него expired всегда False
+            expiry=timezone.make_naive(expiry, dt_timezone.utc) if expiry else None,
+        )
+        self._social_token = social_token
+
+        # expired срабатывает заранее, за REFRESH_THRESHOLD (несколько минут) до истечения
+        if credentials.expired:
+            self._refresh_credentials(credentials)
+        return credentials
+
+    def _refresh_credentials(self, credentials):
+        """Refreshes the access token and stores it, the next load starts from the new one."""
+        credentials.refresh(Request())
+        social_token = self._social_token
+        social_token.token = credentials.token
+        social_token.token_secret = credentials.refresh_token or social_token.token_secret
+        social_token.expires_at = timezone.make_aware(credentials.expiry, dt_timezone.utc) if credentials.expiry else None
+        social_token.save(update_fields=['token', 'token_secret', 'expires_at'])
+        logger.info(f"Refreshed Google access token of user {self.user.id}")
+
     def _initialize_service(self):
         try:
-            social_app = SocialApp.objects.get(provider='google')
-            social_account = SocialAccount.objects.get(user=self.user, provider='google')
-            social_token = social_account.socialtoken_set.first()
-            
-            credentials = Credentials(
-                token=social_token.token,
-                refresh_token=social_token.token_secret,
-                token_uri='https://oauth2.googleapis.com/token',
-                client_id=social_app.client_id,
-                client_secret=social_app.secret
-            )
-            
-            if credentials.expired:
-                credentials.refresh(Request())
-                social_token.token = credentials.token
-                social_token.token_secret = credentials.refresh_token
-                social_token.save()
-            
             return build(
                 self.GOOGLE_API_SERVICE_NAME,
                 self.GOOGLE_API_VERSION,
-                credentials=credentials,
+                credentials=self._load_credentials(),
                 cache_discovery=False
             )
         except Exception as e:
             logger.error(f"Service initialization failed: {str(e)}")
             raise
 
+    def _execute(self, request):
+        self.stats['api_calls'] += 1
+        return execute_with_backoff(request, self.limiter)
+
     def _get_or_create_calendar(self):
         try:
             return self.user.google_calendar.calendar_id
@@ -66,15 +107,35 @@ class GoogleCalendarSync:
             'description': 'Automatically created by Teacher Planner System'
         }
         try:
-            created_calendar = self.service.calendars().insert(body=calendar_body).execute()
+            created_calendar = self._execute(self.service.calendars().insert(body=calendar_body))
             GoogleCalendar.objects.create(user=self.user, calendar_id=created_calendar['id'])
             return created_calendar['id']
         except Exception as e:
             logger.error(f"Calendar creation failed: {str(e)}")
             raise
 
+    def _lookups(self):
+        """Groups, subjects and plans of the user, loaded once per pull."""
+        if self._lookup_cache is None:
+            groups = list(Group.objects.filter(user=self.user))
+            subjects = list(Subject.objects.filter(user=self.user))
+            self._lookup_cache = {
+                'group_by_id': {group.id: group for group in groups},
+                'group_by_name': {group.name: group for group in groups},
+                'subject_by_id': {subject.id: subject for subject in subjects},
+                'subject_by_name': {subject.name: subject for subject in subjects},
+                'plan': {(plan.group_id, plan.subject_id): plan for plan in Plan.objects.filter(user=self.user)},
+            }
+        return self._lookup_cache
+
+    def _resolve(self, kind, object_id, name):
+        lookups = self._lookups()
+        return lookups[f'{kind}_by_id'].get(object_id) or lookups[f'{kind}_by_name'].get(name)
+
     def _parse_google_event(self, google_event):
         try:
+            # Метаданные планировщика; у старых событий их нет, тогда разбираем описание
+            private = google_event.get('extendedProperties', {}).get('private', {})
             description = google_event.get('description', '')
             parts = {}
             for line in description.split('\n'):
@@ -100,9 +161,12 @@ class GoogleCalendarSync:
                 'start': start,
                 'end': end,
                 'location': google_event.get('location', ''),
+                'local_id': _private_id(private, 'tp_event_id'),
+                'group_id': _private_id(private, 'tp_group_id'),
+                'subject_id': _private_id(private, 'tp_subject_id'),
                 'group_name': parts.get('Group', ''),
                 'subject_name': parts.get('Subject', ''),
-                'type': parts.get('Type', 'other').lower(),
+                'type': (private.get('tp_type') or parts.get('Type', 'other')).lower(),
                 'updated': updated
             }
         except Exception as e:
@@ -110,15 +174,15 @@ class GoogleCalendarSync:
             return None
 
     def _validate_google_event(self, parsed_event):
-        try:
-            Group.objects.get(user=self.user, name=parsed_event['group_name'])
-            Subject.objects.get(user=self.user, name=parsed_event['subject_name'])
-        except (Group.DoesNotExist, Subject.DoesNotExist) as e:
-            logger.warning(f"Related object not found: {str(e)}. Deleting Google event.")
+        group = self._resolve('group', parsed_event.get('group_id'), parsed_event['group_name'])
+        subject = self._resolve('subject', parsed_event.get('subject_id'), parsed_event['subject_name'])
+        if not group or not subject:
+            logger.warning(f"Related group or subject not found for Google event {parsed_event.get('id')}. Deleting Google event.")
             self._delete_google_event(parsed_event['id'])
             return False
+        parsed_event['group'], parsed_event['subject'] = group, subject
 
-        required_fields = ['group_name', 'subject_name', 'type', 'start', 'end']
+        required_fields = ['type', 'start', 'end']
         if not all(parsed_event.get(field) for field in required_fields):
             logger.warning(f"Missing required fields in parsed event {parsed_event.get('id')}")
             return False
@@ -133,33 +197,37 @@ class GoogleCalendarSync:
                 logger.warning(f"Invalid duration for {parsed_event['type']} for parsed event {parsed_event.get('id')}")
                 return False
 
-        overlapping = Event.objects.filter(
-            Q(start__lt=parsed_event['end']) & Q(end__gt=parsed_event['start']),
-            user=self.user
-        ).exclude(google_event_id=parsed_event['id'])
-        
-        if overlapping.exists():
-            logger.warning(f"Parsed event {parsed_event.get('id')} overlaps with existing events")
-            return False
+        # Само событие не считаем: ни по google_event_id, ни по локальному id из extendedProperties
+        same_event = Q(google_event_id=parsed_event['id'])
+        if parsed_event.get('local_id'):
+            same_event |= Q(pk=parsed_event['local_id'])
 
-        try:
-            group = Group.objects.get(user=self.user, name=parsed_event['group_name'])
-            subject = Subject.objects.get(user=self.user, name=parsed_event['subject_name'])
-            plan = Plan.objects.get(user=self.user, group=group, subject=subject)
-            
-            events_qs = Event.objects.filter(
-                user=self.user, group=group, subject=subject, type=parsed_event['type']
-            ).exclude(google_event_id=parsed_event['id'])
-            
-            total_duration_seconds = sum((e.end - e.start).total_seconds() for e in events_qs) + duration.total_seconds()
-            max_duration_seconds = getattr(plan, f"{parsed_event['type']}_hours", 0) * 3600
-            
-            if total_duration_seconds > max_duration_seconds:
-                logger.warning(f"Parsed event {parsed_event.get('id')} exceeds plan duration limit")
+        # В PostgreSQL пересечение отклонит exclusion constraint в _save_google_event
+        if not overlap_enforced_by_db():
+            overlapping = Event.objects.filter(
+                Q(start__lt=parsed_event['end']) & Q(end__gt=parsed_event['start']),
+                user=self.user
+            ).exclude(same_event)
+
+            if overlapping.exists():
+                logger.warning(f"Parsed event {parsed_event.get('id')} overlaps with existing events")
                 return False
-        except Plan.DoesNotExist:
+
+        plan = self._lookups()['plan'].get((group.id, subject.id))
+        if plan is None:
             logger.warning(f"Related plan not found for parsed event {parsed_event.get('id')}")
             return False
+
+        events_qs = Event.objects.filter(
+            user=self.user, group=group, subject=subject, type=parsed_event['type']
+        ).exclude(same_event)
+
+        total_duration_seconds = sum((e.end - e.start).total_seconds() for e in events_qs) + duration.total_seconds()
+        max_duration_seconds = getattr(plan, f"{parsed_event['type']}_hours", 0) * 3600
+
+        if total_duration_seconds > max_duration_seconds:
+            logger.warning(f"Parsed event {parsed_event.get('id')} exceeds plan duration limit")
+            return False
         
         return True
 
@@ -173,22 +241,27 @@ class GoogleCalendarSync:
         
         return google_updated_ts > local_updated_ts
 
+    def _local_is_newer(self, event, google_event):
+        google_updated_str = google_event.get('updated')
+        if not google_updated_str:
+             return True
+
+        google_updated_ts = timezone.datetime.fromisoformat(google_updated_str.replace('Z', '+00:00'))
+        
+        local_updated_ts = event.last_update
+        if timezone.is_naive(local_updated_ts):
+             local_updated_ts = timezone.make_aware(local_updated_ts, timezone.get_default_timezone())
+
+        return local_updated_ts > google_updated_ts
+
     def _should_update_google(self, event):
         if not event.google_event_id:
             return True
         try:
-            google_event = self.service.events().get(calendarId=self.calendar_id, eventId=event.google_event_id).execute()
-            google_updated_str = google_event.get('updated')
-            if not google_updated_str:
-                 return True
-
-            google_updated_ts = timezone.datetime.fromisoformat(google_updated_str.replace('Z', '+00:00'))
-            
-            local_updated_ts = event.last_update
-            if timezone.is_naive(local_updated_ts):
-                 local_updated_ts = timezone.make_aware(local_updated_ts, timezone.get_default_timezone())
-
-            return local_updated_ts > google_updated_ts
+            google_event = self._execute(self.service.events().get(
+                calendarId=self.calendar_id, eventId=event.google_event_id, fields='id,updated'
+            ))
+            return self._local_is_newer(event, google_event)
         except HttpError as e:
             if e.resp.status == 404:
                 return True
@@ -198,88 +271,149 @@ class GoogleCalendarSync:
             logger.error(f"Failed to check Google version for event {event.id}: {str(e)}")
             return False
 
-    def sync_google_to_local(self):
-        try:
-            events_from_google = []
-            page_token = None
-            time_min = (timezone.now() - timedelta(days=30)).isoformat()
+    def _sync_window(self):
+        now = timezone.now()
+        return (
+            now - timedelta(days=settings.GOOGLE_SYNC_WINDOW_PAST_DAYS),
+            now + timedelta(days=settings.GOOGLE_SYNC_WINDOW_FUTURE_DAYS),
+        )
+
+    def _list_params(self):
+        time_min, time_max = self._sync_window()
+        params = {
+            'timeMin': time_min.isoformat(),
+            'timeMax': time_max.isoformat(),
+            'singleEvents': True,
+            'orderBy': 'startTime',
+            'showDeleted': True,
+            'maxResults': settings.GOOGLE_SYNC_PAGE_SIZE,
+            'fields': settings.GOOGLE_SYNC_LIST_FIELDS,
+        }
+        if settings.GOOGLE_SYNC_ONLY_PLANNER_EVENTS:
+            params['privateExtendedProperty'] = f'tp_source={PRIVATE_SOURCE}'
+        return params
+
+    def _list_google_events(self):
+        events_from_google = []
+        page_token = None
+        params = self._list_params()
+        while True:
+            result = self._execute(self.service.events().list(
+                calendarId=self.calendar_id,
+                pageToken=page_token,
+                **params
+            ))
+            events_from_google.extend(result.get('items', []))
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                break
+        return events_from_google
+
+    def _apply_google_events(self, events_from_google):
+        """Applies listed Google events to local ones. Returns the processed Google ids."""
+        processed_google_ids = set()
+        self._lookup_cache = None
+        local_events = {
+            event.google_event_id: event
+            for event in Event.objects.filter(user=self.user, google_event_id__isnull=False)
+        }
+        for google_event_data in events_from_google:
+            event_id = google_event_data.get('id')
             
-            logger.info(f"Starting sync_google_to_local for user {self.user.id}")
-            while True:
-                result = self.service.events().list(
-                    calendarId=self.calendar_id,
-                    timeMin=time_min,
-                    pageToken=page_token,
-                    singleEvents=True,
-                    orderBy='startTime',
-                    showDeleted=True
-                ).execute()
-                events_from_google.extend(result.get('items', []))
-                page_token = result.get('nextPageToken')
-                if not page_token:
-                    break
-
-            logger.info(f"Total events to check: {len(events_from_google)}")
-
-            processed_google_ids = set()
-            for google_event_data in events_from_google:
-                event_id = google_event_data.get('id')
+            # Обработка удаленных событий FIRST
+            if google_event_data.get('status') == 'cancelled':
+                deleted_count, _ = Event.objects.filter(google_event_id=event_id).delete()
+                if deleted_count > 0:
+                    self.stats['deleted'] += deleted_count
+                    logger.debug("Deleted local event with Google ID %s (marked as cancelled in Google)", event_id)
+                processed_google_ids.add(event_id)
+                continue
+
+            parsed_event = self._parse_google_event(google_event_data)
+            if not parsed_event:
+                processed_google_ids.add(event_id)
+                continue
                 
-                # Обработка удаленных событий FIRST
-                if google_event_data.get('status') == 'cancelled':
-                    deleted_count, _ = Event.objects.filter(google_event_id=event_id).delete()
-                    if deleted_count > 0:
-                        logger.info(f"Deleted local event with Google ID {event_id} (marked as cancelled in Google)")
-                    processed_google_ids.add(event_id)
-                    continue
+            processed_google_ids.add(parsed_event['id'])
 
-                parsed_event = self._parse_google_event(google_event_data)
-                if not parsed_event:
-                    processed_google_ids.add(event_id)
-                    continue
-                    
+            if not self._validate_google_event(parsed_event):
+                logger.warning(f"Google event {parsed_event['id']} is invalid. Deleting from Google.")
+                self.stats['rejected'] += 1
+                self._delete_google_event(parsed_event['id'])
                 processed_google_ids.add(parsed_event['id'])
+                continue
 
-                if not self._validate_google_event(parsed_event):
-                    logger.warning(f"Google event {parsed_event['id']} is invalid. Deleting from Google.")
-                    self._delete_google_event(parsed_event['id'])
-                    processed_google_ids.add(parsed_event['id'])
-                    continue
-
-                local_event = Event.objects.filter(google_event_id=parsed_event['id'], user=self.user).first()
-                
-                if self._should_update_local(local_event, parsed_event['updated']):
-                    self._save_google_event(parsed_event, local_event)
-                else:
-                    logger.info(f"Skipping Google event {parsed_event['id']} as local version is newer or same.")
+            local_event = local_events.get(parsed_event['id']) or self._link_local_event(parsed_event)
             
+            if self._should_update_local(local_event, parsed_event['updated']):
+                self._save_google_event(parsed_event, local_event)
+            else:
+                logger.debug("Skipping Google event %s as local version is newer or same.", parsed_event['id'])
+        return processed_google_ids
+
+    def _link_local_event(self, parsed_event):
+        """Links the local event a Google event was pushed from, when its google_event_id was never stored."""
+        if not parsed_event.get('local_id'):
+            return None
+        local_event = Event.objects.filter(
+            pk=parsed_event['local_id'], user=self.user, google_event_id__isnull=True
+        ).first()
+        if local_event:
+            local_event.google_event_id = parsed_event['id']
+            self._store_google_ids(local_event)
+            logger.debug("Linked local event %s to Google event %s", local_event.id, parsed_event['id'])
+        return local_event
+
+    def _stale_local_events(self, processed_google_ids):
+        """Local events linked to Google that were not in the listing.
+
+        Only events inside the sync window: the listing doesn't cover the rest.
+        """
+        time_min, time_max = self._sync_window()
+        return list(Event.objects.filter(
+            user=self.user,
+            google_calendar_id=self.calendar_id,
+            google_event_id__isnull=False,
+            start__lt=time_max,
+            end__gt=time_min,
+        ).exclude(google_event_id__in=list(processed_google_ids)))
+
+    def _check_stale_event(self, stale_event):
+        logger.debug("Checking existence for stale event %s (Google ID: %s)", stale_event.id, stale_event.google_event_id)
+        try:
+            self._execute(self.service.events().get(
+                calendarId=self.calendar_id,
+                eventId=stale_event.google_event_id,
+                fields='id'
+            ))
+        except HttpError as e:
+            if e.resp.status in (404, 410):
+                logger.debug("Deleting stale local event %s (Google ID: %s)", stale_event.id, stale_event.google_event_id)
+                stale_event.delete()
+                self.stats['deleted'] += 1
+            else:
+                logger.error(f"Google API error checking event {stale_event.google_event_id}: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error checking event existence: {str(e)}")
+
+    def _mark_synced(self):
+        if hasattr(self.user, 'google_calendar') and self.user.google_calendar:
+            self.user.google_calendar.last_sync = timezone.now()
+            self.user.google_calendar.save(update_fields=['last_sync'])
+
+    def sync_google_to_local(self):
+        try:
+            logger.info(f"Starting sync_google_to_local for user {self.user.id}")
+            events_from_google = self._list_google_events()
+            logger.info(f"Total events to check: {len(events_from_google)}")
+
+            processed_google_ids = self._apply_google_events(events_from_google)
+
             # Удаление локальных событий, отсутствующих в Google
-            stale_local_events = Event.objects.filter(
-                user=self.user,
-                google_calendar_id=self.calendar_id,
-                google_event_id__isnull=False
-            ).exclude(google_event_id__in=list(processed_google_ids))
-            
-            for stale_event in stale_local_events:
-                logger.info(f"Checking existence for stale event {stale_event.id} (Google ID: {stale_event.google_event_id})")
-                try:
-                    self.service.events().get(
-                        calendarId=self.calendar_id,
-                        eventId=stale_event.google_event_id
-                    ).execute()
-                except HttpError as e:
-                    if e.resp.status in (404, 410):
-                        logger.info(f"Deleting stale local event {stale_event.id} (Google ID: {stale_event.google_event_id})")
-                        stale_event.delete()
-                    else:
-                        logger.error(f"Google API error checking event {stale_event.google_event_id}: {str(e)}")
-                except Exception as e:
-                    logger.error(f"Error checking event existence: {str(e)}")
-                    continue
+            for stale_event in self._stale_local_events(processed_google_ids):
+                self._check_stale_event(stale_event)
 
-            if hasattr(self.user, 'google_calendar') and self.user.google_calendar:
-                self.user.google_calendar.last_sync = timezone.now()
-                self.user.google_calendar.save(update_fields=['last_sync'])
+            self._mark_synced()
 
         except Exception as e:
             logger.error(f"Google to local sync failed for user {self.user.id}: {str(e)}")
@@ -287,48 +421,53 @@ class GoogleCalendarSync:
 
     def _save_google_event(self, parsed_event, existing_event=None):
         try:
-            group = Group.objects.get(user=self.user, name=parsed_event['group_name'])
-            subject = Subject.objects.get(user=self.user, name=parsed_event['subject_name'])
-
-            defaults = {
+            fields = {
                 'user': self.user,
                 'title': parsed_event['title'],
                 'start': parsed_event['start'],
                 'end': parsed_event['end'],
-                'group': group,
-                'subject': subject,
+                'group': parsed_event['group'],
+                'subject': parsed_event['subject'],
                 'type': parsed_event['type'],
                 'location': parsed_event['location'],
                 'notes': parsed_event.get('notes', ''), 
+                'google_event_id': parsed_event['id'],
                 'google_calendar_id': self.calendar_id,
-                'is_syncing': True, 
-                'last_update': parsed_event['updated'] 
+                'last_update': parsed_event['updated'],
+                # update() не трогает auto_now: время записи для версии данных аналитики
+                'changed_at': timezone.now(),
             }
-            
-            event, created = Event.objects.update_or_create(
-                google_event_id=parsed_event['id'],
-                user=self.user,
-                defaults=defaults
-            )
-            
-            if event.is_syncing:
-                event.is_syncing = False
-                event.save(update_fields=['is_syncing'])
 
-            if created:
-                logger.info(f"Created new event from Google: {event.id} (google_id: {parsed_event['id']})")
+            # Пишем мимо save(): post_save не срабатывает, и событие не отправляется обратно в Google
+            with transaction.atomic():
+                if existing_event:
+                    Event.objects.filter(pk=existing_event.pk).update(**fields)
+                else:
+                    event = Event.objects.bulk_create([Event(**fields)])[0]
+                    # auto_now перезаписал last_update, возвращаем время изменения из Google
+                    Event.objects.filter(pk=event.pk).update(last_update=parsed_event['updated'])
+            if existing_event:
+                self.stats['updated'] += 1
+                logger.debug("Updated existing event from Google: %s (google_id: %s)", existing_event.id, parsed_event['id'])
             else:
-                logger.info(f"Updated existing event from Google: {event.id} (google_id: {parsed_event['id']})")
+                self.stats['created'] += 1
+                logger.debug("Created new event from Google: %s (google_id: %s)", event.id, parsed_event['id'])
 
-        except (Group.DoesNotExist, Subject.DoesNotExist) as e:
-            logger.warning(f"Cannot save event from Google (google_id: {parsed_event.get('id')}) due to missing Group/Subject: {str(e)}.")
+        except IntegrityError as e:
+            if not is_overlap_violation(e):
+                logger.error(f"Failed to save event from Google (google_id: {parsed_event.get('id')}): {str(e)}")
+                return
+            # Как и при отказе в _validate_google_event: событие удаляется из Google
+            logger.warning(f"Google event {parsed_event['id']} overlaps with existing events. Deleting from Google.")
+            self.stats['rejected'] += 1
+            self._delete_google_event(parsed_event['id'])
         except Exception as e:
             logger.error(f"Failed to save event from Google (google_id: {parsed_event.get('id')}): {str(e)}")
 
     def _delete_google_event(self, event_id):
         try:
-            self.service.events().delete(calendarId=self.calendar_id, eventId=event_id).execute()
-            logger.info(f"Deleted Google event: {event_id}")
+            self._execute(self.service.events().delete(calendarId=self.calendar_id, eventId=event_id))
+            logger.debug("Deleted Google event: %s", event_id)
         except HttpError as e:
             if e.resp.status in (404, 410):
                 logger.warning(f"Event {event_id} not found or already deleted in Google Calendar.")
@@ -338,45 +477,63 @@ class GoogleCalendarSync:
         except Exception as e:
             logger.error(f"Failed to delete Google event {event_id}: {str(e)}")
 
+    def _event_body(self, event):
+        return {
+            'summary': event.title,
+            'description': f"Group: {event.group.name}\nSubject: {event.subject.name}\nType: {event.type}\nNotes: {event.notes or ''}",
+            'start': {'dateTime': event.start.isoformat(), 'timeZone': str(event.start.tzinfo or timezone.get_default_timezone())},
+            'end': {'dateTime': event.end.isoformat(), 'timeZone': str(event.end.tzinfo or timezone.get_default_timezone())},
+            'location': event.location or '',
+            # Описание остается для людей, синхронизация читает эти свойства
+            'extendedProperties': {'private': {
+                'tp_source': PRIVATE_SOURCE,
+                'tp_event_id': str(event.id),
+                'tp_group_id': str(event.group_id),
+                'tp_subject_id': str(event.subject_id),
+                'tp_type': event.type,
+            }},
+        }
+
+    def _store_google_ids(self, event):
+        event.google_calendar_id = self.calendar_id
+        Event.objects.filter(pk=event.pk).update(
+            google_event_id=event.google_event_id, google_calendar_id=event.google_calendar_id
+        )
+
     def sync_local_to_google(self, event):
         try:
             if not self._should_update_google(event):
-                logger.info(f"Skipping older local event: {event.id} (google_id: {event.google_event_id}) for sync to Google.")
+                logger.debug("Skipping older local event: %s (google_id: %s) for sync to Google.", event.id, event.google_event_id)
                 return
 
-            event_data = {
-                'summary': event.title,
-                'description': f"Group: {event.group.name}\nSubject: {event.subject.name}\nType: {event.type}\nNotes: {event.notes or ''}",
-                'start': {'dateTime': event.start.isoformat(), 'timeZone': str(event.start.tzinfo or timezone.get_default_timezone())},
-                'end': {'dateTime': event.end.isoformat(), 'timeZone': str(event.end.tzinfo or timezone.get_default_timezone())},
-                'location': event.location or '',
-            }
+            event_data = self._event_body(event)
 
             google_api_event_id = None
 
             if event.google_event_id:
-                updated_g_event = self.service.events().update(
+                updated_g_event = self._execute(self.service.events().update(
                     calendarId=self.calendar_id, eventId=event.google_event_id, body=event_data
-                ).execute()
+                ))
                 google_api_event_id = updated_g_event.get('id')
-                logger.info(f"Updated event {event.id} in Google Calendar (google_id: {google_api_event_id})")
+                self.stats['updated'] += 1
+                logger.debug("Updated event %s in Google Calendar (google_id: %s)", event.id, google_api_event_id)
             else:
-                created_g_event = self.service.events().insert(
+                created_g_event = self._execute(self.service.events().insert(
                     calendarId=self.calendar_id, body=event_data
-                ).execute()
+                ))
                 google_api_event_id = created_g_event.get('id')
                 event.google_event_id = google_api_event_id
-                logger.info(f"Created new event {event.id} in Google Calendar (google_id: {google_api_event_id})")
+                self.stats['created'] += 1
+                logger.debug("Created new event %s in Google Calendar (google_id: %s)", event.id, google_api_event_id)
 
-            event.google_calendar_id = self.calendar_id
-            event.save(update_fields=['google_event_id', 'google_calendar_id'])
+            self._store_google_ids(event)
 
         except HttpError as e:
             logger.error(f"Google API error syncing event {event.id} to Google: {str(e)}")
             if e.resp.status == 404 and event.google_event_id:
                 logger.warning(f"Event {event.google_event_id} not found in Google. Clearing local google_event_id.")
                 event.google_event_id = None
-                event.save(update_fields=['google_event_id'])
+                Event.objects.filter(pk=event.pk).update(google_event_id=None)
             raise
         except Exception as e:
             logger.error(f"Sync failed for event {event.id} to Google: {str(e)}")
@@ -394,37 +551,81 @@ class GoogleCalendarSync:
 
     def sync_local_to_google_all(self):
         try:
-            events_to_sync = Event.objects.filter(user=self.user) 
+            events_to_sync = Event.objects.filter(user=self.user).select_related('group', 'subject')
             total = events_to_sync.count()
             synced_count = 0
-            skipped_due_to_syncing_flag = 0
+            skipped_in_flight = 0
             
             logger.info(f"Starting sync_local_to_google_all for user {self.user.id}. Total events to check: {total}")
 
             for event in events_to_sync:
                 try:
-                    current_event = Event.objects.get(pk=event.pk)
-                    if current_event.is_syncing:
-                        logger.info(f"Event {event.id} is marked as is_syncing. Skipping.")
-                        skipped_due_to_syncing_flag += 1
-                        continue
-
-                    current_event.is_syncing = True
-                    current_event.save(update_fields=['is_syncing'])
-                    
-                    try:
-                        self.sync_local_to_google(current_event)
+                    with event_sync_lease(event.id) as lease:
+                        if lease is None:
+                            logger.debug("Event %s is already syncing. Skipping.", event.id)
+                            skipped_in_flight += 1
+                            continue
+                        self.sync_local_to_google(event)
                         synced_count += 1
-                    finally:
-                        current_event.is_syncing = False
-                        current_event.save(update_fields=['is_syncing'])
-                except Event.DoesNotExist:
-                    logger.warning(f"Event {event.id} was deleted during sync iteration.")
                 except Exception as e:
                     logger.error(f"Error syncing event {event.id}: {str(e)}")
             
-            logger.info(f"Local to Google sync all complete. Processed: {synced_count}, Skipped: {skipped_due_to_syncing_flag}")
+            logger.info(f"Local to Google sync all complete. Processed: {synced_count}, Skipped: {skipped_in_flight}")
             
         except Exception as e:
             logger.error(f"General error in sync_local_to_google_all: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    def _insert_batch(self, events):
+        """One batch request inserting `events`. Returns {event: HttpError or None}."""
+        self.limiter.acquire(len(events))
+        self.stats['api_calls'] += len(events)
+        by_request_id = {str(event.id): event for event in events}
+        results = {}
+
+        def callback(request_id, response, exception):
+            event = by_request_id[request_id]
+            if exception is None:
+                event.google_event_id = response['id']
+                event.google_calendar_id = self.calendar_id
+            results[event] = exception
+
+        batch = self.service.new_batch_http_request(callback=callback)
+        for request_id, event in by_request_id.items():
+            batch.add(
+                self.service.events().insert(calendarId=self.calendar_id, body=self._event_body(event), fields='id'),
+                request_id=request_id,
+            )
+        with track_google():
+            batch.execute()
+        return results
+
+    def push_new_events(self, events):
+        """Creates events that aren't in Google yet with batched inserts.
+
+        Inserts rejected by rate limits are retried with backoff. Returns (created, failed).
+        """
+        pending = list(events)
+        created = failed = 0
+        attempt = 0
+        while pending:
+            results = self._insert_batch(pending)
+            inserted = [event for event, error in results.items() if error is None]
+            # bulk_update мимо save(): сигналы не ставят эти события в очередь повторно
+            Event.objects.bulk_update(inserted, ['google_event_id', 'google_calendar_id'])
+            created += len(inserted)
+            self.stats['created'] += len(inserted)
+
+            pending = []
+            for event, error in results.items():
+                if error is None:
+                    continue
+                if is_rate_limit_error(error) and attempt < settings.GOOGLE_API_MAX_RETRIES:
+                    pending.append(event)
+                else:
+                    failed += 1
+                    logger.error(f"Batch insert of event {event.id} to Google failed: {str(error)}")
+            if pending:
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+        return created, failed
\ No newline at end of file
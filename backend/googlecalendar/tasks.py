@@ -1,85 +1,175 @@
+from datetime import timedelta
+from asgiref.sync import async_to_sync
 from celery import shared_task
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from .sync import GoogleCalendarSync
+from .async_sync import run_full_syncs
+from .ratelimit import retry_countdown
+from .metrics import record_sync_run, prune_old_sync_runs
+from .circuit import record_failure, record_success, reset_circuit
+from .backfill import start_backfill, run_backfill, active_backfill_users
+from .models import CalendarBackfill
+from .leases import user_sync_lease, event_sync_lease, running_user_syncs, defer_event_push, pop_deferred_pushes
+from .routing import partition
 import logging
 from planner.models import Event
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
-@shared_task(bind=True, max_retries=3)
-def sync_single_event(self, event_id):
-    event = None
+def _push_deferred_events(sync, user_id):
+    """Pushes events folded into the run that holds the user's lease."""
+    for event_id in pop_deferred_pushes(user_id):
+        try:
+            event = Event.objects.select_related('group', 'subject').get(id=event_id, user_id=user_id)
+            sync.sync_local_to_google(event)
+        except Event.DoesNotExist:
+            logger.info(f"Deferred event {event_id} was deleted before push.")
+        except Exception as e:
+            logger.error(f"Error pushing deferred event {event_id}: {str(e)}")
+
+def _requeue_deferred_events(user_id):
+    """Pushes deferred after the lease holder drained the queue get their own task."""
+    for event_id in pop_deferred_pushes(user_id):
+        sync_single_event.delay(event_id, user_id=user_id)
+
+# acks_late только у идемпотентных задач: после падения воркера задача придет снова.
+# Повторная синхронизация безопасна, а create_google_calendar_task создал бы второй календарь
+@shared_task(bind=True, max_retries=3, acks_late=True)
+def sync_single_event(self, event_id, user_id=None):
     try:
-        event = Event.objects.get(id=event_id)
+        event = Event.objects.select_related('user', 'group', 'subject').get(id=event_id)
+        user_id = event.user_id
         if not hasattr(event.user, "google_calendar"):
             logger.info(f"User {event.user.id} for event {event_id} has no google_calendar setup. Skipping sync.")
             return
 
-        if event.is_syncing:
-            logger.warning(f"Event {event_id} is already syncing. Retrying or skipping...")
-            raise self.retry(exc=Exception(f"Sync already in progress for event {event_id}"), countdown=10)
-            
-        event.is_syncing = True
-        event.save(update_fields=['is_syncing'])
-        
-        logger.info(f"Starting sync for event {event_id}")
-        sync = GoogleCalendarSync(event.user)
-        sync.sync_local_to_google(event)
-        logger.info(f"Successfully synced event {event_id}")
+        with record_sync_run(event.user_id, 'event', 'local_to_google') as run:
+            with user_sync_lease(event.user_id) as lease:
+                if lease is None:
+                    run.skip()
+                    defer_event_push(event.user_id, event_id)
+                    logger.info(f"Sync already running for user {event.user_id}. Event {event_id} folded into it.")
+                    return
+
+                with event_sync_lease(event_id) as event_lease:
+                    if event_lease is None:
+                        # Событие уже отправляется, повторим после текущей отправки
+                        run.skip()
+                        defer_event_push(event.user_id, event_id)
+                        logger.info(f"Event {event_id} is already syncing. Deferred.")
+                        return
+
+                    logger.info(f"Starting sync for event {event_id}")
+                    sync = run.track(GoogleCalendarSync(event.user))
+                    sync.sync_local_to_google(event)
+                    if sync.stats['created'] or sync.stats['updated']:
+                        run.set_lag(event.last_update)
+                    record_success(event.user_id)
+                    logger.info(f"Successfully synced event {event_id}")
+                _push_deferred_events(sync, event.user_id)
+            _requeue_deferred_events(event.user_id)
 
     except Event.DoesNotExist:
         logger.error(f"Event {event_id} not found for sync.")
     except Exception as e:
         logger.error(f"Error syncing event {event_id}: {str(e)}")
-        if event:
-            try:
-                event_to_reset = Event.objects.get(id=event_id)
-                if event_to_reset.is_syncing:
-                    event_to_reset.is_syncing = False
-                    event_to_reset.save(update_fields=['is_syncing'])
-            except Event.DoesNotExist:
-                logger.warning(f"Event {event_id} not found when trying to reset is_syncing flag in except block.")
-            except Exception as reset_exc:
-                logger.error(f"Error resetting is_syncing for event {event_id} in except block: {reset_exc}")
-        raise self.retry(exc=e, countdown=30)
-    finally:
-        if event_id:
-            try:
-                final_event_state = Event.objects.get(id=event_id)
-                if final_event_state.is_syncing:
-                    final_event_state.is_syncing = False
-                    final_event_state.save(update_fields=['is_syncing'])
-                    logger.info(f"Reset is_syncing flag for event {event_id} in finally block.")
-            except Event.DoesNotExist:
-                logger.warning(f"Event {event_id} not found in finally block when trying to reset is_syncing.")
-            except Exception as final_exc:
-                logger.error(f"Error in finally block for event {event_id} while resetting is_syncing: {final_exc}")
+        if user_id is not None and record_failure(user_id, e):
+            # Повтор не поможет, пока пользователь не переподключит Google
+            return
+        raise self.retry(exc=e, countdown=retry_countdown(e, self.request.retries, 30))
 
-@shared_task(bind=True, max_retries=3)
+@shared_task(bind=True, max_retries=3, acks_late=True)
 def full_sync_user(self, user_id):
     try:
         user = User.objects.get(id=user_id)
         if hasattr(user, 'google_calendar'):
-            sync = GoogleCalendarSync(user)
-            sync.sync_google_to_local()
-            sync.sync_local_to_google_all()
+            with record_sync_run(user_id, 'full', 'both') as run:
+                with user_sync_lease(user_id) as lease:
+                    if lease is None:
+                        run.skip()
+                        logger.info(f"Sync already running for user {user_id}. Skipping duplicate run.")
+                        return f"Sync already in progress for user {user_id}"
+                    sync = run.track(GoogleCalendarSync(user))
+                    sync.sync_google_to_local()
+                    sync.sync_local_to_google_all()
+                    _push_deferred_events(sync, user_id)
+                    record_success(user_id)
+                _requeue_deferred_events(user_id)
             return f"Synced user {user_id}"
         return f"No Google Calendar for user {user_id}"
     except User.DoesNotExist:
         logger.error(f"User {user_id} not found")
     except Exception as e:
         logger.error(f"Sync failed for user {user_id}: {str(e)}")
-        self.retry(exc=e, countdown=60)
+        if record_failure(user_id, e):
+            return f"Google account of user {user_id} is failing, not retrying"
+        self.retry(exc=e, countdown=retry_countdown(e, self.request.retries, 60))
+
+@shared_task(acks_late=True)
+def full_sync_users_chunk(user_ids):
+    """Full sync of a chunk of users concurrently in this worker (asyncio engine)."""
+    results = async_to_sync(run_full_syncs)(user_ids)
+    failed = 0
+    for user_id, result in results.items():
+        if isinstance(result, Exception):
+            failed += 1
+            logger.error(f"Async sync failed for user {user_id}: {str(result)}")
+            record_failure(user_id, result)
+        elif result == 'synced':
+            record_success(user_id)
+        _requeue_deferred_events(user_id)
+    logger.info(f"Async chunk sync done for {len(results)} users, {failed} failed")
+    return f"Synced {len(results) - failed} of {len(user_ids)} users"
+
+def queue_full_syncs(user_ids):
+    """Queues full syncs of the users with the configured engine, skipping users whose sync is running.
+
+    Returns (queued, running) counts.
+    """
+    user_ids = list(user_ids)
+    running = running_user_syncs(user_ids)
+    to_sync = [user_id for user_id in user_ids if user_id not in running]
+    # Следующий beat все равно поставит синхронизацию заново, старые задачи не копим
+    expires = settings.GOOGLE_SYNC_BULK_TASK_EXPIRES
+    if settings.GOOGLE_SYNC_ENGINE == 'async':
+        # Чанк маршрутизируется по первому пользователю, поэтому в нем пользователи одной партиции
+        by_partition = {}
+        for user_id in to_sync:
+            by_partition.setdefault(partition(user_id), []).append(user_id)
+        chunk_size = settings.GOOGLE_SYNC_CHUNK_SIZE
+        for partition_users in by_partition.values():
+            for i in range(0, len(partition_users), chunk_size):
+                full_sync_users_chunk.apply_async(kwargs={'user_ids': partition_users[i:i + chunk_size]}, expires=expires)
+    else:
+        for user_id in to_sync:
+            full_sync_user.apply_async(kwargs={'user_id': user_id}, expires=expires)
+    return len(to_sync), len(running)
+
+
+def resync_users(user_ids):
+    """Full re-sync requested from the admin: users without a calendar or with a running backfill are skipped.
+
+    Unlike periodic_full_sync, users with an open circuit breaker are synced too. Returns (queued, running).
+    """
+    user_ids = User.objects.filter(id__in=user_ids, google_calendar__isnull=False).exclude(
+        id__in=active_backfill_users()
+    ).values_list('id', flat=True)
+    return queue_full_syncs(user_ids)
+
 
 @shared_task
 def periodic_full_sync():
     try:
-        users = User.objects.filter(google_calendar__isnull=False)
-        for user in users:
-            full_sync_user.delay(user.id)
-        logger.info(f"Periodic sync started for {users.count()} users")
+        # Пользователи с открытым circuit breaker пропускаются до конца cool-down
+        # Пользователей с идущим backfill тоже: их события отправляет backfill_calendar
+        user_ids = User.objects.filter(google_calendar__isnull=False).exclude(
+            google_calendar__circuit_open_until__gt=timezone.now()
+        ).exclude(id__in=active_backfill_users()).values_list('id', flat=True)
+        queued, running = queue_full_syncs(user_ids)
+        logger.info(f"Periodic sync started for {queued} users, {running} still running")
     except Exception as e:
         logger.error(f"Periodic sync failed: {str(e)}")
         raise
@@ -88,14 +178,64 @@ def periodic_full_sync():
 def create_google_calendar_task(self, user_id):
     try:
         user = User.objects.get(id=user_id)
+        # Вход с новыми токенами: снова синхронизируем, даже если аккаунт был отключен circuit breaker'ом
+        reset_circuit(user)
         if hasattr(user, 'google_calendar'):
             return user.google_calendar.calendar_id
         sync = GoogleCalendarSync(user)
         calendar_id = sync._get_or_create_calendar()
         logger.info(f"Created Google Calendar for user {user_id}")
+        # Уже существующие события отправляем пачками, а не через поминутный sync_local_to_google_all
+        start_backfill(user)
         return calendar_id
     except User.DoesNotExist:
         logger.error(f"User {user_id} not found")
     except Exception as e:
         logger.error(f"Calendar creation failed: {str(e)}")
-        self.retry(exc=e, countdown=30)
\ No newline at end of file
+        self.retry(exc=e, countdown=retry_countdown(e, self.request.retries, 30))
+
+@shared_task
+def prune_sync_runs():
+    deleted = prune_old_sync_runs()
+    logger.info(f"Pruned {deleted} sync runs older than {settings.GOOGLE_SYNC_RUN_RETENTION_DAYS} days")
+    return deleted
+
+# Backfill отправляет только еще не синхронизированные события, повтор продолжит с места падения
+@shared_task(bind=True, max_retries=5, acks_late=True)
+def backfill_calendar(self, user_id, backfill_id):
+    busy = False
+    try:
+        backfill = CalendarBackfill.objects.select_related('user').get(id=backfill_id, user_id=user_id)
+        with record_sync_run(user_id, 'backfill', 'local_to_google') as run:
+            with user_sync_lease(user_id) as lease:
+                if lease is None:
+                    run.skip()
+                    busy = True
+                else:
+                    sync = run.track(GoogleCalendarSync(backfill.user))
+                    run_backfill(backfill, sync)
+                    _push_deferred_events(sync, user_id)
+                    record_success(user_id)
+            _requeue_deferred_events(user_id)
+    except CalendarBackfill.DoesNotExist:
+        logger.error(f"Calendar backfill {backfill_id} for user {user_id} not found")
+        return
+    except Exception as e:
+        logger.error(f"Calendar backfill {backfill_id} failed for user {user_id}: {str(e)}")
+        CalendarBackfill.objects.filter(pk=backfill_id).update(status='failed', error=str(e)[:255])
+        if record_failure(user_id, e):
+            return
+        raise self.retry(exc=e, countdown=retry_countdown(e, self.request.retries, 30))
+
+    if busy:
+        # Синхронизация, начатая до подключения календаря, еще идет. Ожидание lease
+        # не тратит max_retries (иначе backfill навсегда остался бы 'pending'),
+        # но ограничено тем же сроком, после которого backfill считается зависшим
+        if timezone.now() - backfill.created_at > timedelta(seconds=settings.GOOGLE_SYNC_BACKFILL_TIMEOUT):
+            logger.error(f"Calendar backfill {backfill_id} for user {user_id} gave up waiting for the running sync")
+            CalendarBackfill.objects.filter(pk=backfill_id).update(
+                status='failed', error='Another sync kept running', finished_at=timezone.now()
+            )
+            return
+        logger.info(f"Sync already running for user {user_id}. Backfill {backfill_id} postponed.")
+        backfill_calendar.apply_async(kwargs={'user_id': user_id, 'backfill_id': backfill_id}, countdown=10)
\ No newline at end of file
@@ -0,0 +1,384 @@
+"""In-process stand-in for the Google Calendar v3 endpoints used by the sync.
+
+Used by the tests and the sync benchmarks instead of the real Google API:
+
+    server = FakeGoogleCalendarServer()
+    sync = GoogleCalendarSync(user, service=server.build_service())
+    run_full_syncs(user_ids, transport=server.httpx_transport())
+"""
+import itertools
+import json
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+from email.parser import FeedParser
+from urllib.parse import urlparse, parse_qs, unquote
+import httplib2
+import httpx
+from googleapiclient.discovery import build
+
+API_PREFIX = '/calendar/v3'
+BATCH_PATH = '/batch/calendar/v3'
+MAX_RESULTS_LIMIT = 2500
+DEFAULT_MAX_RESULTS = 250
+
+
+def _now():
+    return datetime.now(dt_timezone.utc)
+
+
+def _rfc3339(value):
+    return value.isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _parse_fields(fields):
+    """Partial response mask 'a,b,items(c,d)' -> {'a': None, 'b': None, 'items': {'c': None, 'd': None}}."""
+    mask, name, depth, start = {}, '', 0, 0
+    for i, char in enumerate(fields + ','):
+        if char == '(':
+            if depth == 0:
+                name, start = fields[start:i].strip(), i + 1
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                mask[name] = _parse_fields(fields[start:i])
+                start = i + 1
+        elif char == ',' and depth == 0:
+            if fields[start:i].strip():
+                mask[fields[start:i].strip()] = None
+            start = i + 1
+    return mask
+
+
+def _apply_fields(payload, mask):
+    if isinstance(payload, list):
+        return [_apply_fields(item, mask) for item in payload]
+    if not isinstance(payload, dict):
+        return payload
+    return {
+        key: payload[key] if sub is None else _apply_fields(payload[key], sub)
+        for key, sub in mask.items() if key in payload
+    }
+
+
+def _error(status, reason, message=None):
+    return status, {'error': {
+        'code': status,
+        'message': message or reason,
+        'errors': [{'domain': 'global', 'reason': reason, 'message': message or reason}],
+    }}
+
+
+class FakeGoogleCalendarServer:
+    """Calendars, events and sync tokens kept in memory.
+
+    Counts calls per operation and the bytes and pages served, so the
+    benchmarks can report them. Errors can be injected per operation with
+    fail(), e.g. fail('events.list', 429) or fail('events.get', 403, 'rateLimitExceeded').
+    """
+
+    def __init__(self):
+        self.calendars = {}
+        self.calls = Counter()
+        self.bytes_sent = 0
+        self.pages = 0
+        self._failures = {}
+        self._ids = itertools.count(1)
+        self._sync_tokens = {}
+        # Порядковый номер последнего изменения события, для syncToken
+        self._changes = itertools.count(1)
+        self._changed_at = {}
+        # Если задан, httpx-клиент должен передать именно этот access token, иначе 401
+        self.access_token = None
+
+    # --- test helpers ---
+
+    def add_calendar(self, calendar_id=None, summary='TeacherPlanner'):
+        calendar_id = calendar_id or f'{uuid.uuid4().hex}@group.calendar.google.com'
+        self.calendars[calendar_id] = {'id': calendar_id, 'summary': summary, 'events': {}}
+        return calendar_id
+
+    def add_event(self, calendar_id, body, updated=None):
+        event = self._store_event(calendar_id, dict(body))
+        if updated:
+            event['updated'] = _rfc3339(updated)
+        return event
+
+    def update_event(self, calendar_id, event_id, changes, updated=None):
+        """Edit made in Google itself, `updated` overrides the modification time."""
+        event = self._store_event(calendar_id, {**self.calendars[calendar_id]['events'][event_id], **changes}, event_id)
+        if updated:
+            event['updated'] = _rfc3339(updated)
+        return event
+
+    def events(self, calendar_id, include_cancelled=False):
+        return [
+            event for event in self.calendars[calendar_id]['events'].values()
+            if include_cancelled or event['status'] != 'cancelled'
+        ]
+
+    def fail(self, operation, status, reason=None, times=1):
+        reason = reason or {429: 'rateLimitExceeded', 410: 'fullSyncRequired', 404: 'notFound'}.get(status, 'backendError')
+        self._failures.setdefault(operation, []).extend([(status, reason)] * times)
+
+    def expire_sync_tokens(self):
+        self._sync_tokens.clear()
+
+    def issue_access_token(self):
+        """Makes a new access token the only accepted one, earlier tokens get 401."""
+        self.access_token = uuid.uuid4().hex
+        return self.access_token
+
+    def refresh_credentials(self, credentials, request):
+        """Stands in for Credentials.refresh: mock.patch.object(Credentials, 'refresh', autospec=True, side_effect=...)."""
+        self.calls['token.refresh'] += 1
+        credentials.token = self.issue_access_token()
+        credentials.expiry = _now().replace(tzinfo=None) + timedelta(hours=1)
+
+    def total_calls(self):
+        return sum(
+            count for operation, count in self.calls.items()
+            if operation not in ('batch', 'token.refresh', 'auth.rejected')
+        )
+
+    def reset_counters(self):
+        self.calls.clear()
+        self.bytes_sent = 0
+        self.pages = 0
+
+    # --- clients ---
+
+    def build_service(self):
+        """googleapiclient service for GoogleCalendarSync(service=...)."""
+        return build('calendar', 'v3', http=FakeGoogleHttp(self), static_discovery=True, cache_discovery=False)
+
+    def httpx_transport(self):
+        """Transport for the httpx.AsyncClient of the async engine."""
+        def handler(request):
+            if self.access_token and request.headers.get('authorization') != f'Bearer {self.access_token}':
+                self.calls['auth.rejected'] += 1
+                status, payload = _error(401, 'authError', 'Invalid Credentials')
+                return httpx.Response(status, content=self._encode(payload), headers={'content-type': 'application/json'})
+            body = json.loads(request.content) if request.content else None
+            status, payload = self.dispatch(request.method, request.url.path, dict(request.url.params), body)
+            return httpx.Response(status, content=self._encode(payload), headers={'content-type': 'application/json'})
+        return httpx.MockTransport(handler)
+
+    # --- request handling ---
+
+    def _encode(self, payload):
+        content = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.bytes_sent += len(content)
+        return content
+
+    def dispatch(self, method, path, query, body):
+        if path.startswith(API_PREFIX):
+            path = path[len(API_PREFIX):]
+        parts = [unquote(part) for part in path.strip('/').split('/')]
+        operation, args = self._route(method, parts)
+        if operation is None:
+            return _error(404, 'notFound', f'No route for {method} {path}')
+        self.calls[operation] += 1
+        failures = self._failures.get(operation)
+        if failures:
+            return _error(*failures.pop(0))
+        handler = getattr(self, '_' + operation.replace('.', '_'))
+        status, payload = handler(*args, query=query, body=body)
+        if query.get('fields') and status < 400 and payload is not None:
+            payload = _apply_fields(payload, _parse_fields(query['fields']))
+        return status, payload
+
+    def _route(self, method, parts):
+        if parts == ['calendars'] and method == 'POST':
+            return 'calendars.insert', ()
+        if len(parts) == 3 and parts[0] == 'calendars' and parts[2] == 'events':
+            return {'GET': 'events.list', 'POST': 'events.insert'}.get(method), (parts[1],)
+        if len(parts) == 4 and parts[0] == 'calendars' and parts[2] == 'events':
+            operation = {'GET': 'events.get', 'PUT': 'events.update', 'DELETE': 'events.delete'}.get(method)
+            return operation, (parts[1], parts[3])
+        return None, ()
+
+    def _calendar(self, calendar_id):
+        return self.calendars.get(calendar_id)
+
+    def _store_event(self, calendar_id, body, event_id=None):
+        events = self.calendars[calendar_id]['events']
+        existing = events.get(event_id, {})
+        event_id = event_id or f'fake{next(self._ids):010d}'
+        now = _rfc3339(_now())
+        # Служебные поля, которые Google отдает в полном ресурсе события
+        body.update({
+            'kind': 'calendar#event',
+            'etag': f'"{next(self._changes)}"',
+            'id': event_id,
+            'status': body.get('status', 'confirmed'),
+            'htmlLink': f'https://www.google.com/calendar/event?eid={event_id}',
+            'created': existing.get('created', now),
+            'updated': now,
+            'creator': {'email': calendar_id},
+            'organizer': {'email': calendar_id, 'self': True},
+            'iCalUID': f'{event_id}@google.com',
+            'sequence': existing.get('sequence', -1) + 1,
+            'reminders': {'useDefault': True},
+            'eventType': 'default',
+        })
+        events[event_id] = body
+        self._changed_at[event_id] = next(self._changes)
+        return body
+
+    def _calendars_insert(self, query, body):
+        calendar_id = self.add_calendar(summary=(body or {}).get('summary', ''))
+        return 200, {'kind': 'calendar#calendar', 'id': calendar_id, **(body or {})}
+
+    def _events_insert(self, calendar_id, query, body):
+        if not self._calendar(calendar_id):
+            return _error(404, 'notFound')
+        return 200, self._store_event(calendar_id, dict(body or {}))
+
+    def _events_get(self, calendar_id, event_id, query, body):
+        calendar = self._calendar(calendar_id)
+        if not calendar or event_id not in calendar['events']:
+            return _error(404, 'notFound')
+        event = calendar['events'][event_id]
+        if event['status'] == 'cancelled':
+            return _error(410, 'deleted', 'Resource has been deleted')
+        return 200, event
+
+    def _events_update(self, calendar_id, event_id, query, body):
+        calendar = self._calendar(calendar_id)
+        if not calendar or event_id not in calendar['events']:
+            return _error(404, 'notFound')
+        if calendar['events'][event_id]['status'] == 'cancelled':
+            return _error(410, 'deleted', 'Resource has been deleted')
+        return 200, self._store_event(calendar_id, dict(body or {}), event_id=event_id)
+
+    def _events_delete(self, calendar_id, event_id, query, body):
+        calendar = self._calendar(calendar_id)
+        if not calendar or event_id not in calendar['events']:
+            return _error(404, 'notFound')
+        event = calendar['events'][event_id]
+        if event['status'] == 'cancelled':
+            return _error(410, 'deleted', 'Resource has been deleted')
+        event['status'] = 'cancelled'
+        event['updated'] = _rfc3339(_now())
+        self._changed_at[event_id] = next(self._changes)
+        return 204, None
+
+    def _events_list(self, calendar_id, query, body):
+        calendar = self._calendar(calendar_id)
+        if not calendar:
+            return _error(404, 'notFound')
+        self.pages += 1
+        events = list(calendar['events'].values())
+
+        sync_token = query.get('syncToken')
+        if sync_token:
+            since = self._sync_tokens.get(sync_token)
+            if since is None:
+                return _error(410, 'fullSyncRequired', 'Sync token is no longer valid, a full sync is required.')
+            # При инкрементальной синхронизации Google отдает и удаленные события
+            events = [event for event in events if self._changed_at[event['id']] > since]
+        else:
+            if query.get('showDeleted') != 'true':
+                events = [event for event in events if event['status'] != 'cancelled']
+            if query.get('timeMin'):
+                time_min = _parse_time(query['timeMin'])
+                events = [event for event in events if _parse_time(event['end']['dateTime']) > time_min]
+            if query.get('timeMax'):
+                time_max = _parse_time(query['timeMax'])
+                events = [event for event in events if _parse_time(event['start']['dateTime']) < time_max]
+        if query.get('privateExtendedProperty'):
+            key, value = query['privateExtendedProperty'].split('=', 1)
+            events = [
+                event for event in events
+                if event.get('extendedProperties', {}).get('private', {}).get(key) == value
+            ]
+
+        if query.get('orderBy') == 'startTime':
+            events.sort(key=lambda event: event['start']['dateTime'])
+        else:
+            events.sort(key=lambda event: event['id'])
+
+        max_results = min(int(query.get('maxResults', DEFAULT_MAX_RESULTS)), MAX_RESULTS_LIMIT)
+        offset = int(query.get('pageToken') or 0)
+        page = events[offset:offset + max_results]
+        result = {'kind': 'calendar#events', 'items': page}
+        if offset + max_results < len(events):
+            result['nextPageToken'] = str(offset + max_results)
+        else:
+            token = uuid.uuid4().hex
+            self._sync_tokens[token] = next(self._changes)
+            result['nextSyncToken'] = token
+        return 200, result
+
+    def handle_batch(self, content_type, body):
+        self.calls['batch'] += 1
+        parser = FeedParser()
+        parser.feed(f'content-type: {content_type}\r\n\r\n')
+        parser.feed(body)
+        message = parser.close()
+        boundary = f'batch_{uuid.uuid4().hex}'
+        chunks = []
+        for part in message.get_payload():
+            content_id = part['Content-ID'].strip()[1:-1]
+            request_text = part.get_payload().replace('\r\n', '\n')
+            request_line, rest = request_text.split('\n', 1)
+            method, target, _ = request_line.split(' ', 2)
+            payload_text = rest.split('\n\n', 1)[1] if '\n\n' in rest else ''
+            url = urlparse(target)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            status, payload = self.dispatch(method, url.path, query, json.loads(payload_text) if payload_text.strip() else None)
+            content = self._encode(payload).decode('utf-8')
+            chunks.append(
+                f'--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n'
+                f'HTTP/1.1 {status} {"OK" if status < 400 else "Error"}\r\nContent-Type: application/json\r\n\r\n{content}\r\n'
+            )
+        chunks.append(f'--{boundary}--')
+        return f'multipart/mixed; boundary={boundary}', ''.join(chunks).encode('utf-8')
+
+
+class FakeGoogleHttp:
+    """httplib2.Http replacement that answers from a FakeGoogleCalendarServer."""
+
+    def __init__(self, server):
+        self.server = server
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        url = urlparse(uri)
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+        if url.path == BATCH_PATH:
+            content_type, content = self.server.handle_batch((headers or {}).get('content-type'), body)
+            return httplib2.Response({'status': 200, 'content-type': content_type}), content
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        status, payload = self.server.dispatch(method, url.path, query, json.loads(body) if body else None)
+        return httplib2.Response({'status': status, 'content-type': 'application/json'}), self.server._encode(payload)
+
+
+def google_event_body(title, start, group_name, subject_name, event_type, duration=timedelta(hours=1, minutes=30), private=None):
+    """Event body in the format GoogleCalendarSync writes to Google.
+
+    Without `private` it is an event from before extendedProperties, with only the description.
+    """
+    end = start + duration
+    body = {
+        'summary': title,
+        'description': f"Group: {group_name}\nSubject: {subject_name}\nType: {event_type}\nNotes: ",
+        'start': {'dateTime': start.isoformat(), 'timeZone': 'UTC'},
+        'end': {'dateTime': end.isoformat(), 'timeZone': 'UTC'},
+        'location': '',
+    }
+    if private:
+        body['extendedProperties'] = {'private': {key: str(value) for key, value in private.items()}}
+    return body
+
+
+def slot_start(index, first_day):
+    """Non-overlapping 1.5 h slots, four a day starting at 08:00."""
+    day = first_day + timedelta(days=index // 4)
+    return day.replace(hour=8 + 2 * (index % 4), minute=0, second=0, microsecond=0)
@@ -1,3 +1,669 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
+from asgiref.sync import async_to_sync
+from allauth.socialaccount.models import SocialAccount, SocialApp, SocialToken
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from google.auth.exceptions import RefreshError
+from google.oauth2.credentials import Credentials
+from googleapiclient.errors import HttpError
+import httplib2
+from redis.exceptions import RedisError
+from core.redis_client import get_redis
+from planner.analytics import academic_year_range, compute_load, department_load, load_columns
+from planner.models import Event, Group, Subject, Plan
+from rest_framework.test import APIClient
+from .async_sync import run_full_syncs
+from .circuit import failure_reason, reset_circuit
+from .metrics import percentile, summarize_sync_runs
+from .ratelimit import STATS_KEY, GoogleApiRateLimiter, get_throttle_stats
+from .routing import route_task, all_queues
+from .models import GoogleCalendar, SyncRun, CalendarBackfill
+from .sync import GoogleCalendarSync
+from .tasks import (
+    sync_single_event, full_sync_user, prune_sync_runs, periodic_full_sync, create_google_calendar_task, backfill_calendar,
+    queue_full_syncs,
+)
+from .testing import FakeGoogleCalendarServer, google_event_body, slot_start
 
-# Create your tests here.
+User = get_user_model()
+
+
+@override_settings(
+    GOOGLE_SYNC_LEASE_BACKEND='memory',
+    GOOGLE_API_RATE_LIMIT_ENABLED=False,
+    GOOGLE_API_BACKOFF_BASE=0,
+    GOOGLE_API_BACKOFF_MAX=0,
+)
+class GoogleSyncTestCase(TestCase):
+    def setUp(self):
+        self.server = FakeGoogleCalendarServer()
+        self.user = self.create_teacher('teacher@example.com')
+        self.calendar_id = self.user.google_calendar.calendar_id
+        self.group = Group.objects.get(user=self.user)
+        self.subject = Subject.objects.get(user=self.user)
+        self.first_day = timezone.now() + timedelta(days=1)
+
+        patcher = mock.patch('planner.signals.sync_single_event.delay')
+        self.queued = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('planner.signals.GoogleCalendarSync', side_effect=self.make_sync)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_teacher(self, email):
+        user = User.objects.create(username=email, email=email)
+        GoogleCalendar.objects.create(user=user, calendar_id=self.server.add_calendar())
+        group = Group.objects.create(user=user, name='IT-21', color='#336699')
+        subject = Subject.objects.create(user=user, name='Math')
+        Plan.objects.create(
+            user=user, name='Math IT-21', group=group, subject=subject,
+            lecture_hours=100, practice_hours=100, lab_hours=100,
+        )
+        app, _ = SocialApp.objects.get_or_create(provider='google', defaults={'name': 'Google', 'client_id': 'id', 'secret': 'secret'})
+        account = SocialAccount.objects.create(user=user, provider='google', uid=email)
+        SocialToken.objects.create(app=app, account=account, token='access', token_secret='refresh')
+        return User.objects.get(pk=user.pk)
+
+    def make_sync(self, user):
+        return GoogleCalendarSync(user, service=self.server.build_service())
+
+    def add_google_event(self, index, group_name='IT-21', calendar_id=None):
+        body = google_event_body(f'Lecture {index}', slot_start(index, self.first_day), group_name, 'Math', 'lecture')
+        return self.server.add_event(calendar_id or self.calendar_id, body)
+
+    def create_local_event(self, index):
+        start = slot_start(index, self.first_day)
+        return Event.objects.create(
+            user=self.user, title=f'Local {index}', group=self.group, subject=self.subject,
+            type='lecture', start=start, end=start + timedelta(hours=1, minutes=30),
+        )
+
+
+class GoogleToLocalSyncTests(GoogleSyncTestCase):
+    def test_pull_creates_local_events(self):
+        google_ids = {self.add_google_event(i)['id'] for i in range(3)}
+
+        self.make_sync(self.user).sync_google_to_local()
+
+        events = Event.objects.filter(user=self.user)
+        self.assertEqual(set(events.values_list('google_event_id', flat=True)), google_ids)
+        self.assertEqual(events.first().group, self.group)
+        # Записи из Google не должны снова уходить в Google
+        self.queued.assert_not_called()
+
+    def test_pull_deletes_events_cancelled_in_google(self):
+        google_event = self.add_google_event(0)
+        sync = self.make_sync(self.user)
+        sync.sync_google_to_local()
+        self.server.dispatch('DELETE', f'/calendars/{self.calendar_id}/events/{google_event["id"]}', {}, None)
+
+        sync.sync_google_to_local()
+
+        self.assertFalse(Event.objects.filter(user=self.user).exists())
+
+    def test_pull_deletes_invalid_google_event(self):
+        self.add_google_event(0, group_name='Unknown group')
+
+        self.make_sync(self.user).sync_google_to_local()
+
+        self.assertFalse(Event.objects.filter(user=self.user).exists())
+        self.assertEqual(self.server.events(self.calendar_id), [])
+
+    @override_settings(GOOGLE_SYNC_WINDOW_FUTURE_DAYS=30)
+    def test_pull_is_bounded_by_sync_window(self):
+        self.add_google_event(0)
+        self.add_google_event(4 * 60)
+        far_local = self.create_local_event(4 * 90)
+        Event.objects.filter(pk=far_local.pk).update(google_event_id='not-listed', google_calendar_id=self.calendar_id)
+
+        self.make_sync(self.user).sync_google_to_local()
+
+        # Событие за горизонтом не импортируется, а локальное за горизонтом не проверяется через events.get
+        self.assertEqual(Event.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(self.server.calls['events.get'], 0)
+
+    def test_listing_requests_only_parsed_fields(self):
+        self.add_google_event(0)
+        listed = self.make_sync(self.user)._list_google_events()
+
+        self.assertEqual(
+            set(listed[0]),
+            {'id', 'status', 'updated', 'summary', 'description', 'location', 'start', 'end'},
+        )
+
+    def test_pulled_edit_changes_analytics_version(self):
+        edited_at = timezone.now() - timedelta(hours=2)
+        start = slot_start(0, self.first_day)
+        first = self.server.add_event(
+            self.calendar_id, google_event_body('Lecture 0', start, 'IT-21', 'Math', 'lecture'), updated=edited_at,
+        )
+        # updated второго события новее правки первого, которая придет из Google
+        self.add_google_event(1)
+        self.make_sync(self.user).sync_google_to_local()
+        year = start.year if start.month >= settings.ANALYTICS_ACADEMIC_YEAR_START_MONTH else start.year - 1
+        self.assertEqual(department_load(year)['types']['practice'], 0)
+
+        self.server.update_event(
+            self.calendar_id, first['id'], google_event_body('Lecture 0', start, 'IT-21', 'Math', 'practice'),
+            updated=edited_at + timedelta(hours=1),
+        )
+        self.make_sync(self.user).sync_google_to_local()
+
+        load = department_load(year)
+        self.assertGreater(load['types']['practice'], 0)
+        self.assertEqual(load['types'], compute_load(load_columns(*academic_year_range(year)))['types'])
+
+    def test_rate_limited_list_is_retried(self):
+        self.add_google_event(0)
+        self.server.fail('events.list', 429)
+        self.server.fail('events.list', 403, 'rateLimitExceeded')
+
+        self.make_sync(self.user).sync_google_to_local()
+
+        self.assertEqual(self.server.calls['events.list'], 3)
+        self.assertEqual(Event.objects.filter(user=self.user).count(), 1)
+
+    def test_other_errors_are_not_retried(self):
+        self.server.fail('events.list', 500)
+
+        with self.assertRaises(HttpError):
+            self.make_sync(self.user).sync_google_to_local()
+        self.assertEqual(self.server.calls['events.list'], 1)
+
+
+class LocalToGoogleSyncTests(GoogleSyncTestCase):
+    def test_push_creates_google_event_without_requeue(self):
+        event = self.create_local_event(0)
+        self.queued.assert_called_once_with(event.id, user_id=self.user.id)
+        self.queued.reset_mock()
+
+        self.make_sync(self.user).sync_local_to_google(event)
+
+        event.refresh_from_db()
+        self.assertEqual([e['id'] for e in self.server.events(self.calendar_id)], [event.google_event_id])
+        self.queued.assert_not_called()
+
+    def test_sync_local_to_google_all_pushes_every_event(self):
+        for i in range(3):
+            self.create_local_event(i)
+
+        self.make_sync(self.user).sync_local_to_google_all()
+
+        self.assertEqual(len(self.server.events(self.calendar_id)), 3)
+        self.assertFalse(Event.objects.filter(user=self.user, google_event_id__isnull=True).exists())
+
+    def test_sync_single_event_task(self):
+        event = self.create_local_event(0)
+
+        with mock.patch('googlecalendar.tasks.GoogleCalendarSync', side_effect=self.make_sync):
+            sync_single_event.apply(args=[event.id])
+
+        event.refresh_from_db()
+        self.assertIsNotNone(event.google_event_id)
+        self.assertEqual(self.server.calls['events.insert'], 1)
+
+
+
+class ExtendedPropertiesTests(GoogleSyncTestCase):
+    def test_push_writes_private_properties(self):
+        event = self.create_local_event(0)
+
+        self.make_sync(self.user).sync_local_to_google(event)
+
+        private = self.server.events(self.calendar_id)[0]['extendedProperties']['private']
+        self.assertEqual(private, {
+            'tp_source': 'teacher_planner',
+            'tp_event_id': str(event.id),
+            'tp_group_id': str(self.group.id),
+            'tp_subject_id': str(self.subject.id),
+            'tp_type': 'lecture',
+        })
+
+    def test_pull_resolves_group_by_id_after_rename(self):
+        body = google_event_body(
+            'Lecture', slot_start(0, self.first_day), 'Old name', 'Old subject', 'lecture',
+            private={'tp_group_id': self.group.id, 'tp_subject_id': self.subject.id, 'tp_type': 'lecture'},
+        )
+        self.server.add_event(self.calendar_id, body)
+
+        self.make_sync(self.user).sync_google_to_local()
+
+        event = Event.objects.get(user=self.user)
+        self.assertEqual((event.group, event.subject), (self.group, self.subject))
+
+    def test_pull_links_local_event_instead_of_duplicating(self):
+        event = self.create_local_event(0)
+        body = google_event_body(
+            'Lecture', event.start, 'IT-21', 'Math', 'lecture', private={'tp_event_id': event.id},
+        )
+        google_event = self.server.add_event(self.calendar_id, body)
+
+        self.make_sync(self.user).sync_google_to_local()
+
+        self.assertEqual(list(Event.objects.filter(user=self.user).values_list('id', 'google_event_id')), [(event.id, google_event['id'])])
+
+    @override_settings(GOOGLE_SYNC_ONLY_PLANNER_EVENTS=True)
+    def test_listing_filters_planner_events(self):
+        self.add_google_event(0)
+        body = google_event_body('Tagged', slot_start(1, self.first_day), 'IT-21', 'Math', 'lecture', private={'tp_source': 'teacher_planner'})
+        tagged = self.server.add_event(self.calendar_id, body)
+
+        self.make_sync(self.user).sync_google_to_local()
+
+        self.assertEqual(list(Event.objects.filter(user=self.user).values_list('google_event_id', flat=True)), [tagged['id']])
+
+
+
+@override_settings(GOOGLE_SYNC_QUEUE_PARTITIONS=4)
+def redis_available():
+    try:
+        return get_redis().ping()
+    except RedisError:
+        return False
+
+
+@override_settings(
+    GOOGLE_API_RATE_LIMIT_ENABLED=True,
+    GOOGLE_API_RATE_LIMITS={'project': {'rate': 0.01, 'capacity': 3}, 'user': {'rate': 0.01, 'capacity': 2}},
+)
+class RateLimiterTests(SimpleTestCase):
+    def setUp(self):
+        self.limiters = [GoogleApiRateLimiter(user_id) for user_id in (-1, -2)]
+        self.addCleanup(self.reset)
+        self.reset()
+
+    def reset(self):
+        if redis_available():
+            get_redis().delete(STATS_KEY, *{key for limiter in self.limiters for key, _ in limiter.buckets})
+
+    @skipUnless(redis_available(), 'needs Redis')
+    def test_tokens_are_taken_from_every_bucket_or_none(self):
+        first, second = self.limiters
+        self.assertEqual([first.try_acquire(), first.try_acquire()], [0, 0])
+        # Пустой бакет пользователя, проектный не тронут
+        self.assertGreater(first.try_acquire(), 0)
+        self.assertEqual(second.try_acquire(), 0)
+        # Теперь пуст проектный бакет, хотя у второго пользователя токен остался
+        self.assertGreater(second.try_acquire(), 0)
+        self.assertEqual(get_throttle_stats()['acquired'], 3)
+
+    @skipUnless(redis_available(), 'needs Redis')
+    @override_settings(GOOGLE_API_RATE_LIMITS={'project': {'rate': 100, 'capacity': 100}, 'user': {'rate': 20, 'capacity': 1}})
+    def test_bucket_refills_over_time(self):
+        limiter = GoogleApiRateLimiter(-1)
+        self.assertEqual(limiter.try_acquire(), 0)
+        wait = limiter.try_acquire()
+        self.assertGreater(wait, 0)
+        self.assertLessEqual(wait, 0.05)
+        time.sleep(wait + 0.01)
+        self.assertEqual(limiter.try_acquire(), 0)
+
+    def test_fails_open_without_redis(self):
+        script = mock.Mock(side_effect=RedisError('Connection refused'))
+        with mock.patch.object(GoogleApiRateLimiter, '_get_script', return_value=script):
+            self.assertEqual(self.limiters[0].try_acquire(), 0)
+            self.limiters[0].acquire(5)
+        self.assertEqual(script.call_count, 4)
+
+
+class TaskRoutingTests(SimpleTestCase):
+    def route(self, task_name, args=(), kwargs=None):
+        return route_task(f'googlecalendar.tasks.{task_name}', args, kwargs or {}, {})
+
+    def test_user_tasks_share_partition(self):
+        self.assertEqual(self.route('sync_single_event', (100,), {'user_id': 6}), {'queue': 'gcal.interactive.2', 'priority': 0})
+        self.assertEqual(self.route('full_sync_user', kwargs={'user_id': 6}), {'queue': 'gcal.bulk.2', 'priority': 6})
+        self.assertEqual(self.route('full_sync_users_chunk', kwargs={'user_ids': [6, 7]})['queue'], 'gcal.bulk.2')
+
+    def test_positional_args_are_not_taken_for_user_id(self):
+        # Первый аргумент sync_single_event - id события, не пользователя
+        self.assertEqual(self.route('sync_single_event', (7,))['queue'], 'gcal.interactive.0')
+        self.assertEqual(self.route('full_sync_user', (6,))['queue'], 'gcal.bulk.0')
+        self.assertEqual(self.route('full_sync_users_chunk', ([6, 7],))['queue'], 'gcal.bulk.0')
+
+    @override_settings(GOOGLE_SYNC_ENGINE='sync')
+    def test_queued_full_syncs_pass_user_id(self):
+        with mock.patch('googlecalendar.tasks.running_user_syncs', return_value=set()), \
+                mock.patch('googlecalendar.tasks.full_sync_user.apply_async') as queued:
+            queue_full_syncs([6])
+        self.assertEqual(self.route('full_sync_user', kwargs=queued.call_args.kwargs['kwargs'])['queue'], 'gcal.bulk.2')
+
+    @override_settings(GOOGLE_SYNC_ENGINE='async', GOOGLE_SYNC_CHUNK_SIZE=2)
+    def test_chunks_hold_users_of_one_partition(self):
+        with mock.patch('googlecalendar.tasks.running_user_syncs', return_value=set()), \
+                mock.patch('googlecalendar.tasks.full_sync_users_chunk.apply_async') as queued:
+            queue_full_syncs([1, 2, 5, 6, 9, 10])
+        chunks = [call.kwargs['kwargs']['user_ids'] for call in queued.call_args_list]
+        self.assertEqual(chunks, [[1, 5], [9], [2, 6], [10]])
+
+    def test_acks_late_only_for_idempotent_tasks(self):
+        self.assertTrue(all(task.acks_late for task in (sync_single_event, full_sync_user, backfill_calendar)))
+        self.assertFalse(create_google_calendar_task.acks_late)
+
+    def test_provisioning_and_maintenance_queues(self):
+        self.assertEqual(self.route('create_google_calendar_task', kwargs={'user_id': 6})['queue'], 'gcal.provisioning')
+        self.assertEqual(self.route('periodic_full_sync')['queue'], 'gcal.maintenance')
+        self.assertIsNone(route_task('health_check.tasks.ping', (), {}, {}))
+
+    def test_all_queues_cover_routes(self):
+        self.assertIn(self.route('sync_single_event', (1,), {'user_id': 3})['queue'], all_queues())
+        self.assertEqual(len(all_queues()), 10)
+
+
+class AsyncSyncEngineTests(GoogleSyncTestCase):
+    def test_run_full_syncs_syncs_users_concurrently(self):
+        other = self.create_teacher('other@example.com')
+        self.add_google_event(0)
+        self.add_google_event(1, calendar_id=other.google_calendar.calendar_id)
+        self.create_local_event(2)
+
+        results = async_to_sync(run_full_syncs)(
+            [self.user.id, other.id], concurrency=2, transport=self.server.httpx_transport()
+        )
+
+        self.assertEqual(results, {self.user.id: 'synced', other.id: 'synced'})
+        self.assertEqual(Event.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Event.objects.filter(user=other).count(), 1)
+        self.assertEqual(len(self.server.events(self.calendar_id)), 2)
+
+    def run_with_token_server(self):
+        self.add_google_event(0)
+        self.server.issue_access_token()  # токен 'access' из create_teacher больше не принимается
+        with mock.patch.object(Credentials, 'refresh', autospec=True, side_effect=self.server.refresh_credentials):
+            return async_to_sync(run_full_syncs)([self.user.id], transport=self.server.httpx_transport())
+
+    def test_expired_token_is_refreshed_before_sync(self):
+        SocialToken.objects.filter(account__user=self.user).update(expires_at=timezone.now() - timedelta(minutes=5))
+
+        self.assertEqual(self.run_with_token_server(), {self.user.id: 'synced'})
+
+        token = SocialToken.objects.get(account__user=self.user)
+        self.assertEqual(token.token, self.server.access_token)
+        self.assertGreater(token.expires_at, timezone.now() + timedelta(minutes=30))
+        self.assertEqual(self.server.calls['token.refresh'], 1)
+        # Обновлен заранее, ни один запрос не получил 401
+        self.assertEqual(self.server.calls['auth.rejected'], 0)
+        self.assertEqual(Event.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(GoogleCalendar.objects.get(user=self.user).sync_failures, 0)
+
+    def test_token_rejected_before_expiry_is_refreshed_once(self):
+        SocialToken.objects.filter(account__user=self.user).update(expires_at=timezone.now() + timedelta(minutes=30))
+
+        self.assertEqual(self.run_with_token_server(), {self.user.id: 'synced'})
+
+        self.assertEqual(self.server.calls['token.refresh'], 1)
+        self.assertEqual(self.server.calls['auth.rejected'], 1)
+        self.assertEqual(SocialToken.objects.get(account__user=self.user).token, self.server.access_token)
+
+
+class FakeGoogleServerTests(GoogleSyncTestCase):
+    def test_sync_token_expiry_returns_410(self):
+        self.add_google_event(0)
+        service = self.server.build_service()
+        token = service.events().list(calendarId=self.calendar_id).execute()['nextSyncToken']
+        self.add_google_event(1)
+
+        changed = service.events().list(calendarId=self.calendar_id, syncToken=token).execute()
+        self.server.expire_sync_tokens()
+
+        self.assertEqual(len(changed['items']), 1)
+        with self.assertRaises(HttpError) as ctx:
+            service.events().list(calendarId=self.calendar_id, syncToken=token).execute()
+        self.assertEqual(ctx.exception.resp.status, 410)
+
+    def test_batch_insert(self):
+        service = self.server.build_service()
+        created = []
+        batch = service.new_batch_http_request(callback=lambda request_id, response, exception: created.append(response['id']))
+        for i in range(3):
+            body = google_event_body(f'Lecture {i}', slot_start(i, self.first_day), 'IT-21', 'Math', 'lecture')
+            batch.add(service.events().insert(calendarId=self.calendar_id, body=body))
+
+        batch.execute()
+
+        self.assertEqual(len(created), 3)
+        self.assertEqual(self.server.calls['events.insert'], 3)
+        self.assertEqual(self.server.calls['batch'], 1)
+
+
+class SyncRunTests(GoogleSyncTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('googlecalendar.tasks.GoogleCalendarSync', side_effect=self.make_sync)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_full_sync_records_run(self):
+        self.add_google_event(0)
+        self.add_google_event(1, group_name='Unknown group')
+        self.create_local_event(2)
+
+        full_sync_user.apply(args=[self.user.id])
+
+        run = SyncRun.objects.get(user=self.user)
+        self.assertEqual((run.kind, run.direction, run.status), ('full', 'both', 'ok'))
+        self.assertEqual(run.events_created, 2)
+        self.assertEqual(run.events_rejected, 1)
+        self.assertEqual(run.api_calls, self.server.total_calls())
+        self.assertGreater(run.db_queries, 0)
+
+    def test_single_event_records_lag_and_error_class(self):
+        event = self.create_local_event(0)
+        sync_single_event.apply(args=[event.id])
+        event.refresh_from_db()
+        event.title = 'Edited'
+        event.save()
+        self.server.fail('events.update', 500)
+        sync_single_event.apply(args=[event.id])
+
+        runs = SyncRun.objects.filter(user=self.user).order_by('started_at', 'id')
+        first = runs.first()
+        self.assertEqual((first.kind, first.status, first.events_created), ('event', 'ok', 1))
+        self.assertIsNotNone(first.lag_ms)
+        # Повтор задачи после ошибки пишет свой SyncRun
+        self.assertEqual(list(runs.values_list('status', 'error_class'))[1:], [('error', 'HttpError'), ('ok', '')])
+
+    def test_stats_endpoint(self):
+        for duration in (100, 200, 300, 400):
+            SyncRun.objects.create(user=self.user, kind='event', direction='local_to_google', duration_ms=duration, lag_ms=duration * 10)
+        SyncRun.objects.create(user=self.create_teacher('other@example.com'), kind='full', direction='both', duration_ms=5000)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get('/api/sync/runs/stats/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total']['runs'], 4)
+        self.assertEqual(response.data['event']['duration_ms'], {'p50': 200, 'p95': 400})
+        self.assertEqual(response.data['event']['lag_ms']['p50'], 2000)
+        self.assertEqual(response.data['full']['runs'], 0)
+
+    def test_summary_is_computed_in_db(self):
+        for duration in range(1, 101):
+            SyncRun.objects.create(user=self.user, kind='event', direction='local_to_google', duration_ms=duration, lag_ms=duration)
+        SyncRun.objects.create(user=self.user, kind='full', direction='both', status='skipped', duration_ms=0)
+
+        # PostgreSQL: один агрегат, иначе агрегат и по запросу на перцентиль
+        with self.assertNumQueries(1 if connection.vendor == 'postgresql' else 5):
+            summary = summarize_sync_runs(SyncRun.objects.all())
+
+        self.assertEqual(summary['runs'], 100)
+        self.assertEqual(summary['duration_ms'], {'p50': 50, 'p95': 95})
+        self.assertEqual(summary['lag_ms'], {'p50': 50, 'p95': 95})
+
+    def test_skipped_run_is_counted_not_saved(self):
+        with mock.patch('googlecalendar.leases.Lease.acquire', return_value=False), \
+                mock.patch('googlecalendar.metrics.count_skipped_run') as count_skipped_run:
+            full_sync_user.apply(args=[self.user.id])
+
+        self.assertFalse(SyncRun.objects.exists())
+        count_skipped_run.assert_called_once_with('full')
+
+    def test_prune_deletes_old_runs(self):
+        SyncRun.objects.create(user=self.user, kind='full', direction='both', started_at=timezone.now() - timedelta(days=60))
+        recent = SyncRun.objects.create(user=self.user, kind='full', direction='both')
+
+        prune_sync_runs.apply()
+
+        self.assertEqual(list(SyncRun.objects.all()), [recent])
+
+    def test_percentile(self):
+        self.assertIsNone(percentile([], 50))
+        self.assertEqual(percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 95), 10)
+        self.assertEqual(percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 50), 5)
+
+
+@override_settings(GOOGLE_SYNC_CIRCUIT_THRESHOLD=3, GOOGLE_SYNC_CIRCUIT_COOLDOWN=300)
+class CircuitBreakerTests(GoogleSyncTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('googlecalendar.tasks.GoogleCalendarSync', side_effect=self.make_sync)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_missing_calendar_opens_circuit_without_retries(self):
+        self.server.fail('events.list', 404, times=3)
+
+        for _ in range(3):
+            full_sync_user.apply(args=[self.user.id])
+
+        calendar = GoogleCalendar.objects.get(user=self.user)
+        self.assertEqual(self.server.calls['events.list'], 3)
+        self.assertEqual((calendar.sync_failures, calendar.last_failure_reason), (3, 'not_found'))
+        self.assertGreater(calendar.circuit_open_until, timezone.now() + timedelta(seconds=290))
+
+        with mock.patch('googlecalendar.tasks.full_sync_user.apply_async') as queued:
+            periodic_full_sync.apply()
+        queued.assert_not_called()
+
+    def test_tripped_circuit_stops_pushes_until_reconnect(self):
+        GoogleCalendar.objects.filter(user=self.user).update(sync_failures=3, last_failure_reason='auth')
+        self.user.refresh_from_db()
+        self.create_local_event(0)
+        self.queued.assert_not_called()
+
+        reset_circuit(self.user)
+        self.user = User.objects.get(pk=self.user.pk)
+        self.create_local_event(1)
+        self.queued.assert_called_once()
+
+    def test_tripped_circuit_skips_google_deletes(self):
+        event = self.create_local_event(0)
+        Event.objects.filter(pk=event.pk).update(google_event_id=self.add_google_event(0)['id'])
+        GoogleCalendar.objects.filter(user=self.user).update(sync_failures=3, last_failure_reason='auth')
+
+        Event.objects.get(pk=event.pk).delete()
+
+        self.assertEqual(self.server.calls['events.delete'], 0)
+
+    def test_reconnect_drops_missing_calendar(self):
+        event = self.create_local_event(0)
+        Event.objects.filter(pk=event.pk).update(google_event_id='gone', google_calendar_id=self.calendar_id)
+        GoogleCalendar.objects.filter(user=self.user).update(sync_failures=3, last_failure_reason='not_found')
+
+        reset_circuit(self.user)
+
+        self.assertFalse(GoogleCalendar.objects.filter(user=self.user).exists())
+        self.assertIsNone(Event.objects.get(pk=event.pk).google_event_id)
+
+    def test_failure_reason(self):
+        def http_error(status, uri):
+            return HttpError(httplib2.Response({'status': status}), b'{}', uri=uri)
+
+        base = 'https://www.googleapis.com/calendar/v3/calendars/cal%40group.calendar.google.com/events'
+        self.assertEqual(failure_reason(RefreshError('invalid_grant')), 'auth')
+        self.assertEqual(failure_reason(http_error(401, base)), 'auth')
+        self.assertEqual(failure_reason(http_error(404, base + '?alt=json')), 'not_found')
+        self.assertIsNone(failure_reason(http_error(404, base + '/event123?alt=json')))
+        self.assertIsNone(failure_reason(http_error(500, base)))
+
+
+@override_settings(GOOGLE_SYNC_BACKFILL_BATCH_SIZE=4)
+class CalendarBackfillTests(GoogleSyncTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('googlecalendar.tasks.GoogleCalendarSync', side_effect=self.make_sync)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch(
+            'googlecalendar.tasks.backfill_calendar.delay',
+            side_effect=lambda *args, **kwargs: backfill_calendar.apply(args=args, kwargs=kwargs),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_new_calendar_backfills_existing_events_in_batches(self):
+        GoogleCalendar.objects.filter(user=self.user).delete()
+        self.user = User.objects.get(pk=self.user.pk)
+        for i in range(10):
+            self.create_local_event(i)
+
+        create_google_calendar_task.apply(args=[self.user.id])
+
+        calendar_id = GoogleCalendar.objects.get(user=self.user).calendar_id
+        backfill = CalendarBackfill.objects.get(user=self.user)
+        self.assertEqual((backfill.status, backfill.total, backfill.pushed, backfill.failed, backfill.percent), ('done', 10, 10, 0, 100))
+        self.assertEqual(len(self.server.events(calendar_id)), 10)
+        self.assertEqual(self.server.calls['batch'], 3)
+        self.assertFalse(Event.objects.filter(user=self.user, google_event_id__isnull=True).exists())
+        self.assertEqual(SyncRun.objects.get(user=self.user, kind='backfill').events_created, 10)
+
+    def test_rate_limited_inserts_are_retried(self):
+        for i in range(3):
+            self.create_local_event(i)
+        self.server.fail('events.insert', 429)
+        backfill = CalendarBackfill.objects.create(user=self.user, total=3)
+
+        backfill_calendar.apply(args=[self.user.id, backfill.id])
+
+        backfill.refresh_from_db()
+        self.assertEqual((backfill.pushed, backfill.failed), (3, 0))
+        self.assertEqual(self.server.calls['events.insert'], 4)
+
+    def test_busy_lease_requeues_without_using_retries(self):
+        backfill = CalendarBackfill.objects.create(user=self.user, total=3)
+
+        with mock.patch('googlecalendar.leases.Lease.acquire', return_value=False), \
+                mock.patch('googlecalendar.tasks.backfill_calendar.apply_async') as queued:
+            result = backfill_calendar.apply(args=[self.user.id, backfill.id])
+
+        self.assertTrue(result.successful())
+        queued.assert_called_once_with(kwargs={'user_id': self.user.id, 'backfill_id': backfill.id}, countdown=10)
+        backfill.refresh_from_db()
+        self.assertEqual(backfill.status, 'pending')
+
+    @override_settings(GOOGLE_SYNC_BACKFILL_TIMEOUT=60)
+    def test_backfill_fails_when_lease_stays_busy_past_timeout(self):
+        backfill = CalendarBackfill.objects.create(user=self.user, total=3)
+        CalendarBackfill.objects.filter(pk=backfill.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+
+        with mock.patch('googlecalendar.leases.Lease.acquire', return_value=False), \
+                mock.patch('googlecalendar.tasks.backfill_calendar.apply_async') as queued:
+            backfill_calendar.apply(args=[self.user.id, backfill.id])
+
+        queued.assert_not_called()
+        backfill.refresh_from_db()
+        self.assertEqual((backfill.status, backfill.error), ('failed', 'Another sync kept running'))
+
+    def test_progress_endpoint(self):
+        CalendarBackfill.objects.create(user=self.user, status='running', total=40, pushed=10)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get('/api/sync/backfill/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['status'], response.data['percent']), ('running', 25))
+
+    def test_periodic_sync_skips_users_being_backfilled(self):
+        CalendarBackfill.objects.create(user=self.user, status='running', total=40)
+
+        with mock.patch('googlecalendar.tasks.full_sync_user.apply_async') as queued:
+            periodic_full_sync.apply()
+
+        queued.assert_not_called()
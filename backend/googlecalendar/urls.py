@@ -0,0 +1,11 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from . import views
+
+router = DefaultRouter()
+router.register(r'runs', views.SyncRunViewSet, basename='sync-run')
+router.register(r'backfill', views.CalendarBackfillViewSet, basename='calendar-backfill')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
@@ -1,3 +1,47 @@
-from django.shortcuts import render
+from datetime import timedelta
+from django.utils import timezone
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from .models import SyncRun, CalendarBackfill
+from .metrics import skipped_run_counts, summarize_sync_runs
+from .serializers import SyncRunSerializer, CalendarBackfillSerializer
 
-# Create your views here.
+class SyncRunViewSet(viewsets.ReadOnlyModelViewSet):
+    permission_classes = [IsAuthenticated]
+    serializer_class = SyncRunSerializer
+
+    def get_queryset(self):
+        return SyncRun.objects.filter(user=self.request.user)
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """p50/p95 sync duration and edit-to-Google lag over the last `days` days (default 7).
+
+        Staff can pass all=1 to aggregate over every user, that also adds the
+        runs skipped because another sync held the lease (counted per kind only).
+        """
+        try:
+            days = int(request.query_params.get('days', 7))
+        except ValueError:
+            return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        everyone = request.user.is_staff and request.query_params.get('all')
+        runs = SyncRun.objects.all() if everyone else self.get_queryset()
+        runs = runs.filter(started_at__gte=timezone.now() - timedelta(days=days))
+        summary = {kind: summarize_sync_runs(runs.filter(kind=kind)) for kind, _ in SyncRun.KINDS}
+        data = {'days': days, 'total': summarize_sync_runs(runs), **summary}
+        if everyone:
+            data['skipped'] = skipped_run_counts(days)
+        return Response(data)
+
+class CalendarBackfillViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        """Progress of the latest backfill, for polling after the calendar is connected."""
+        backfill = CalendarBackfill.objects.filter(user=request.user).first()
+        if backfill is None:
+            return Response({'message': 'No calendar backfill'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(CalendarBackfillSerializer(backfill).data)
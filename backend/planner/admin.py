@@ -1,26 +1,84 @@
 from django.contrib import admin
-from .models import Subject, Group, Event, Plan
+from googlecalendar.tasks import resync_users
+from .admin_tools import CappedCountPaginator, autocomplete_filter, autocomplete_filter_media
+from .models import Subject, Group, Event, Plan, ArchivedEvent
 
 @admin.register(Subject)
 class SubjectAdmin(admin.ModelAdmin):
     list_display = ('name', 'user', 'created_at')
     search_fields = ('name', 'description')
-    list_filter = ('created_at', 'user')
+    list_filter = ('created_at', autocomplete_filter('user'))
+    list_select_related = ('user',)
+
+    @property
+    def media(self):
+        return super().media + autocomplete_filter_media(self, 'user')
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('name', 'user', 'created_at')
     search_fields = ('name', 'description')
-    list_filter = ('created_at', 'user')
+    list_filter = ('created_at', autocomplete_filter('user'))
+    list_select_related = ('user',)
+
+    @property
+    def media(self):
+        return super().media + autocomplete_filter_media(self, 'user')
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
     list_display = ('title', 'group', 'subject', 'type', 'start', 'end', 'user')
-    search_fields = ('title', 'location', 'notes', 'group__name', 'subject__name')
-    list_filter = ('type', 'start', 'user', 'group', 'subject')
+    list_select_related = ('user', 'group', 'subject')
+    list_filter = ('type', autocomplete_filter('user'), autocomplete_filter('group'), autocomplete_filter('subject'))
+    date_hierarchy = 'start'
+    # Только индексируемый поиск: начало названия, id события в Google, email владельца
+    search_fields = ('title__startswith', 'google_event_id__exact', 'user__email__exact')
+    search_help_text = 'Title prefix (case-sensitive, quote it if it has spaces), exact Google event id or exact owner email'
+    # Миллионы строк: без COUNT(*) по всей таблице и без счетчиков у фильтров
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    paginator = CappedCountPaginator
+    actions = ['resync_calendars']
+
+    @property
+    def media(self):
+        return super().media + autocomplete_filter_media(self, 'user')
+
+    @admin.action(description='Re-sync Google calendars of the events\' owners')
+    def resync_calendars(self, request, queryset):
+        user_ids = queryset.order_by().values_list('user_id', flat=True).distinct()
+        queued, running = resync_users(user_ids)
+        self.message_user(request, f"Re-sync queued for {queued} users, {running} already running")
 
 @admin.register(Plan)
 class PlanAdmin(admin.ModelAdmin):
     list_display = ('name', 'group', 'subject', 'lecture_hours', 'practice_hours', 'lab_hours', 'other_hours', 'user')
-    search_fields = ('title', 'group__name', 'subject__name')
-    list_filter = ('user', 'group', 'subject')
+    search_fields = ('name', 'group__name', 'subject__name')
+    list_filter = (autocomplete_filter('user'), autocomplete_filter('group'), autocomplete_filter('subject'))
+    list_select_related = ('user', 'group', 'subject')
+
+    @property
+    def media(self):
+        return super().media + autocomplete_filter_media(self, 'user')
+
+@admin.register(ArchivedEvent)
+class ArchivedEventAdmin(admin.ModelAdmin):
+    """Read-only, events are moved back with `manage.py archive_events --restore`."""
+    list_display = ('title', 'group', 'subject', 'type', 'start', 'end', 'user', 'archived_at')
+    list_select_related = ('user', 'group', 'subject')
+    list_filter = ('type', autocomplete_filter('user'))
+    date_hierarchy = 'start'
+    search_fields = ('title__startswith', 'user__email__exact')
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    paginator = CappedCountPaginator
+
+    @property
+    def media(self):
+        return super().media + autocomplete_filter_media(self, 'user')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
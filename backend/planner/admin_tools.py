@@ -0,0 +1,81 @@
+"""Admin pieces for tables too large for the default changelist.
+
+RelatedFieldListFilter renders a link per related row and the paginator
+counts every matching row, both break down with millions of events.
+"""
+from django import forms
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+
+class CappedCountPaginator(Paginator):
+    """Counts at most max_count rows (COUNT over a LIMIT subquery), later pages aren't reachable."""
+    max_count = 10000
+
+    @cached_property
+    def count(self):
+        return self.object_list[:self.max_count].count()
+
+
+class AutocompleteFilter(admin.SimpleListFilter):
+    """Filter on a foreign key, the value is picked with the admin's select2 autocomplete.
+
+    Subclass with title and field_name, the related model's admin needs
+    search_fields. The ModelAdmin has to include autocomplete_filter_media().
+    """
+    template = 'admin/planner/autocomplete_filter.html'
+    field_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        self.field = model._meta.get_field(self.field_name)
+        self.parameter_name = f'{self.field_name}__{self.field.target_field.name}__exact'
+        self.admin_site = model_admin.admin_site
+        super().__init__(request, params, model, model_admin)
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        try:
+            return queryset.filter(**{self.parameter_name: self.value()})
+        except (ValueError, ValidationError) as e:
+            raise IncorrectLookupParameters(e)
+
+    def choices(self, changelist):
+        self.query_string = changelist.get_query_string(remove=[self.parameter_name])
+        yield {
+            'selected': self.value() is None,
+            'query_string': self.query_string,
+            'display': _('All'),
+        }
+
+    def widget(self):
+        # Подпись выбранного значения - один запрос по pk, остальное подгружает select2
+        formfield = self.field.formfield(required=False, widget=AutocompleteSelect(self.field, self.admin_site))
+        return formfield.widget.render(
+            self.parameter_name, self.value(), attrs={'id': f'filter_{self.parameter_name}', 'data-width': '100%'}
+        )
+
+
+def autocomplete_filter(field_name, title=None):
+    return type(f'{field_name.title()}AutocompleteFilter', (AutocompleteFilter,), {
+        'field_name': field_name,
+        'title': title or field_name,
+    })
+
+
+def autocomplete_filter_media(model_admin, field_name):
+    field = model_admin.model._meta.get_field(field_name)
+    return AutocompleteSelect(field, model_admin.admin_site).media + forms.Media(
+        js=['admin/planner/autocomplete_filter.js']
+    )
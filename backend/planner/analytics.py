@@ -0,0 +1,185 @@
+"""Teaching load of the whole department for an academic year.
+
+All events of the year, live and archived, come in one streamed query
+(values_list + iterator, no model instances) into NumPy columns. Durations
+are summed per teacher, group, subject, type and month, rounded like the
+monthly stats (planner.views.round_duration), then summed up per teacher,
+group, subject and type with bincount.
+
+Results are cached per process under the year and a data version: count,
+id sum and latest write time of the year's events in both tables. Event
+writes set Event.changed_at (auto_now, and explicitly in the sync's
+QuerySet.update), archived rows are only ever written by archive runs
+(archived_at). last_update can't be used: the sync stores Google's own
+`updated` there, which may be older than other events' edits. An edit,
+delete, sync or archive run changes the version, and the version check
+is one small aggregate per table.
+"""
+import threading
+from datetime import datetime
+import numpy as np
+from cachetools import LRUCache
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Max, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+from .models import ArchivedEvent, Event, Group, Subject
+
+EVENT_TYPES = [event_type for event_type, _ in Event.EVENT_TYPES]
+
+_cache = None
+_lock = threading.RLock()
+
+
+def _report_cache():
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = LRUCache(maxsize=settings.ANALYTICS_CACHE_SIZE)
+    return _cache
+
+
+def academic_year_range(year):
+    """[start, end) of the academic year that starts in `year`."""
+    start_month = settings.ANALYTICS_ACADEMIC_YEAR_START_MONTH
+    start = timezone.make_aware(datetime(year, start_month, 1))
+    return start, start.replace(year=year + 1)
+
+
+def current_academic_year():
+    today = timezone.localdate()
+    return today.year if today.month >= settings.ANALYTICS_ACADEMIC_YEAR_START_MONTH else today.year - 1
+
+
+def data_version(start, end):
+    version = []
+    for model, written_at in ((Event, 'changed_at'), (ArchivedEvent, 'archived_at')):
+        row = model.objects.filter(start__gte=start, start__lt=end).aggregate(
+            count=Count('id'), written_at=Max(written_at), ids=Sum('id')
+        )
+        version.append((row['count'], row['written_at'], row['ids']))
+    return tuple(version)
+
+
+def _event_rows(start, end):
+    duration = ExpressionWrapper(F('end') - F('start'), output_field=DurationField())
+
+    def rows(model):
+        # Месяц и год в БД, в текущем часовом поясе - как start__month в monthly_stats_query
+        return model.objects.filter(start__gte=start, start__lt=end).annotate(
+            duration=duration, month=ExtractMonth('start'), year=ExtractYear('start')
+        ).values_list('user_id', 'group_id', 'subject_id', 'type', 'year', 'month', 'duration').order_by()
+
+    return rows(Event).union(rows(ArchivedEvent), all=True).iterator(chunk_size=settings.ANALYTICS_CHUNK_SIZE)
+
+
+def load_columns(start, end):
+    """Events of [start, end) as columns: user, group, subject, type index, month key and minutes."""
+    chunks = []
+    batch = []
+    for row in _event_rows(start, end):
+        batch.append(row)
+        if len(batch) == settings.ANALYTICS_CHUNK_SIZE:
+            chunks.append(_to_columns(batch))
+            batch = []
+    if batch or not chunks:
+        chunks.append(_to_columns(batch))
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+
+
+def _to_columns(rows):
+    user, group, subject, event_type, year, month, duration = zip(*rows) if rows else ([],) * 7
+    type_index = {name: i for i, name in enumerate(EVENT_TYPES)}
+    return {
+        'user': np.array(user, dtype=np.int64),
+        'group': np.array(group, dtype=np.int64),
+        'subject': np.array(subject, dtype=np.int64),
+        'type': np.array([type_index[name] for name in event_type], dtype=np.int64),
+        'month': np.array(year, dtype=np.int64) * 12 + np.array(month, dtype=np.int64),
+        'minutes': np.array(duration, dtype='timedelta64[us]').astype(np.float64) / 60e6,
+    }
+
+
+def round_hours(minutes):
+    """round_duration on an array of monthly totals in minutes."""
+    return np.where(
+        np.abs(minutes - 90) < 1, 2.0,
+        np.where(np.abs(minutes - 45) < 1, 1.0, minutes / 60),
+    )
+
+
+def _hours_by_type(keys, type_index, hours):
+    """Rows of hours per type for each distinct key, plus the distinct keys."""
+    unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    flat = inverse * len(EVENT_TYPES) + type_index
+    table = np.bincount(flat, weights=hours, minlength=len(unique) * len(EVENT_TYPES))
+    return unique, table.reshape(len(unique), len(EVENT_TYPES))
+
+
+def _hours_fields(row):
+    fields = {f'{name}_hours': float(row[i]) for i, name in enumerate(EVENT_TYPES)}
+    fields['total_hours'] = float(row.sum())
+    return fields
+
+
+def compute_load(columns):
+    """Rounded hours per teacher, group, subject and type, ids only."""
+    # Округление как в месячной статистике: сумма за месяц по группе, предмету и типу
+    monthly_keys = np.stack(
+        [columns['user'], columns['group'], columns['subject'], columns['type'], columns['month']], axis=1
+    )
+    monthly, inverse = np.unique(monthly_keys, axis=0, return_inverse=True)
+    hours = round_hours(np.bincount(inverse.reshape(-1), weights=columns['minutes'], minlength=len(monthly)))
+    user, group, subject, type_index = monthly[:, 0], monthly[:, 1], monthly[:, 2], monthly[:, 3]
+
+    teachers, teacher_hours = _hours_by_type(user[:, None], type_index, hours)
+    groups, group_hours = _hours_by_type(np.stack([user, group], axis=1), type_index, hours)
+    subjects, subject_hours = _hours_by_type(np.stack([user, subject], axis=1), type_index, hours)
+    type_hours = np.bincount(type_index, weights=hours, minlength=len(EVENT_TYPES))
+    return {
+        'teachers': [{'user_id': int(key[0]), **_hours_fields(row)} for key, row in zip(teachers, teacher_hours)],
+        'groups': [
+            {'user_id': int(key[0]), 'group_id': int(key[1]), **_hours_fields(row)}
+            for key, row in zip(groups, group_hours)
+        ],
+        'subjects': [
+            {'user_id': int(key[0]), 'subject_id': int(key[1]), **_hours_fields(row)}
+            for key, row in zip(subjects, subject_hours)
+        ],
+        'types': {name: float(type_hours[i]) for i, name in enumerate(EVENT_TYPES)},
+        'total_hours': float(hours.sum()),
+    }
+
+
+def _with_names(load):
+    """Names are looked up on every call: renames don't change the data version."""
+    users = dict(get_user_model().objects.filter(
+        id__in=[row['user_id'] for row in load['teachers']]
+    ).values_list('id', 'email'))
+    groups = dict(Group.objects.filter(id__in=[row['group_id'] for row in load['groups']]).values_list('id', 'name'))
+    subjects = dict(Subject.objects.filter(
+        id__in=[row['subject_id'] for row in load['subjects']]
+    ).values_list('id', 'name'))
+    return {
+        **load,
+        'teachers': [{**row, 'email': users.get(row['user_id'])} for row in load['teachers']],
+        'groups': [{**row, 'group_name': groups.get(row['group_id'])} for row in load['groups']],
+        'subjects': [{**row, 'subject_name': subjects.get(row['subject_id'])} for row in load['subjects']],
+    }
+
+
+def department_load(year):
+    """Teaching load of every teacher for the academic year starting in `year`."""
+    start, end = academic_year_range(year)
+    key = (year, data_version(start, end))
+    cache = _report_cache()
+    with _lock:
+        load = cache.get(key)
+    if load is None:
+        load = compute_load(load_columns(start, end))
+        with _lock:
+            cache[key] = load
+    return {'year': year, 'start': start, 'end': end, **_with_names(load)}
@@ -0,0 +1,88 @@
+"""Moves past-term events between Event and ArchivedEvent.
+
+Overlap checks, plan quotas and Google sync only ever look at Event, so
+keeping it to the current term keeps those queries small. Stats read both
+tables (planner.views.monthly_stats_query).
+
+Events are moved in batches of PLANNER_ARCHIVE_BATCH_SIZE, each batch in
+its own transaction. Nothing is sent to Google: archived events stay in the
+user's calendar as they are. The cutoff has to be older than the Google
+sync window, otherwise the next sync would re-import archived events from
+Google as new ones.
+"""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import ArchivedEvent, Event
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_FIELDS = [
+    'id', 'user_id', 'title', 'group_id', 'subject_id', 'start', 'end', 'type', 'location', 'notes',
+    'google_event_id', 'google_calendar_id', 'created_at', 'last_update',
+]
+
+
+def default_cutoff():
+    return timezone.now() - timedelta(days=settings.PLANNER_ARCHIVE_AFTER_DAYS)
+
+
+def check_cutoff(before):
+    sync_window_start = timezone.now() - timedelta(days=settings.GOOGLE_SYNC_WINDOW_PAST_DAYS)
+    if before > sync_window_start:
+        raise ValueError(
+            f"Cutoff {before:%Y-%m-%d} is inside the Google sync window "
+            f"({settings.GOOGLE_SYNC_WINDOW_PAST_DAYS} days), archived events would come back from Google"
+        )
+
+
+def _move(source, batch_size, copy):
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(source.order_by('pk').values(*ARCHIVED_FIELDS)[:batch_size])
+            if not rows:
+                return moved
+            copy(rows)
+            # _raw_delete без сигналов: post_delete события удалил бы его и из Google
+            source.model.objects.filter(pk__in=[row['id'] for row in rows])._raw_delete(source.db)
+        moved += len(rows)
+        logger.debug(f"Moved {moved} {source.model.__name__} rows")
+
+
+def archive_events(before=None, user=None, batch_size=None):
+    """Moves events that ended before the cutoff into ArchivedEvent. Returns the number moved."""
+    before = before or default_cutoff()
+    check_cutoff(before)
+    events = Event.objects.filter(end__lte=before)
+    if user is not None:
+        events = events.filter(user=user)
+
+    def copy(rows):
+        ArchivedEvent.objects.bulk_create([ArchivedEvent(**row) for row in rows])
+
+    moved = _move(events, batch_size or settings.PLANNER_ARCHIVE_BATCH_SIZE, copy)
+    logger.info(f"Archived {moved} events that ended before {before:%Y-%m-%d}")
+    return moved
+
+
+def restore_events(after=None, user=None, batch_size=None):
+    """Moves archived events back into Event, all of them or those that started after `after`."""
+    archived = ArchivedEvent.objects.all()
+    if after is not None:
+        archived = archived.filter(start__gte=after)
+    if user is not None:
+        archived = archived.filter(user=user)
+
+    def copy(rows):
+        events = Event.objects.bulk_create([Event(**row) for row in rows])
+        # bulk_create проставляет auto_now_add/auto_now текущим временем, возвращаем исходные
+        for event, row in zip(events, rows):
+            event.created_at, event.last_update = row['created_at'], row['last_update']
+        Event.objects.bulk_update(events, ['created_at', 'last_update'])
+
+    moved = _move(archived, batch_size or settings.PLANNER_ARCHIVE_BATCH_SIZE, copy)
+    logger.info(f"Restored {moved} archived events")
+    return moved
@@ -0,0 +1,100 @@
+"""Async versions of the dashboard reads: event range, stats and bootstrap.
+
+DRF views are synchronous, under ASGI each of them holds a thread for the
+whole request, DB waits included. These are plain Django async views over
+the async ORM with the same responses as the DRF ones. planner/urls.py
+routes to them with ASYNC_READ_VIEWS=True, meant for ASGI deployments
+(core.asgi), under WSGI Django would run every one in its own event loop.
+
+Serializers run after all rows are loaded: select_related covers every
+relation they read, a lazy query would raise SynchronousOnlyOperation.
+"""
+from datetime import datetime
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework.exceptions import APIException, NotAuthenticated
+from users.authentication import JWTCookieAuthentication
+from users.serializers import UserSerializer
+from .models import Group, Plan, Subject
+from .serializers import EventSerializer, GroupSerializer, MonthlyStatsSerializer, PlanSerializer, SubjectSerializer
+from .views import amonthly_stats, current_period, events_in_range, month_events, parse_range
+
+
+def async_api_view(view):
+    """JWT cookie authentication and DRF-style errors for an async GET view."""
+    authentication = JWTCookieAuthentication()
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+        try:
+            # Пользователь обычно в users.cache, тогда в БД не ходит
+            result = await sync_to_async(authentication.authenticate)(request)
+            if result is None:
+                raise NotAuthenticated()
+        except APIException as e:
+            response = JsonResponse(e.detail if isinstance(e.detail, dict) else {'detail': e.detail}, status=401)
+            response['WWW-Authenticate'] = authentication.authenticate_header(request)
+            return response
+        request.user = result[0]
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@async_api_view
+async def events_by_date_range(request):
+    try:
+        start, end = parse_range(request.GET)
+    except ValueError as e:
+        return JsonResponse({'message': str(e)}, status=400)
+    events = [event async for event in events_in_range(request.user, start, end)]
+    return JsonResponse({'data': EventSerializer(events, many=True).data})
+
+
+async def _stats_response(user, month, year):
+    stats = await amonthly_stats(user, month, year)
+    return JsonResponse(MonthlyStatsSerializer(stats, many=True).data, safe=False)
+
+
+@async_api_view
+async def stats(request):
+    current_date = datetime.now()
+    return await _stats_response(request.user, current_date.month, current_date.year)
+
+
+@async_api_view
+async def stats_by_month(request):
+    try:
+        month = int(request.GET.get('month'))
+        year = int(request.GET.get('year'))
+    except (TypeError, ValueError):
+        return JsonResponse({'message': 'Invalid month or year'}, status=400)
+    return await _stats_response(request.user, month, year)
+
+
+@async_api_view
+async def bootstrap(request):
+    user = request.user
+    month, year, month_start, month_end = current_period()
+    subjects = [subject async for subject in Subject.objects.filter(user=user)]
+    groups = [group async for group in Group.objects.filter(user=user)]
+    plans = [plan async for plan in Plan.objects.filter(user=user).select_related('group', 'subject')]
+    events = [event async for event in month_events(user, month_start, month_end)]
+    stats = await amonthly_stats(user, month, year)
+    context = {'request': request}
+    return JsonResponse({
+        'user': UserSerializer(user).data,
+        'subjects': SubjectSerializer(subjects, many=True, context=context).data,
+        'groups': GroupSerializer(groups, many=True, context=context).data,
+        'plans': PlanSerializer(plans, many=True, context=context).data,
+        'events': EventSerializer(events, many=True, context=context).data,
+        'stats': MonthlyStatsSerializer(stats, many=True).data,
+        'period': {
+            'month': month,
+            'year': year,
+            'start': month_start.isoformat(),
+            'end': month_end.isoformat(),
+        },
+    })
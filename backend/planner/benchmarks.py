@@ -0,0 +1,223 @@
+"""Dashboard read throughput: DRF views under WSGI vs async views under ASGI,
+and the timetable generator on a full semester.
+
+Not part of the regular test run. Run with:
+
+    python manage.py test planner.benchmarks
+
+Requests go straight into core.wsgi.application (from a pool of
+DASHBOARD_BENCH_WSGI_THREADS threads, like a gthread worker) and
+core.asgi.application (DASHBOARD_BENCH_CONCURRENCY requests in flight on one
+event loop), so the whole middleware stack and URL routing are measured.
+The in-memory SQLite has no network round trip, every query is delayed by
+DASHBOARD_BENCH_DB_LATENCY seconds to stand in for one. DASHBOARD_BENCH_OUTPUT
+writes the results to a JSON file for comparing runs.
+"""
+import asyncio
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.urls import include, path
+from rest_framework_simplejwt.tokens import AccessToken
+from core.asgi import application as asgi_application
+from core.wsgi import application as wsgi_application
+from . import async_views
+from .models import Event, Group, Plan, Subject
+from .scheduling import generate_schedule
+from .views import current_period
+
+User = get_user_model()
+
+# URLconf для прогона async-версий: планировщик с ASYNC_READ_VIEWS=True
+urlpatterns = [
+    path('api/bootstrap/', async_views.bootstrap),
+    path('api/events/by-date-range/', async_views.events_by_date_range),
+    path('api/stats/', async_views.stats),
+    path('api/', include('api.urls')),
+]
+
+
+def bench_setting(name, default, cast=int):
+    return cast(os.getenv(f'DASHBOARD_BENCH_{name}', default))
+
+
+@override_settings(AUTH_USER_CACHE_BACKEND='memory')
+class DashboardReadBenchmark(TransactionTestCase):
+    results = []
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        header = f"{'scenario':<22}{'endpoint':<28}{'requests':>10}{'wall, s':>10}{'req/s':>10}{'p50, ms':>10}{'p95, ms':>10}"
+        print('\n' + header + '\n' + '-' * len(header))
+        for row in cls.results:
+            print(f"{row['scenario']:<22}{row['endpoint']:<28}{row['requests']:>10}{row['wall']:>10.3f}"
+                  f"{row['rps']:>10.1f}{row['p50'] * 1000:>10.1f}{row['p95'] * 1000:>10.1f}")
+        output = os.getenv('DASHBOARD_BENCH_OUTPUT')
+        if output:
+            with open(output, 'w') as f:
+                json.dump(cls.results, f, indent=2)
+
+    def setUp(self):
+        self.requests = bench_setting('REQUESTS', 200)
+        self.concurrency = bench_setting('CONCURRENCY', 50)
+        self.wsgi_threads = bench_setting('WSGI_THREADS', 4)
+        latency = bench_setting('DB_LATENCY', 0.02, float)
+
+        def delay(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def add_delay(sender, connection, **kwargs):
+            if delay not in connection.execute_wrappers:
+                connection.execute_wrappers.append(delay)
+
+        # Потоки серверов открывают свои соединения, задержка добавляется каждому
+        connection_created.connect(add_delay, weak=False)
+        self.addCleanup(connection_created.disconnect, add_delay)
+        for conn in connections.all():
+            add_delay(None, conn)
+            self.addCleanup(conn.execute_wrappers.remove, delay)
+
+        self.user = User.objects.create(username='teacher@example.com', email='teacher@example.com')
+        self.cookie = f'access_token={AccessToken.for_user(self.user)}'
+        self.seed()
+
+    def seed(self):
+        _, _, month_start, _ = current_period()
+        for i in range(10):
+            group = Group.objects.create(user=self.user, name=f'IT-{i}', color='#336699')
+            subject = Subject.objects.create(user=self.user, name=f'Math {i}')
+            Plan.objects.create(user=self.user, name=f'Plan {i}', group=group, subject=subject, lecture_hours=100)
+            Event.objects.bulk_create([
+                Event(
+                    user=self.user, title=f'Lecture {i}.{day}', group=group, subject=subject, type='lecture',
+                    start=month_start + timedelta(days=day, hours=8 + i),
+                    end=month_start + timedelta(days=day, hours=8 + i, minutes=90),
+                )
+                for day in range(20)
+            ])
+        self.range_query = urlencode({
+            'start': month_start.isoformat(), 'end': (month_start + timedelta(days=7)).isoformat(),
+        })
+
+    def record(self, scenario, endpoint, wall, latencies):
+        latencies.sort()
+        self.results.append({
+            'scenario': scenario,
+            'endpoint': endpoint,
+            'requests': len(latencies),
+            'wall': wall,
+            'rps': len(latencies) / wall,
+            'p50': statistics.median(latencies),
+            'p95': latencies[int(len(latencies) * 0.95) - 1],
+        })
+
+    def wsgi_get(self, path, query):
+        environ = {'PATH_INFO': path, 'QUERY_STRING': query, 'HTTP_COOKIE': self.cookie, 'HTTP_HOST': 'testserver'}
+        setup_testing_defaults(environ)
+        statuses = []
+        started = time.perf_counter()
+        response = wsgi_application(environ, lambda status, headers: statuses.append(status))
+        try:
+            b''.join(response)
+        finally:
+            response.close()
+        self.assertTrue(statuses[0].startswith('200'), statuses[0])
+        return time.perf_counter() - started
+
+    async def asgi_get(self, path, query):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '',
+            'query_string': query.encode(), 'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+            'headers': [(b'host', b'testserver'), (b'cookie', self.cookie.encode())],
+        }
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        statuses = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # Клиент не отключается, Django отменит ожидание после ответа
+            await asyncio.Future()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        started = time.perf_counter()
+        await asgi_application(scope, receive, send)
+        self.assertEqual(statuses[0], 200)
+        return time.perf_counter() - started
+
+    def run_wsgi(self, path, query):
+        with ThreadPoolExecutor(self.wsgi_threads) as pool:
+            started = time.perf_counter()
+            latencies = list(pool.map(lambda _: self.wsgi_get(path, query), range(self.requests)))
+            return time.perf_counter() - started, latencies
+
+    def run_asgi(self, path, query):
+        async def run():
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def one():
+                async with semaphore:
+                    return await self.asgi_get(path, query)
+
+            started = time.perf_counter()
+            latencies = await asyncio.gather(*(one() for _ in range(self.requests)))
+            return time.perf_counter() - started, list(latencies)
+        return asyncio.run(run())
+
+    def test_dashboard_reads(self):
+        endpoints = [
+            ('/api/bootstrap/', ''),
+            ('/api/stats/', ''),
+            ('/api/events/by-date-range/', self.range_query),
+        ]
+        for path, query in endpoints:
+            with self.subTest(endpoint=path):
+                self.record(f'wsgi drf x{self.wsgi_threads}', path, *self.run_wsgi(path, query))
+                self.record(f'asgi drf c{self.concurrency}', path, *self.run_asgi(path, query))
+                with self.settings(ROOT_URLCONF=__name__):
+                    self.record(f'asgi async c{self.concurrency}', path, *self.run_asgi(path, query))
+
+
+class ScheduleBenchmark(TestCase):
+    """generate_schedule for SCHEDULE_BENCH_PLANS plans over an 18-week semester, 6 days a week, 7 slots a day."""
+
+    def test_semester(self):
+        plans = int(os.getenv('SCHEDULE_BENCH_PLANS', 40))
+        user = User.objects.create(username='teacher@example.com', email='teacher@example.com')
+        for i in range(plans):
+            group = Group.objects.create(user=user, name=f'IT-{i}', color='#336699')
+            subject = Subject.objects.create(user=user, name=f'Subject {i}')
+            Plan.objects.create(
+                user=user, name=f'Plan {i}', group=group, subject=subject,
+                lecture_hours=18, practice_hours=9, lab_hours=3,
+            )
+        first_day = timezone.localdate() + timedelta(days=1)
+        slots = [(datetime.min + timedelta(hours=8, minutes=100 * i)).time() for i in range(7)]
+        blocked = [(
+            timezone.make_aware(datetime.combine(first_day + timedelta(weeks=8), datetime.min.time())),
+            timezone.make_aware(datetime.combine(first_day + timedelta(weeks=9), datetime.min.time())),
+        )]
+
+        started = time.perf_counter()
+        sessions, unplaced = generate_schedule(
+            user, first_day, first_day + timedelta(weeks=18), [0, 1, 2, 3, 4, 5], slots, blocked=blocked,
+        )
+        elapsed = time.perf_counter() - started
+        print(f"\n{plans} plans: {len(sessions)} sessions placed, {sum(unplaced.values())} unplaced in {elapsed:.3f} s")
+        self.assertLess(elapsed, 2)
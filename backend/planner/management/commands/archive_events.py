@@ -0,0 +1,43 @@
+from datetime import datetime
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from planner.archive import archive_events, default_cutoff, restore_events
+
+
+def parse_day(value):
+    try:
+        return timezone.make_aware(datetime.strptime(value, '%Y-%m-%d'))
+    except ValueError:
+        raise CommandError(f"Invalid date {value}, expected YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = 'Moves past events into the archive table (PLANNER_ARCHIVE_AFTER_DAYS) or back with --restore'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Archive events that ended before this date (YYYY-MM-DD)')
+        parser.add_argument('--restore', action='store_true', help='Move archived events back to the live table')
+        parser.add_argument('--after', help='With --restore: only events that started on or after this date')
+        parser.add_argument('--user', help='Only events of the user with this email')
+        parser.add_argument('--batch-size', type=int, help='Events per transaction')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            user = get_user_model().objects.filter(email=options['user']).first()
+            if user is None:
+                raise CommandError(f"User {options['user']} not found")
+
+        if options['restore']:
+            after = parse_day(options['after']) if options['after'] else None
+            moved = restore_events(after=after, user=user, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Restored {moved} events'))
+            return
+
+        before = parse_day(options['before']) if options['before'] else default_cutoff()
+        try:
+            moved = archive_events(before=before, user=user, batch_size=options['batch_size'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} events that ended before {before:%Y-%m-%d}'))
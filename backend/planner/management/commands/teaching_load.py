@@ -0,0 +1,30 @@
+import json
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from planner.analytics import current_academic_year, department_load
+
+
+class Command(BaseCommand):
+    help = 'Prints the teaching load of every teacher for an academic year'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='Year the academic year starts in, the current one by default')
+        parser.add_argument('--json', action='store_true', help='Print the full report as JSON')
+
+    def handle(self, *args, **options):
+        load = department_load(options['year'] or current_academic_year())
+        if options['json']:
+            self.stdout.write(json.dumps(load, cls=DjangoJSONEncoder, indent=2))
+            return
+
+        self.stdout.write(f"Academic year {load['start']:%Y-%m-%d} - {load['end']:%Y-%m-%d}")
+        header = f"{'teacher':<32}{'lecture':>10}{'practice':>10}{'lab':>10}{'other':>10}{'total':>10}"
+        self.stdout.write(header + '\n' + '-' * len(header))
+        for row in sorted(load['teachers'], key=lambda row: -row['total_hours']):
+            self.stdout.write(
+                f"{row['email'] or row['user_id']:<32}{row['lecture_hours']:>10.1f}{row['practice_hours']:>10.1f}"
+                f"{row['lab_hours']:>10.1f}{row['other_hours']:>10.1f}{row['total_hours']:>10.1f}"
+            )
+        self.stdout.write(f"{'all teachers':<32}" + ''.join(
+            f"{load['types'][name]:>10.1f}" for name in ('lecture', 'practice', 'lab', 'other')
+        ) + f"{load['total_hours']:>10.1f}")
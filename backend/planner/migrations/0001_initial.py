@@ -0,0 +1,77 @@
+# Generated by Django 5.2.1 on 2026-10-19 05:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Event',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('type', models.CharField(choices=[('lecture', 'Lecture'), ('practice', 'Practice'), ('lab', 'Lab'), ('other', 'Other')], max_length=10)),
+                ('location', models.CharField(blank=True, max_length=200)),
+                ('notes', models.TextField(blank=True, max_length=300)),
+                ('google_event_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('google_calendar_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('is_syncing', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_update', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['start', 'end'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Group',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('color', models.CharField(max_length=7)),
+                ('description', models.TextField(blank=True, max_length=150, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_update', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Plan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('lecture_hours', models.PositiveIntegerField(blank=True, default=0, null=True)),
+                ('practice_hours', models.PositiveIntegerField(blank=True, default=0, null=True)),
+                ('lab_hours', models.PositiveIntegerField(blank=True, default=0, null=True)),
+                ('other_hours', models.PositiveIntegerField(blank=True, default=0, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_update', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Subject',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True, max_length=150, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_update', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
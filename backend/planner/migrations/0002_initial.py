@@ -0,0 +1,70 @@
+# Generated by Django 5.2.1 on 2026-10-19 05:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('planner', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='group',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='planner.group'),
+        ),
+        migrations.AddField(
+            model_name='plan',
+            name='group',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='plans', to='planner.group'),
+        ),
+        migrations.AddField(
+            model_name='plan',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='plan',
+            name='subject',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='plans', to='planner.subject'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='subject',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='planner.subject'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='group',
+            unique_together={('name', 'user')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='subject',
+            unique_together={('name', 'user')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='plan',
+            unique_together={('name', 'user')},
+        ),
+    ]
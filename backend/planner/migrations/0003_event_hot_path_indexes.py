@@ -0,0 +1,52 @@
+# Generated by Django 5.2.1 on 2026-10-19 05:38
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def unlink_duplicate_google_events(apps, schema_editor):
+    """Before the unique constraint: one local event per Google event, the oldest keeps the link."""
+    Event = apps.get_model('planner', 'Event')
+    duplicates = (
+        Event.objects.filter(google_event_id__isnull=False)
+        .values('user', 'google_event_id')
+        .annotate(count=Count('id'), keep=Min('id'))
+        .filter(count__gt=1)
+    )
+    for row in duplicates:
+        Event.objects.filter(user=row['user'], google_event_id=row['google_event_id']).exclude(pk=row['keep']).update(
+            google_event_id=None, google_calendar_id=None
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['user', 'start', 'end'], name='event_user_start_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['user', 'group', 'subject', 'type'], name='event_user_plan_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['google_event_id'], name='event_google_event_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['user', 'google_calendar_id'], name='event_user_gcal_idx'),
+        ),
+        migrations.RunPython(unlink_duplicate_google_events, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='event',
+            constraint=models.UniqueConstraint(fields=('user', 'google_event_id'), name='event_unique_google_event_per_user'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+# Только PostgreSQL: на SQLite пересечения по-прежнему проверяет EventSerializer.validate.
+# Если в базе уже есть пересекающиеся события, их нужно развести до миграции.
+ADD_CONSTRAINT = [
+    # btree_gist нужен для user_id WITH = в GiST-индексе
+    'CREATE EXTENSION IF NOT EXISTS btree_gist',
+    """ALTER TABLE planner_event ADD CONSTRAINT event_no_overlap
+        EXCLUDE USING gist (user_id WITH =, tstzrange("start", "end", '[)') WITH &&)""",
+]
+
+DROP_CONSTRAINT = 'ALTER TABLE planner_event DROP CONSTRAINT IF EXISTS event_no_overlap'
+
+
+def add_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in ADD_CONSTRAINT:
+            schema_editor.execute(statement)
+
+
+def drop_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_CONSTRAINT)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0003_event_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_overlap_constraint, drop_overlap_constraint),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-19 05:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0004_event_no_overlap'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['start', 'end'], name='event_start_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['title'], name='event_title_like_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
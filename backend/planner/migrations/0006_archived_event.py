@@ -0,0 +1,40 @@
+# Generated by Django 5.2.1 on 2026-10-19 05:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0005_event_admin_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedEvent',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('type', models.CharField(choices=[('lecture', 'Lecture'), ('practice', 'Practice'), ('lab', 'Lab'), ('other', 'Other')], max_length=10)),
+                ('location', models.CharField(blank=True, max_length=200)),
+                ('notes', models.TextField(blank=True, max_length=300)),
+                ('google_event_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('google_calendar_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('last_update', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_events', to='planner.group')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_events', to='planner.subject')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['start', 'end'],
+                'indexes': [models.Index(fields=['user', 'start'], name='archived_event_user_start_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0006_archived_event'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedevent',
+            index=models.Index(fields=['start'], name='archived_event_start_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Event.is_syncing was replaced by expiring sync leases (googlecalendar.leases).
+
+    The NOT NULL column has no DB default, left in place it fails every Event insert.
+    """
+
+    dependencies = [
+        ('planner', '0007_archived_event_start_index'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='event',
+            name='is_syncing',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0008_remove_event_is_syncing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='changed_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import connection, models
 from django.conf import settings
 from django.core.exceptions import ValidationError
 
@@ -74,13 +74,31 @@ class Event(models.Model):
     google_event_id = models.CharField(max_length=255, blank=True, null=True)
     google_calendar_id = models.CharField(max_length=255, blank=True, null=True)
 
-    is_syncing = models.BooleanField(default=False)
-
     created_at = models.DateTimeField(auto_now_add=True)
     last_update = models.DateTimeField(auto_now=True)
+    # Время записи строки здесь, в отличие от last_update (туда синхронизация кладет updated из Google).
+    # QuerySet.update(), меняющий поля события, проставляет его явно (planner.analytics.data_version)
+    changed_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['start', 'end']
+        indexes = [
+            # Пересечения с другими событиями пользователя (EventSerializer.validate, sync)
+            models.Index(fields=['user', 'start', 'end'], name='event_user_start_end_idx'),
+            # Израсходованные часы плана по типу занятий
+            models.Index(fields=['user', 'group', 'subject', 'type'], name='event_user_plan_type_idx'),
+            # Отмененные в Google события ищутся по одному google_event_id
+            models.Index(fields=['google_event_id'], name='event_google_event_id_idx'),
+            # Проверка устаревших событий календаря (_stale_local_events)
+            models.Index(fields=['user', 'google_calendar_id'], name='event_user_gcal_idx'),
+            # Changelist админки: сортировка и date_hierarchy по всем пользователям
+            models.Index(fields=['start', 'end'], name='event_start_end_idx'),
+            # Поиск в админке по началу названия (LIKE 'x%'), opclass применяется только на PostgreSQL
+            models.Index(fields=['title'], name='event_title_like_idx', opclasses=['varchar_pattern_ops']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'google_event_id'], name='event_unique_google_event_per_user'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.group.name} - {self.subject.name}"
@@ -90,3 +108,62 @@ class Event(models.Model):
             raise ValidationError('End time must be after start time')
         
     
+
+
+class ArchivedEvent(models.Model):
+    """Event moved out of the live table by planner.archive, same fields and id.
+
+    Only stats read it: the event API, EventSerializer.validate and
+    GoogleCalendarSync work with Event alone.
+    """
+    # id живого события: при восстановлении оно возвращается под тем же id
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_events')
+
+    title = models.CharField(max_length=200)
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='archived_events')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='archived_events')
+
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    type = models.CharField(max_length=10, choices=Event.EVENT_TYPES)
+
+    location = models.CharField(max_length=200, blank=True)
+    notes = models.TextField(max_length=300, blank=True)
+
+    google_event_id = models.CharField(max_length=255, blank=True, null=True)
+    google_calendar_id = models.CharField(max_length=255, blank=True, null=True)
+
+    created_at = models.DateTimeField()
+    last_update = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['start', 'end']
+        indexes = [
+            # Статистика за месяц и восстановление по пользователю
+            models.Index(fields=['user', 'start'], name='archived_event_user_start_idx'),
+            # Нагрузка кафедры за учебный год (planner/analytics.py)
+            models.Index(fields=['start'], name='archived_event_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.start:%Y-%m-%d}, archived)"
+
+
+# Exclusion constraint на пересечения событий пользователя, только в PostgreSQL
+# (planner/migrations/0004_event_no_overlap.py)
+EVENT_OVERLAP_CONSTRAINT = 'event_no_overlap'
+
+
+def overlap_enforced_by_db():
+    """Overlaps are rejected by the DB itself, the pre-check query can be skipped."""
+    return connection.vendor == 'postgresql'
+
+
+def is_overlap_violation(error):
+    """The IntegrityError came from EVENT_OVERLAP_CONSTRAINT."""
+    diag = getattr(error.__cause__, 'diag', None)
+    if diag is not None:
+        return getattr(diag, 'constraint_name', None) == EVENT_OVERLAP_CONSTRAINT
+    return EVENT_OVERLAP_CONSTRAINT in str(error)
@@ -0,0 +1,151 @@
+"""Timetable generator: places the sessions left in the user's plans into free slots.
+
+Each plan's lecture, practice and lab hours that aren't scheduled yet become
+fixed 1.5 h sessions (the quota in EventSerializer.validate counts real
+hours, so a plan with 36 lecture hours gets 24 lectures). The candidate
+slots are every allowed weekday and slot time in the date range that is in
+the future and doesn't overlap an existing event or a blocked period.
+Existing events and blocked periods are sorted intervals, each slot is
+checked with a binary search.
+
+Sessions are spread over the range: the i-th of a plan's k sessions of a
+type aims at position (i + 0.5) / k of the free slot list, and sessions
+take the first free slot at or after their aim (a "next free slot"
+union-find, near-linear), wrapping to the earliest free slot when nothing
+is left after it. Slots don't overlap, so the placement is conflict-free.
+Sessions that don't fit are reported, not placed.
+"""
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import datetime, timedelta
+from django.db.models import DurationField, ExpressionWrapper, F, Sum
+from django.utils import timezone
+from .models import Event, Plan
+
+SESSION_DURATION = timedelta(hours=1, minutes=30)
+SESSION_TYPES = ['lecture', 'practice', 'lab']
+
+Session = namedtuple('Session', 'plan type start end')
+
+
+def remaining_sessions(user, plans):
+    """{(plan id, type): sessions} still fitting into each plan, one aggregate query."""
+    duration = ExpressionWrapper(F('end') - F('start'), output_field=DurationField())
+    used = {
+        (row['group'], row['subject'], row['type']): row['total']
+        for row in Event.objects.filter(user=user, type__in=SESSION_TYPES).values(
+            'group', 'subject', 'type'
+        ).annotate(total=Sum(duration)).order_by()
+    }
+    remaining = {}
+    for plan in plans:
+        for event_type in SESSION_TYPES:
+            spent = used.get((plan.group_id, plan.subject_id, event_type)) or timedelta()
+            left = timedelta(hours=getattr(plan, f'{event_type}_hours')) - spent
+            sessions = int(left / SESSION_DURATION) if left > timedelta() else 0
+            if sessions:
+                remaining[(plan.id, event_type)] = sessions
+    return remaining
+
+
+def merge_intervals(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _overlaps(intervals, ends, start, end):
+    # Интервалы не пересекаются и отсортированы: первый, который заканчивается позже start
+    i = bisect_right(ends, start)
+    return i < len(intervals) and intervals[i][0] < end
+
+
+def free_slots(user, start_date, end_date, weekdays, slot_times, blocked=()):
+    """Slot start times in [start_date, end_date] that are free, in time order."""
+    now = timezone.now()
+    range_start = timezone.make_aware(datetime.combine(start_date, datetime.min.time()))
+    range_end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+    busy = merge_intervals(
+        list(Event.objects.filter(user=user, start__lt=range_end, end__gt=range_start).values_list('start', 'end'))
+        + [(start, end) for start, end in blocked]
+    )
+    ends = [end for _, end in busy]
+
+    slots = []
+    weekdays = set(weekdays)
+    day = start_date
+    while day <= end_date:
+        if day.weekday() in weekdays:
+            for slot_time in slot_times:
+                start = timezone.make_aware(datetime.combine(day, slot_time))
+                end = start + SESSION_DURATION
+                if start > now and not _overlaps(busy, ends, start, end):
+                    slots.append(start)
+        day += timedelta(days=1)
+    return slots
+
+
+def assign(slots, remaining):
+    """Places sessions into slots. Returns ([(plan id, type, start)], {(plan id, type): not placed})."""
+    count = len(slots)
+    wanted = []
+    for order, ((plan_id, event_type), sessions) in enumerate(remaining.items()):
+        for i in range(sessions):
+            wanted.append(((i + 0.5) * count / sessions, order, plan_id, event_type))
+    wanted.sort()
+
+    # next_free[i] ведет к первому свободному слоту >= i, count - свободных нет
+    next_free = list(range(count + 1))
+
+    def find(i):
+        root = i
+        while next_free[root] != root:
+            root = next_free[root]
+        while next_free[i] != root:
+            next_free[i], i = root, next_free[i]
+        return root
+
+    placed = []
+    unplaced = {}
+    for aim, _, plan_id, event_type in wanted:
+        slot = find(min(int(aim), count))
+        if slot == count:
+            slot = find(0)
+        if slot == count:
+            unplaced[(plan_id, event_type)] = unplaced.get((plan_id, event_type), 0) + 1
+            continue
+        next_free[slot] = slot + 1
+        placed.append((plan_id, event_type, slots[slot]))
+    placed.sort(key=lambda session: session[2])
+    return placed, unplaced
+
+
+def generate_schedule(user, start_date, end_date, weekdays, slot_times, blocked=(), plans=None):
+    """Conflict-free sessions for the user's plans (all of them by default).
+
+    Returns (sessions, unplaced): Session tuples in time order and
+    {(plan, type): count} of sessions that didn't fit.
+    """
+    if plans is None:
+        plans = Plan.objects.filter(user=user).select_related('group', 'subject').order_by('id')
+    plans = {plan.id: plan for plan in plans}
+    slots = free_slots(user, start_date, end_date, weekdays, slot_times, blocked)
+    placed, unplaced = assign(slots, remaining_sessions(user, plans.values()))
+    sessions = [
+        Session(plans[plan_id], event_type, start, start + SESSION_DURATION) for plan_id, event_type, start in placed
+    ]
+    return sessions, {(plans[plan_id], event_type): count for (plan_id, event_type), count in unplaced.items()}
+
+
+def session_events(user, sessions):
+    return [
+        Event(
+            user=user, title=session.plan.subject.name, group=session.plan.group, subject=session.plan.subject,
+            type=session.type, start=session.start, end=session.end,
+        )
+        for session in sessions
+    ]
@@ -1,8 +1,10 @@
-from datetime import timedelta
+from datetime import date, datetime, timedelta
 from rest_framework import serializers
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
+from django.db.models import DurationField, ExpressionWrapper, F, Sum
 from rest_framework.exceptions import ValidationError
-from .models import Subject, Group, Event, Plan
+from .models import Subject, Group, Event, Plan, overlap_enforced_by_db, is_overlap_violation
+from .scheduling import SESSION_DURATION
 from datetime import timezone as timedata
 from django.utils import timezone
 
@@ -62,6 +64,7 @@ class PlanSerializer(serializers.ModelSerializer):
 
 class EventSerializer(serializers.ModelSerializer):
     FIXED_DURATION = timedelta(hours=1, minutes=30)
+    OVERLAP_ERROR = "This event overlaps with another event in the user's schedule."
 
     # start = serializers.DateTimeField(format='%Y-%m-%dT%H:%M:%S%z', input_formats=['%Y-%m-%dT%H:%M:%S%z', 'iso-8601'])
     # end = serializers.DateTimeField(format='%Y-%m-%dT%H:%M:%S%z', input_formats=['%Y-%m-%dT%H:%M:%S%z', 'iso-8601'])
@@ -91,7 +94,20 @@ class EventSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
+        return self._save_checked(super().create, validated_data)
+
+    def update(self, instance, validated_data):
+        return self._save_checked(super().update, instance, validated_data)
+
+    def _save_checked(self, save, *args):
+        # В PostgreSQL пересечения ловит exclusion constraint: ошибка БД - та же ошибка валидации
+        try:
+            with transaction.atomic():
+                return save(*args)
+        except IntegrityError as e:
+            if is_overlap_violation(e):
+                raise ValidationError({'non_field_errors': [self.OVERLAP_ERROR]})
+            raise
 
     def validate(self, data):
         user = self.context['request'].user
@@ -127,17 +143,18 @@ class EventSerializer(serializers.ModelSerializer):
         if end <= start:
             raise serializers.ValidationError("End time must be after start time.")
 
-        # Проверка пересечения со всеми событиями пользователя
-        overlapping = Event.objects.filter(
-            user=user,
-            start__lt=end,
-            end__gt=start,
-        )
-        if self.instance:
-            overlapping = overlapping.exclude(pk=self.instance.pk)
+        # Проверка пересечения со всеми событиями пользователя (в PostgreSQL - constraint при сохранении)
+        if not overlap_enforced_by_db():
+            overlapping = Event.objects.filter(
+                user=user,
+                start__lt=end,
+                end__gt=start,
+            )
+            if self.instance:
+                overlapping = overlapping.exclude(pk=self.instance.pk)
 
-        if overlapping.exists():
-            raise serializers.ValidationError("This event overlaps with another event in the user's schedule.")
+            if overlapping.exists():
+                raise serializers.ValidationError(self.OVERLAP_ERROR)
 
         # Проверка лимитов по плану
         try:
@@ -154,10 +171,11 @@ class EventSerializer(serializers.ModelSerializer):
         if self.instance:
             events_qs = events_qs.exclude(pk=self.instance.pk)
 
-        used_hours = sum(
-            (event.end - event.start).total_seconds() / 3600
-            for event in events_qs
-        )
+        # Сумма в БД: раньше в память грузились все события группы по предмету
+        used = events_qs.aggregate(
+            total=Sum(ExpressionWrapper(F('end') - F('start'), output_field=DurationField()))
+        )['total']
+        used_hours = used.total_seconds() / 3600 if used else 0
 
         total_hours = used_hours + duration_hours
 
@@ -188,3 +206,52 @@ class MonthlyStatsSerializer(serializers.Serializer):
     other_hours = serializers.IntegerField()
     month = serializers.IntegerField()
     year = serializers.IntegerField()
+
+
+class BlockedPeriodSerializer(serializers.Serializer):
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+
+    def validate(self, data):
+        if data['end'] <= data['start']:
+            raise serializers.ValidationError("End time must be after start time.")
+        return data
+
+
+class ScheduleRequestSerializer(serializers.Serializer):
+    """Parameters of planner.scheduling.generate_schedule."""
+    MAX_DAYS = 366
+
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    weekdays = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6), allow_empty=False, default=[0, 1, 2, 3, 4]
+    )  # 0 - понедельник
+    slots = serializers.ListField(child=serializers.TimeField(), allow_empty=False)
+    blocked = BlockedPeriodSerializer(many=True, required=False, default=list)
+    plans = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+
+    def validate_slots(self, slots):
+        slots = sorted(set(slots))
+        for previous, current in zip(slots, slots[1:]):
+            gap = datetime.combine(date.min, current) - datetime.combine(date.min, previous)
+            if gap < SESSION_DURATION:
+                raise serializers.ValidationError(f"Slots {previous:%H:%M} and {current:%H:%M} overlap.")
+        return slots
+
+    def validate(self, data):
+        if data['end_date'] < data['start_date']:
+            raise serializers.ValidationError("End date must not be before start date.")
+        if (data['end_date'] - data['start_date']).days >= self.MAX_DAYS:
+            raise serializers.ValidationError(f"The range can't be longer than {self.MAX_DAYS} days.")
+
+        user = self.context['request'].user
+        plans = Plan.objects.filter(user=user).select_related('group', 'subject').order_by('id')
+        if 'plans' in data:
+            plans = list(plans.filter(id__in=data['plans']))
+            missing = set(data['plans']) - {plan.id for plan in plans}
+            if missing:
+                raise serializers.ValidationError({'plans': f"Plans not found: {sorted(missing)}"})
+        data['plans'] = list(plans)
+        data['blocked'] = [(period['start'], period['end']) for period in data['blocked']]
+        return data
@@ -0,0 +1,16 @@
+'use strict';
+{
+    const $ = django.jQuery;
+
+    // Выбор в фильтре (или очистка) перезагружает changelist с новым параметром
+    $(function() {
+        $('.autocomplete-filter select').on('change', function() {
+            const filter = this.closest('.autocomplete-filter');
+            const params = new URLSearchParams(filter.dataset.queryString);
+            if (this.value) {
+                params.set(filter.dataset.parameter, this.value);
+            }
+            window.location.search = params.toString();
+        });
+    });
+}
@@ -0,0 +1,66 @@
+"""Realistic planner data for the API performance tests and benchmarks.
+
+    teachers = seed_teachers(20, events=2000)
+    start = free_slot(0)  # future slot no seeded event overlaps
+
+Events go in with bulk_create, so the post_save sync signals don't fire.
+"""
+from datetime import datetime, timedelta
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from .models import Event, Group, Plan, Subject
+
+EVENT_TYPES = ['lecture', 'practice', 'lab']
+SLOT_HOURS = [8, 10, 12, 14, 16]  # пары, 5 в день
+EVENT_DURATION = timedelta(minutes=90)
+
+
+def first_seed_day():
+    """Seeded schedules start two months before the current one, stats and ranges see full months."""
+    now = datetime.now()
+    month_start = timezone.make_aware(datetime(now.year, now.month, 1))
+    return month_start - timedelta(days=61)
+
+
+def free_slot(index):
+    """Evening slots from tomorrow on, never taken by seeded events."""
+    day = timezone.localtime().replace(hour=19, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    return day + timedelta(days=index)
+
+
+def seed_teacher(user, groups=4, events=200, first_day=None):
+    """Groups with one subject and plan each, and `events` events spread over the slots from first_day."""
+    first_day = first_day or first_seed_day()
+    pairs = []
+    for i in range(groups):
+        group = Group.objects.create(user=user, name=f'IT-{i}', color='#336699')
+        subject = Subject.objects.create(user=user, name=f'Subject {i}')
+        # Запас часов под все засеянные события и созданные в тестах
+        hours = events * 2 + 100
+        Plan.objects.create(
+            user=user, name=f'Plan {i}', group=group, subject=subject,
+            lecture_hours=hours, practice_hours=hours, lab_hours=hours, other_hours=hours,
+        )
+        pairs.append((group, subject))
+
+    batch = []
+    for i in range(events):
+        day, slot = divmod(i, len(SLOT_HOURS))
+        start = first_day + timedelta(days=day, hours=SLOT_HOURS[slot])
+        group, subject = pairs[i % groups]
+        batch.append(Event(
+            user=user, title=f'Event {i}', group=group, subject=subject, type=EVENT_TYPES[i % len(EVENT_TYPES)],
+            start=start, end=start + EVENT_DURATION,
+        ))
+    Event.objects.bulk_create(batch, batch_size=1000)
+    return pairs
+
+
+def seed_teachers(count, groups=4, events=200):
+    User = get_user_model()
+    teachers = []
+    for i in range(count):
+        user = User.objects.create(username=f'teacher{i}@example.com', email=f'teacher{i}@example.com')
+        seed_teacher(user, groups=groups, events=events)
+        teachers.append(user)
+    return teachers
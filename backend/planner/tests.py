@@ -1,3 +1,557 @@
-from django.test import TestCase
+import json
+from datetime import datetime, timedelta
+from unittest import mock, skipUnless
+from asgiref.sync import sync_to_async
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncRequestFactory, Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from googlecalendar.models import GoogleCalendar
+from . import async_views
+from .admin_tools import CappedCountPaginator
+from .analytics import department_load
+from .archive import archive_events, restore_events
+from .scheduling import assign, remaining_sessions
+from .models import ArchivedEvent, Event, Group, Plan, Subject
+from .serializers import MonthlyStatsSerializer
+from .views import monthly_stats
+from .testing import EVENT_DURATION
+from .testing import seed_teacher, seed_teachers
 
-# Create your tests here.
+User = get_user_model()
+
+
+class DashboardTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(
+            username='teacher@example.com', email='teacher@example.com', name='Anna Teacher',
+            picture='https://example.com/anna.png',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        now = datetime.now()
+        self.month_start = timezone.make_aware(datetime(now.year, now.month, 1))
+
+    def seed(self, groups, offset=0):
+        for i in range(offset, offset + groups):
+            group = Group.objects.create(user=self.user, name=f'IT-{i}', color='#336699')
+            subject = Subject.objects.create(user=self.user, name=f'Math {i}')
+            Plan.objects.create(user=self.user, name=f'Plan {i}', group=group, subject=subject, lecture_hours=10)
+            start = self.month_start + timedelta(days=i, hours=8)
+            Event.objects.create(
+                user=self.user, title=f'Lecture {i}', group=group, subject=subject,
+                start=start, end=start + timedelta(minutes=90), type='lecture',
+            )
+        # Событие прошлого месяца в bootstrap не попадает
+        Event.objects.create(
+            user=self.user, title='Old', group=group, subject=subject,
+            start=self.month_start - timedelta(days=3), end=self.month_start - timedelta(days=3) + timedelta(minutes=90),
+            type='lecture',
+        )
+
+
+class BootstrapTests(DashboardTestCase):
+    def test_bootstrap_returns_dashboard_data(self):
+        self.seed(2)
+        response = self.client.get('/api/bootstrap/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['user']['name'], 'Anna Teacher')
+        self.assertEqual(data['user']['picture'], 'https://example.com/anna.png')
+        self.assertEqual(len(data['subjects']), 2)
+        self.assertEqual(len(data['groups']), 2)
+        self.assertEqual(len(data['plans']), 2)
+        self.assertEqual(len(data['events']), 2)
+        self.assertEqual(data['events'][0]['group_name'], 'IT-0')
+        self.assertEqual({row['lecture_hours'] for row in data['stats']}, {2})
+        self.assertEqual(data['period']['month'], self.month_start.month)
+
+    def test_bootstrap_query_count_does_not_grow(self):
+        self.seed(1)
+        with self.assertNumQueries(5):
+            self.client.get('/api/bootstrap/')
+        self.seed(5, offset=1)
+        with self.assertNumQueries(5):
+            self.client.get('/api/bootstrap/')
+
+
+class AsyncReadViewTests(DashboardTestCase):
+    """The async views answer exactly like the DRF ones."""
+
+    def setUp(self):
+        super().setUp()
+        self.seed(3)
+        self.factory = AsyncRequestFactory()
+
+    async def call(self, view, path, token=True, **params):
+        request = self.factory.get(path, params)
+        if token:
+            request.COOKIES['access_token'] = str(AccessToken.for_user(self.user))
+        return await view(request)
+
+    async def assertSameAsSync(self, view, path, **params):
+        response = await self.call(view, path, **params)
+        self.assertEqual(response.status_code, 200)
+        expected = await self.client_get(path, params)
+        self.assertEqual(json.loads(response.content), expected)
+
+    async def client_get(self, path, params):
+        response = await sync_to_async(self.client.get)(path, params)
+        return response.json()
+
+    async def test_bootstrap(self):
+        await self.assertSameAsSync(async_views.bootstrap, '/api/bootstrap/')
+
+    async def test_events_by_date_range(self):
+        start = (self.month_start + timedelta(days=1)).isoformat()
+        end = (self.month_start + timedelta(days=2, hours=9)).isoformat()
+        await self.assertSameAsSync(async_views.events_by_date_range, '/api/events/by-date-range/', start=start, end=end)
+        response = await self.call(async_views.events_by_date_range, '/api/events/by-date-range/', start=start, end=end)
+        self.assertEqual([e['title'] for e in json.loads(response.content)['data']], ['Lecture 1', 'Lecture 2'])
+
+    async def test_stats_by_month(self):
+        month, year = self.month_start.month, self.month_start.year
+        await self.assertSameAsSync(async_views.stats_by_month, '/api/stats/by_month/', month=month, year=year)
+
+    async def test_invalid_params(self):
+        response = await self.call(async_views.events_by_date_range, '/api/events/by-date-range/', start='soon')
+        self.assertEqual(response.status_code, 400)
+        response = await self.call(async_views.stats_by_month, '/api/stats/by_month/', month='May')
+        self.assertEqual(response.status_code, 400)
+
+    async def test_requires_authentication(self):
+        response = await self.call(async_views.bootstrap, '/api/bootstrap/', token=False)
+        self.assertEqual(response.status_code, 401)
+
+
+class BaselineUpgradeTests(TransactionTestCase):
+    """A database created from the baseline models, with its 0001/0002_initial recorded, upgrades with migrate."""
+    BASELINE = [('users', '0001_initial'), ('planner', '0002_initial'), ('googlecalendar', '0002_initial')]
+
+    def columns(self, table):
+        with connection.cursor() as cursor:
+            return {column.name for column in connection.introspection.get_table_description(cursor, table)}
+
+    def test_upgrade_from_baseline_schema(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.BASELINE)
+        tables = connection.introspection.table_names()
+        self.assertNotIn('googlecalendar_syncrun', tables)
+        self.assertNotIn('name', self.columns('users_user'))
+        self.assertNotIn('sync_failures', self.columns('googlecalendar_googlecalendar'))
+        self.assertIn('is_syncing', self.columns('planner_event'))
+
+        baseline = executor.loader.project_state(self.BASELINE + [('socialaccount', '0006_alter_socialaccount_extra_data')]).apps
+        user = baseline.get_model('users', 'User').objects.create(username='old@example.com', email='old@example.com')
+        baseline.get_model('socialaccount', 'SocialAccount').objects.create(
+            user_id=user.pk, provider='google', uid='1', extra_data={'name': 'Old Teacher'},
+        )
+
+        call_command('migrate', fake_initial=True, verbosity=0)
+
+        self.assertEqual(User.objects.get(pk=user.pk).name, 'Old Teacher')
+        self.assertNotIn('is_syncing', self.columns('planner_event'))
+        self.assertTrue({'sync_failures', 'circuit_open_until', 'last_failure_reason', 'last_error'} <= self.columns(
+            'googlecalendar_googlecalendar'
+        ))
+        self.assertTrue({'googlecalendar_syncrun', 'googlecalendar_calendarbackfill'} <= set(connection.introspection.table_names()))
+        seed_teacher(User.objects.get(pk=user.pk), groups=1, events=1)
+        self.assertEqual(Event.objects.filter(user_id=user.pk).count(), 1)
+
+
+class HotQueryIndexTests(TestCase):
+    """The queries run on every event save and sync must be served by an index."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='teacher@example.com', email='teacher@example.com')
+        self.group = Group.objects.create(user=self.user, name='IT-21', color='#336699')
+        self.subject = Subject.objects.create(user=self.user, name='Math')
+        self.start = timezone.now()
+        self.end = self.start + timedelta(minutes=90)
+        if connection.vendor == 'postgresql':
+            # На маленькой таблице Postgres и так выберет seq scan
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, *index_names):
+        # Без ORDER BY (Meta.ordering): иначе SQLite без статистики выбирает индекс под сортировку
+        plan = queryset.order_by().explain()
+        self.assertTrue(any(name in plan for name in index_names), plan)
+        self.assertNotRegex(plan, r'SCAN (TABLE )?planner_event\b(?! USING)', plan)
+
+    def test_overlap_check(self):
+        self.assertUsesIndex(
+            Event.objects.filter(user=self.user, start__lt=self.end, end__gt=self.start), 'event_user_start_end_idx'
+        )
+
+    def test_plan_quota(self):
+        self.assertUsesIndex(
+            Event.objects.filter(user=self.user, group=self.group, subject=self.subject, type='lecture'),
+            'event_user_plan_type_idx',
+        )
+
+    def test_google_event_lookup(self):
+        self.assertUsesIndex(Event.objects.filter(google_event_id='abc'), 'event_google_event_id_idx')
+
+    def test_user_google_event_lookup(self):
+        self.assertUsesIndex(
+            Event.objects.filter(user=self.user, google_event_id='abc'),
+            'event_unique_google_event_per_user',
+            'sqlite_autoindex_planner_event',  # SQLite делает уникальное ограничение частью таблицы
+        )
+
+    def test_stale_event_check(self):
+        self.assertUsesIndex(
+            Event.objects.filter(user=self.user, google_calendar_id='calendar', google_event_id__isnull=False),
+            'event_user_gcal_idx',
+        )
+
+    def test_admin_date_hierarchy(self):
+        self.assertUsesIndex(
+            Event.objects.filter(start__gte=self.start, start__lt=self.end), 'event_start_end_idx'
+        )
+
+
+class OverlapConstraintTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='teacher@example.com', email='teacher@example.com')
+        self.group = Group.objects.create(user=self.user, name='IT-21', color='#336699')
+        self.subject = Subject.objects.create(user=self.user, name='Math')
+        Plan.objects.create(user=self.user, name='Plan', group=self.group, subject=self.subject, lecture_hours=10)
+        self.start = timezone.now() + timedelta(days=1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_event(self, start):
+        return Event.objects.create(
+            user=self.user, title='Lecture', group=self.group, subject=self.subject,
+            start=start, end=start + timedelta(minutes=90), type='lecture',
+        )
+
+    def post_event(self, start):
+        return self.client.post('/api/events/', {
+            'title': 'Lecture', 'group': self.group.id, 'subject': self.subject.id, 'type': 'lecture',
+            'start': start.isoformat(), 'end': (start + timedelta(minutes=90)).isoformat(),
+        }, format='json')
+
+    def test_precheck_rejects_overlap_without_constraint(self):
+        self.create_event(self.start)
+        response = self.post_event(self.start + timedelta(minutes=30))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('overlaps', str(response.json()))
+
+    def test_constraint_violation_is_an_overlap_error(self):
+        violation = IntegrityError('conflicting key value violates exclusion constraint "event_no_overlap"')
+        with mock.patch('planner.serializers.overlap_enforced_by_db', return_value=True), \
+                mock.patch('rest_framework.serializers.ModelSerializer.create', side_effect=violation):
+            response = self.post_event(self.start)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('overlaps', str(response.json()))
+
+    @skipUnless(connection.vendor == 'postgresql', 'exclusion constraint exists only in PostgreSQL')
+    def test_database_rejects_overlap(self):
+        self.create_event(self.start)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.create_event(self.start + timedelta(minutes=30))
+        # Смежные события не пересекаются: диапазон [start, end)
+        self.create_event(self.start + timedelta(minutes=90))
+
+
+class EventAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teachers = seed_teachers(2, groups=2, events=50)
+        cls.admin = User.objects.create_superuser(username='admin@example.com', email='admin@example.com')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def changelist(self, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/planner/event/', params)
+        self.assertEqual(response.status_code, 200)
+        return response, queries
+
+    def test_changelist_queries_dont_grow_with_related_rows(self):
+        _, before = self.changelist()
+        extra = User.objects.create(username='late@example.com', email='late@example.com')
+        seed_teacher(extra, groups=10, events=50)
+        _, after = self.changelist()
+        self.assertEqual(len(after), len(before))
+        sql = '\n'.join(query['sql'] for query in after.captured_queries)
+        self.assertIn('INNER JOIN "planner_group"', sql)
+        # Полный COUNT(*) по таблице не выполняется, только ограниченный
+        self.assertNotRegex(sql, r'SELECT COUNT\(\*\) AS "__count" FROM "planner_event"\s*$')
+
+    def test_autocomplete_filter(self):
+        teacher = self.teachers[1]
+        response, _ = self.changelist({'user__id__exact': teacher.id})
+        events = response.context['cl'].result_list
+        self.assertEqual({event.user_id for event in events}, {teacher.id})
+        self.assertContains(response, 'data-parameter="user__id__exact"')
+        self.assertContains(response, f'<option value="{teacher.id}" selected>{teacher}</option>', html=True)
+        # Пользователи не перечисляются в фильтре, их подгружает select2
+        self.assertNotContains(response, f'<option value="{self.teachers[0].id}"')
+
+    def test_invalid_filter_value(self):
+        response = self.client.get('/admin/planner/event/', {'user__id__exact': 'abc'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_indexed_search(self):
+        response, _ = self.changelist({'q': '"Event 1"'})
+        titles = {event.title for event in response.context['cl'].result_list}
+        self.assertTrue(titles and all(title.startswith('Event 1') for title in titles))
+        response, _ = self.changelist({'q': self.teachers[0].email})
+        self.assertEqual({event.user_id for event in response.context['cl'].result_list}, {self.teachers[0].id})
+
+    def test_resync_action(self):
+        events = Event.objects.filter(user__in=self.teachers).values_list('pk', flat=True)
+        with mock.patch('planner.admin.resync_users', return_value=(2, 0)) as resync:
+            response = self.client.post('/admin/planner/event/', {
+                'action': 'resync_calendars', '_selected_action': list(events[:3]) + list(events.reverse()[:3]),
+            }, follow=True)
+        self.assertEqual(sorted(resync.call_args.args[0]), sorted(teacher.id for teacher in self.teachers))
+        self.assertContains(response, 'Re-sync queued for 2 users, 0 already running')
+
+    def test_capped_paginator(self):
+        paginator = CappedCountPaginator(Event.objects.all(), 20)
+        paginator.max_count = 30
+        self.assertEqual(paginator.count, 30)
+        self.assertEqual(paginator.num_pages, 2)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='teacher@example.com', email='teacher@example.com')
+        GoogleCalendar.objects.create(user=self.user, calendar_id='calendar')
+        # Два дня по 5 пар: 2 и 3 марта 2020
+        seed_teacher(self.user, groups=1, events=10, first_day=timezone.make_aware(datetime(2020, 3, 2)))
+        Event.objects.filter(user=self.user).update(google_event_id=F('title'), google_calendar_id='calendar')
+        self.cutoff = timezone.make_aware(datetime(2020, 3, 3))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_archive_moves_old_events_without_touching_google(self):
+        old = Event.objects.get(user=self.user, title='Event 0')
+        with mock.patch('planner.signals.GoogleCalendarSync') as sync:
+            self.assertEqual(archive_events(self.cutoff, batch_size=2), 5)
+        sync.assert_not_called()
+        self.assertEqual(Event.objects.filter(user=self.user).count(), 5)
+        self.assertFalse(Event.objects.filter(end__lte=self.cutoff).exists())
+        archived = ArchivedEvent.objects.get(pk=old.pk)
+        self.assertEqual((archived.title, archived.start, archived.google_event_id), (old.title, old.start, 'Event 0'))
+
+        self.assertEqual(self.client.get(f'/api/events/{old.pk}/').status_code, 404)
+
+    def test_cutoff_inside_sync_window_is_rejected(self):
+        with self.assertRaises(ValueError):
+            archive_events(timezone.now() - timedelta(days=1))
+        self.assertEqual(ArchivedEvent.objects.count(), 0)
+
+    def test_stats_include_archived_events(self):
+        before = monthly_stats(self.user, 3, 2020)
+        archive_events(self.cutoff)
+        self.assertEqual(monthly_stats(self.user, 3, 2020), before)
+        response = self.client.get('/api/stats/by_month/', {'month': 3, 'year': 2020})
+        self.assertEqual(response.json(), MonthlyStatsSerializer(before, many=True).data)
+
+    def test_restore_keeps_ids_and_timestamps(self):
+        old = Event.objects.get(user=self.user, title='Event 0')
+        archive_events(self.cutoff)
+        with mock.patch('planner.signals.sync_single_event') as sync:
+            self.assertEqual(restore_events(), 5)
+        sync.delay.assert_not_called()
+        restored = Event.objects.get(pk=old.pk)
+        self.assertEqual((restored.created_at, restored.last_update), (old.created_at, old.last_update))
+        self.assertEqual(ArchivedEvent.objects.count(), 0)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('archive_events', before='2020-03-03', user=self.user.email, stdout=out)
+        self.assertIn('Archived 5 events', out.getvalue())
+        call_command('archive_events', restore=True, after='2020-03-02', stdout=out)
+        self.assertIn('Restored 5 events', out.getvalue())
+        self.assertEqual(Event.objects.filter(user=self.user).count(), 10)
+
+
+class DepartmentLoadTests(TestCase):
+    def setUp(self):
+        # Учебный год 2023/24: с сентября по декабрь 2023
+        self.teachers = seed_teachers(2, groups=0, events=0)
+        for i, teacher in enumerate(self.teachers):
+            seed_teacher(teacher, groups=3, events=200 + i * 37, first_day=timezone.make_aware(datetime(2023, 9, 1)))
+        other = Event.objects.filter(user=self.teachers[0]).first()
+        Event.objects.filter(pk=other.pk).update(type='other', end=other.start + timedelta(minutes=45))
+        # Вне учебного года
+        early = Event.objects.filter(user=self.teachers[1]).order_by('start').values_list('pk', flat=True)[:5]
+        Event.objects.filter(pk__in=list(early)).update(start=F('start') - timedelta(days=40), end=F('end') - timedelta(days=40))
+        self.staff = User.objects.create(username='head@example.com', email='head@example.com', is_staff=True)
+
+    def monthly_totals(self, user):
+        totals = {'lecture': 0, 'practice': 0, 'lab': 0, 'other': 0}
+        for year, month in [(2023, m) for m in range(9, 13)] + [(2024, m) for m in range(1, 9)]:
+            for row in monthly_stats(user, month, year):
+                for event_type in totals:
+                    totals[event_type] += row[f'{event_type}_hours']
+        return totals
+
+    def test_matches_monthly_stats(self):
+        archive_events(timezone.make_aware(datetime(2023, 10, 1)))
+        load = department_load(2023)
+        teachers = {row['user_id']: row for row in load['teachers']}
+        for teacher in self.teachers:
+            expected = self.monthly_totals(teacher)
+            for event_type, hours in expected.items():
+                self.assertAlmostEqual(teachers[teacher.id][f'{event_type}_hours'], hours)
+        self.assertEqual(teachers[self.teachers[0].id]['other_hours'], 1)
+        self.assertAlmostEqual(load['total_hours'], sum(row['total_hours'] for row in load['teachers']))
+        self.assertAlmostEqual(load['total_hours'], sum(row['total_hours'] for row in load['groups']))
+        self.assertAlmostEqual(load['total_hours'], sum(row['total_hours'] for row in load['subjects']))
+        self.assertEqual(len(load['groups']), 6)
+        self.assertEqual({row['group_name'] for row in load['groups']}, {'IT-0', 'IT-1', 'IT-2'})
+
+    def test_cached_per_data_version(self):
+        first = department_load(2023)
+        with self.assertNumQueries(5):  # версия данных и имена, без выборки событий
+            self.assertEqual(department_load(2023), first)
+        event = Event.objects.filter(user=self.teachers[1], type='lecture').last()
+        Event.objects.filter(pk=event.pk).update(end=event.start + EVENT_DURATION * 2, changed_at=timezone.now())
+        changed = department_load(2023)
+        self.assertAlmostEqual(changed['total_hours'] - first['total_hours'], 1.5)
+
+    def test_empty_year(self):
+        load = department_load(2010)
+        self.assertEqual((load['teachers'], load['total_hours']), ([], 0))
+
+    def test_endpoint_is_staff_only(self):
+        client = APIClient()
+        client.force_authenticate(self.teachers[0])
+        self.assertEqual(client.get('/api/analytics/load/', {'year': 2023}).status_code, 403)
+        client.force_authenticate(self.staff)
+        response = client.get('/api/analytics/load/', {'year': 2023})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['teachers']), 2)
+        self.assertEqual(client.get('/api/analytics/load/', {'year': 'x'}).status_code, 400)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('teaching_load', year=2023, stdout=out)
+        self.assertIn('teacher0@example.com', out.getvalue())
+        self.assertIn('Academic year 2023-09-01 - 2024-09-01', out.getvalue())
+
+
+class ScheduleTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='teacher@example.com', email='teacher@example.com')
+        self.plans = []
+        for i in range(2):
+            group = Group.objects.create(user=self.user, name=f'IT-{i}', color='#336699')
+            subject = Subject.objects.create(user=self.user, name=f'Subject {i}')
+            self.plans.append(Plan.objects.create(
+                user=self.user, name=f'Plan {i}', group=group, subject=subject, lecture_hours=6, practice_hours=3,
+            ))
+        today = timezone.localdate()
+        self.monday = today + timedelta(days=7 - today.weekday())
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Занятый слот: вторник, 9:40
+        start = timezone.make_aware(datetime.combine(self.monday + timedelta(days=1), datetime.min.time())) \
+            + timedelta(hours=9, minutes=40)
+        self.existing = Event.objects.create(
+            user=self.user, title='Existing', group=self.plans[0].group, subject=self.plans[0].subject,
+            type='lecture', start=start, end=start + timedelta(minutes=90),
+        )
+
+    def params(self, **overrides):
+        params = {
+            'start_date': self.monday.isoformat(),
+            'end_date': (self.monday + timedelta(days=13)).isoformat(),
+            'weekdays': [0, 1, 2],
+            'slots': ['08:00', '09:40', '11:20'],
+        }
+        params.update(overrides)
+        return params
+
+    def assertConflictFree(self, events):
+        intervals = sorted([(event['start'], event['end']) for event in events])
+        for (_, previous_end), (start, _) in zip(intervals, intervals[1:]):
+            self.assertLessEqual(previous_end, start)
+
+    def test_preview_places_remaining_sessions(self):
+        response = self.client.post('/api/schedule/preview/', self.params(), format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        events = response.data['events']
+        # 6 часов лекций - 4 пары, у первого плана одна уже есть; 3 часа практики - 2 пары
+        self.assertEqual(len(events), 3 + 4 + 2 + 2)
+        self.assertEqual(response.data['unplaced'], [])
+        self.assertConflictFree(events + [{'start': self.existing.start.isoformat(), 'end': self.existing.end.isoformat()}])
+        for event in events:
+            start = datetime.fromisoformat(event['start'])
+            self.assertIn(start.weekday(), [0, 1, 2])
+            self.assertIn(start.strftime('%H:%M'), ['08:00', '09:40', '11:20'])
+        # Занятия плана распределяются по всему диапазону, а не подряд
+        lectures = sorted(event['start'] for event in events if event['plan'] == self.plans[1].id and event['type'] == 'lecture')
+        self.assertGreaterEqual(datetime.fromisoformat(lectures[-1]) - datetime.fromisoformat(lectures[0]), timedelta(days=7))
+        self.assertEqual(Event.objects.count(), 1)
+
+    def test_blocked_periods_and_unplaced(self):
+        blocked_start = timezone.make_aware(datetime.combine(self.monday, datetime.min.time()))
+        response = self.client.post('/api/schedule/preview/', self.params(
+            end_date=(self.monday + timedelta(days=2)).isoformat(),
+            blocked=[{'start': blocked_start.isoformat(), 'end': (blocked_start + timedelta(days=1)).isoformat()}],
+        ), format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        # Вторник без занятого слота и среда: 5 слотов на 11 пар
+        self.assertEqual(len(response.data['events']), 5)
+        self.assertEqual(sum(row['sessions'] for row in response.data['unplaced']), 6)
+        self.assertTrue(all(event['start'] >= (blocked_start + timedelta(days=1)).isoformat() for event in response.data['events']))
+
+    def test_commit_uses_up_plans(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/schedule/commit/', self.params(plans=[self.plans[1].id]), format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(response.data['events']), 6)
+        self.assertEqual(Event.objects.filter(group=self.plans[1].group).count(), 6)
+        self.assertEqual(remaining_sessions(self.user, [self.plans[1]]), {})
+        # Квота плана исчерпана: еще одна лекция не проходит валидацию
+        extra = self.client.post('/api/events/', {
+            'title': 'Lecture', 'group': self.plans[1].group.id, 'subject': self.plans[1].subject.id, 'type': 'lecture',
+            'start': (self.existing.start + timedelta(days=30)).isoformat(),
+            'end': (self.existing.end + timedelta(days=30)).isoformat(),
+        }, format='json')
+        self.assertEqual(extra.status_code, 400)
+        self.assertIn('Exceeded the hour limit', str(extra.data))
+
+    def test_commit_pushes_to_google(self):
+        GoogleCalendar.objects.create(user=self.user, calendar_id='calendar')
+        with mock.patch('planner.views.backfill_new_events') as backfill, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/schedule/commit/', self.params(), format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        backfill.assert_called_once_with(self.user)
+
+    def test_invalid_params(self):
+        for params in [
+            self.params(slots=['08:00', '09:00']),
+            self.params(end_date=(self.monday - timedelta(days=1)).isoformat()),
+            self.params(plans=[0]),
+            self.params(weekdays=[7]),
+        ]:
+            with self.subTest(params):
+                response = self.client.post('/api/schedule/preview/', params, format='json')
+                self.assertEqual(response.status_code, 400)
+
+    def test_assign_spreads_and_wraps(self):
+        placed, unplaced = assign(list(range(10)), {(1, 'lecture'): 2, (2, 'lab'): 9})
+        # Цели лекций - слоты 2.5 и 7.5, седьмой уже занят лабораторной
+        self.assertEqual([slot for plan, _, slot in placed if plan == 1], [2, 8])
+        self.assertEqual(len(placed), 10)
+        self.assertEqual(unplaced, {(2, 'lab'): 1})
@@ -1,6 +1,7 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register(r'subjects', views.SubjectViewSet, basename='subject')
@@ -9,6 +10,22 @@ router.register(r'events', views.EventViewSet, basename='event')
 router.register(r'plans', views.PlanViewSet, basename='plan')
 router.register(r'stats', views.StatsViewSet, basename='stat')
 
-urlpatterns = [
+if settings.ASYNC_READ_VIEWS:
+    # Раньше роутера: иначе 'by-date-range' попадет в events/<pk>/
+    urlpatterns = [
+        path('bootstrap/', async_views.bootstrap, name='bootstrap'),
+        path('events/by-date-range/', async_views.events_by_date_range, name='event-by-date-range'),
+        path('stats/', async_views.stats, name='stat-list'),
+        path('stats/by_month/', async_views.stats_by_month, name='stat-by-month'),
+    ]
+else:
+    urlpatterns = [
+        path('bootstrap/', views.BootstrapView.as_view(), name='bootstrap'),
+    ]
+
+urlpatterns += [
+    path('analytics/load/', views.DepartmentLoadView.as_view(), name='analytics-load'),
+    path('schedule/preview/', views.ScheduleView.as_view(), name='schedule-preview'),
+    path('schedule/commit/', views.ScheduleView.as_view(commit=True), name='schedule-commit'),
     path('', include(router.urls)),
 ]
@@ -5,11 +5,22 @@ from rest_framework.response import Response
 from django.db.models import Sum
 from django.db.models.functions import ExtractMonth, ExtractYear
 from datetime import datetime
-from .models import Subject, Group, Event, Plan
+from .models import Subject, Group, Event, Plan, ArchivedEvent
 from .serializers import (
-    SubjectSerializer, GroupSerializer, EventSerializer, PlanSerializer, MonthlyStatsSerializer
+    SubjectSerializer, GroupSerializer, EventSerializer, PlanSerializer, MonthlyStatsSerializer,
+    ScheduleRequestSerializer,
 )
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.views import APIView
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from users.serializers import UserSerializer
+from django.db import IntegrityError, transaction
+from googlecalendar.backfill import backfill_new_events
+from googlecalendar.circuit import is_tripped
+from .analytics import current_academic_year, department_load
+from .models import is_overlap_violation
+from .scheduling import generate_schedule, session_events
 
 class SubjectViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
@@ -30,18 +41,161 @@ class PlanViewSet(viewsets.ModelViewSet):
     serializer_class = PlanSerializer
 
     def get_queryset(self):
-        return Plan.objects.filter(user=self.request.user)
+        return Plan.objects.filter(user=self.request.user).select_related('group', 'subject')
 
 class EventViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = EventSerializer
 
     def get_queryset(self):
-        return Event.objects.filter(user=self.request.user)
+        return Event.objects.filter(user=self.request.user).select_related('group', 'subject')
+
+    @action(detail=False, methods=['get'], url_path='by-date-range')
+    def by_date_range(self, request):
+        try:
+            start, end = parse_range(request.query_params)
+        except ValueError as e:
+            return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(events_in_range(request.user, start, end), many=True)
+        return Response({'data': serializer.data})
 
 from django.db.models import F, ExpressionWrapper, DurationField, Sum
 from django.db.models.functions import ExtractMonth, ExtractYear
 
+def monthly_stats_query(user, month, year):
+    """Summed durations per group, subject and event type for the month, live and archived events.
+
+    One query (UNION ALL), a group, subject and type can have a row from each table.
+    """
+    duration = ExpressionWrapper(F('end') - F('start'), output_field=DurationField())
+
+    def summed(model):
+        events = model.objects.filter(
+            user=user,
+            start__month=month,
+            start__year=year
+        ).annotate(
+            duration=duration,
+            month=ExtractMonth('start'),
+            year=ExtractYear('start')
+        )
+
+        return events.values(
+            'group',
+            'group__name',
+            'subject',
+            'subject__name',
+            'type'
+        ).annotate(
+            total_duration=Sum('duration')
+        ).order_by()
+
+    return summed(Event).union(summed(ArchivedEvent), all=True)
+
+
+def round_duration(td):
+    """Hours for a month's total of one event type (planner.analytics.round_hours does the same on arrays)."""
+    if td is None:
+        return 0
+    minutes = td.total_seconds() / 60
+    if abs(minutes - 90) < 1:  # около 90 минут
+        return 2
+    elif abs(minutes - 45) < 1:  # около 45 минут
+        return 1
+    else:
+        return minutes / 60  # точное время в часах
+
+
+def collect_monthly_stats(stats, month, year):
+    """Rows of monthly_stats_query folded into one entry per group and subject."""
+    # Длительности из обеих таблиц складываются до округления
+    durations = {}
+    for entry in stats:
+        key = (entry['group'], entry['subject'], entry['type'])
+        if key in durations:
+            entry = {**entry, 'total_duration': durations[key]['total_duration'] + entry['total_duration']}
+        durations[key] = entry
+
+    stats_dict = {}
+    for entry in durations.values():
+        group_id = entry['group']
+        subject_id = entry['subject']
+        key = (group_id, subject_id)
+
+        if key not in stats_dict:
+            stats_dict[key] = {
+                'id': f"{group_id}_{subject_id}_{month}_{year}",
+                'group_id': group_id,
+                'group_name': entry['group__name'],
+                'subject_id': subject_id,
+                'subject_name': entry['subject__name'],
+                'lecture_hours': 0,
+                'practice_hours': 0,
+                'lab_hours': 0,
+                'other_hours': 0,
+                'month': month,
+                'year': year
+            }
+
+        type_field = f"{entry['type']}_hours"
+        stats_dict[key][type_field] += round_duration(entry['total_duration'])
+
+    return list(stats_dict.values())
+
+
+def monthly_stats(user, month, year):
+    """Hours per group and subject for the month, split by event type (one query)."""
+    return collect_monthly_stats(monthly_stats_query(user, month, year), month, year)
+
+
+async def amonthly_stats(user, month, year):
+    rows = [row async for row in monthly_stats_query(user, month, year)]
+    return collect_monthly_stats(rows, month, year)
+
+
+def current_period():
+    """(month, year, first moment of the month, first moment of the next one) for today."""
+    current_date = datetime.now()
+    month_start = timezone.make_aware(datetime(current_date.year, current_date.month, 1))
+    if current_date.month == 12:
+        month_end = month_start.replace(year=current_date.year + 1, month=1)
+    else:
+        month_end = month_start.replace(month=current_date.month + 1)
+    return current_date.month, current_date.year, month_start, month_end
+
+
+def parse_range(params):
+    """start/end query params (ISO date or datetime) as aware datetimes, ValueError if missing or invalid."""
+    bounds = []
+    for name in ('start', 'end'):
+        value = params.get(name) or ''
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(f'Invalid {name}')
+            parsed = datetime(day.year, day.month, day.day)
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        bounds.append(parsed)
+    if bounds[0] >= bounds[1]:
+        raise ValueError('start must be before end')
+    return bounds
+
+
+def month_events(user, month_start, month_end):
+    return Event.objects.filter(
+        user=user, start__gte=month_start, start__lt=month_end
+    ).select_related('group', 'subject').order_by('start')
+
+
+def events_in_range(user, start, end):
+    """Events overlapping [start, end), served by event_user_start_end_idx."""
+    return Event.objects.filter(
+        user=user, start__lt=end, end__gt=start
+    ).select_related('group', 'subject').order_by('start')
+
+
 class StatsViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = MonthlyStatsSerializer
@@ -62,64 +216,114 @@ class StatsViewSet(viewsets.ViewSet):
         return self.get_monthly_stats(request, month, year)
 
     def get_monthly_stats(self, request, month, year):
-        duration = ExpressionWrapper(F('end') - F('start'), output_field=DurationField())
+        serializer = MonthlyStatsSerializer(monthly_stats(request.user, month, year), many=True)
+        return Response(serializer.data)
 
-        events = Event.objects.filter(
-            user=request.user,
-            start__month=month,
-            start__year=year
-        ).annotate(
-            duration=duration,
-            month=ExtractMonth('start'),
-            year=ExtractYear('start')
-        )
 
-        stats = events.values(
-            'group',
-            'group__name',
-            'subject',
-            'subject__name',
-            'type'
-        ).annotate(
-            total_duration=Sum('duration')
+class BootstrapView(APIView):
+    """Everything the dashboard needs after login in one request.
+
+    User, subjects, groups, plans, the current month's events and stats:
+    a fixed number of queries however much data the user has.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        month, year, month_start, month_end = current_period()
+        events = month_events(user, month_start, month_end)
+        context = {'request': request}
+        return Response({
+            'user': UserSerializer(user).data,
+            'subjects': SubjectSerializer(Subject.objects.filter(user=user), many=True, context=context).data,
+            'groups': GroupSerializer(Group.objects.filter(user=user), many=True, context=context).data,
+            'plans': PlanSerializer(
+                Plan.objects.filter(user=user).select_related('group', 'subject'), many=True, context=context
+            ).data,
+            'events': EventSerializer(events, many=True, context=context).data,
+            'stats': MonthlyStatsSerializer(monthly_stats(user, month, year), many=True).data,
+            'period': {
+                'month': month,
+                'year': year,
+                'start': month_start.isoformat(),
+                'end': month_end.isoformat(),
+            },
+        })
+
+
+class DepartmentLoadView(APIView):
+    """Staff only: hours of every teacher per group, subject and type for an academic year (?year=2025)."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        try:
+            year = int(request.query_params.get('year') or current_academic_year())
+        except ValueError:
+            return Response({'message': 'Invalid year'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(department_load(year))
+
+
+class ScheduleView(APIView):
+    """Generated timetable for the user's plans: preview it, then commit the same parameters.
+
+    Commit generates the schedule again against the current data and
+    inserts it in one bulk write, the events then go to Google through a
+    calendar backfill.
+    """
+    permission_classes = [IsAuthenticated]
+    commit = False
+
+    def post(self, request):
+        params = ScheduleRequestSerializer(data=request.data, context={'request': request})
+        params.is_valid(raise_exception=True)
+        if not self.commit:
+            sessions, unplaced = self.generate(request.user, params.validated_data)
+            return Response({
+                'events': [self.session_data(session) for session in sessions],
+                'unplaced': self.unplaced_data(unplaced),
+            })
+
+        try:
+            with transaction.atomic():
+                sessions, unplaced = self.generate(request.user, params.validated_data)
+                events = Event.objects.bulk_create(session_events(request.user, sessions), batch_size=1000)
+                transaction.on_commit(lambda: self.push_to_google(request.user))
+        except IntegrityError as e:
+            if not is_overlap_violation(e):
+                raise
+            return Response(
+                {'message': 'Events were added meanwhile, preview the schedule again.'}, status=status.HTTP_409_CONFLICT
+            )
+        return Response({
+            'events': EventSerializer(events, many=True, context={'request': request}).data,
+            'unplaced': self.unplaced_data(unplaced),
+        }, status=status.HTTP_201_CREATED)
+
+    def generate(self, user, data):
+        return generate_schedule(
+            user, data['start_date'], data['end_date'], data['weekdays'], data['slots'],
+            blocked=data['blocked'], plans=data['plans'],
         )
 
-        def round_duration(td):
-            if td is None:
-                return 0
-            minutes = td.total_seconds() / 60
-            if abs(minutes - 90) < 1:  # около 90 минут
-                return 2
-            elif abs(minutes - 45) < 1:  # около 45 минут
-                return 1
-            else:
-                return minutes / 60  # точное время в часах
-
-        stats_dict = {}
-        for entry in stats:
-            group_id = entry['group']
-            subject_id = entry['subject']
-            key = (group_id, subject_id)
-
-            if key not in stats_dict:
-                stats_dict[key] = {
-                    'id': f"{group_id}_{subject_id}_{month}_{year}",
-                    'group_id': group_id,
-                    'group_name': entry['group__name'],
-                    'subject_id': subject_id,
-                    'subject_name': entry['subject__name'],
-                    'lecture_hours': 0,
-                    'practice_hours': 0,
-                    'lab_hours': 0,
-                    'other_hours': 0,
-                    'month': month,
-                    'year': year
-                }
-
-            type_field = f"{entry['type']}_hours"
-            stats_dict[key][type_field] += round_duration(entry['total_duration'])
-
-        formatted_stats = list(stats_dict.values())
-
-        serializer = MonthlyStatsSerializer(formatted_stats, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+    @staticmethod
+    def session_data(session):
+        return {
+            'plan': session.plan.id,
+            'group': session.plan.group_id,
+            'group_name': session.plan.group.name,
+            'subject': session.plan.subject_id,
+            'subject_name': session.plan.subject.name,
+            'type': session.type,
+            'start': session.start.isoformat(),
+            'end': session.end.isoformat(),
+        }
+
+    @staticmethod
+    def unplaced_data(unplaced):
+        return [{'plan': plan.id, 'type': event_type, 'sessions': count} for (plan, event_type), count in unplaced.items()]
+
+    @staticmethod
+    def push_to_google(user):
+        # bulk_create не вызывает post_save, события уходят в Google одним backfill
+        if hasattr(user, 'google_calendar') and not is_tripped(user.google_calendar):
+            backfill_new_events(user)
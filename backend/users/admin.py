@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin
 from allauth.socialaccount.models import SocialAccount
+from googlecalendar.tasks import resync_users
 
 User = get_user_model()
 
@@ -14,6 +15,7 @@ class CustomUserAdmin(UserAdmin):
     search_fields = ('email', 'username', 'first_name', 'last_name') 
     ordering = ('email',) 
     readonly_fields = ('id',) 
+    actions = ['resync_calendars']
 
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
@@ -22,4 +24,9 @@ class CustomUserAdmin(UserAdmin):
         ('Important dates', {'fields': ('last_login', 'date_joined')}),
     )
 
+    @admin.action(description='Re-sync Google calendars of selected users')
+    def resync_calendars(self, request, queryset):
+        queued, running = resync_users(queryset.values_list('id', flat=True))
+        self.message_user(request, f"Re-sync queued for {queued} users, {running} already running")
+
 admin.site.register(User, CustomUserAdmin)
@@ -1,5 +1,11 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch, get_md5_hash_password
 from django.conf import settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from .cache import cache_user, get_cached_user
 
 #Кастомный класс для получения токенов не из заголовков, а из куков
 class JWTCookieAuthentication(JWTAuthentication):
@@ -16,4 +22,31 @@ class JWTCookieAuthentication(JWTAuthentication):
                 return None
 
         validated_token = self.get_validated_token(raw_token)
-        return self.get_user(validated_token), validated_token
\ No newline at end of file
+        return self.get_user(validated_token), validated_token
+
+    def get_user(self, validated_token):
+        """Resolves the user through users.cache, the DB is hit only on a miss.
+
+        The token checks of JWTAuthentication.get_user run against the cached
+        user as well, so a deactivated user or a changed password is caught
+        as soon as the cache entry is dropped.
+        """
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        user = get_cached_user(user_id, jti)
+        if user is None:
+            user = super().get_user(validated_token)
+            expires_in = datetime_from_epoch(validated_token['exp']) - timezone.now()
+            cache_user(user, jti, ttl=int(expires_in.total_seconds()))
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
@@ -0,0 +1,134 @@
+"""Cache of authenticated users for JWTCookieAuthentication.
+
+Every API request used to load the user from the DB. Resolved users are
+kept in two tiers: a small per-process TTL cache and a shared copy in Redis
+(AUTH_USER_CACHE_BACKEND='redis'), so a request usually touches neither
+the DB nor the network. Entries are keyed by the user id and the access
+token's jti, so an entry never outlives the token it was resolved for,
+and all entries of a user are dropped on user save/delete and on logout
+(Redis keeps a set of the user's keys for that). Other processes still
+hold their local copy for up to AUTH_USER_CACHE_TTL seconds, keep it short.
+
+The password hash is never cached. It stays a deferred field on cached
+users and is loaded from the DB only if something reads it. A password
+change saves the user, which drops the cached entry anyway.
+"""
+import json
+import logging
+import threading
+from cachetools import TTLCache
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from redis.exceptions import RedisError
+from core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_local = None
+_lock = threading.RLock()
+
+# Секреты не попадают ни в память процесса, ни в Redis
+EXCLUDED_FIELDS = {'password'}
+
+
+def user_cache_key(user_id, jti):
+    return f'auth:user:{user_id}:{jti}'
+
+
+def _user_keys_key(user_id):
+    return f'auth:user:{user_id}:keys'
+
+
+def _local_cache():
+    global _local
+    if _local is None:
+        with _lock:
+            if _local is None:
+                _local = TTLCache(maxsize=settings.AUTH_USER_CACHE_SIZE, ttl=settings.AUTH_USER_CACHE_TTL)
+    return _local
+
+
+def _shared_enabled():
+    return settings.AUTH_USER_CACHE_BACKEND == 'redis'
+
+
+def _dump(user):
+    return json.dumps(
+        {f.attname: getattr(user, f.attname) for f in user._meta.concrete_fields if f.attname not in EXCLUDED_FIELDS},
+        cls=DjangoJSONEncoder,
+    )
+
+
+def _load(data):
+    model = get_user_model()
+    values = json.loads(data)
+    fields = [f for f in model._meta.concrete_fields if f.attname in values]
+    # from_db: экземпляр как загруженный из БД (_state.adding=False)
+    return model.from_db('default', [f.attname for f in fields], [f.to_python(values[f.attname]) for f in fields])
+
+
+def get_cached_user(user_id, jti):
+    """The user cached for the token `jti` or None.
+
+    A new instance every call: views and signals cache relations on
+    request.user (google_calendar etc.), those must not leak between requests.
+    """
+    if settings.AUTH_USER_CACHE_BACKEND == 'off':
+        return None
+    key = user_cache_key(user_id, jti)
+    with _lock:
+        data = _local_cache().get(key)
+    if data is None and _shared_enabled():
+        try:
+            data = get_redis().get(key)
+        except RedisError as e:
+            logger.warning(f"Auth user cache unavailable, reading user {user_id} from DB: {str(e)}")
+            return None
+        if data is not None:
+            with _lock:
+                _local_cache()[key] = data
+    return _load(data) if data is not None else None
+
+
+def cache_user(user, jti, ttl=None):
+    """Caches `user` for the token `jti`; `ttl` caps the Redis lifetime at the token's."""
+    if settings.AUTH_USER_CACHE_BACKEND == 'off':
+        return
+    key = user_cache_key(user.pk, jti)
+    data = _dump(user)
+    with _lock:
+        _local_cache()[key] = data
+    if _shared_enabled():
+        shared_ttl = settings.AUTH_USER_CACHE_SHARED_TTL
+        ttl = max(min(ttl, shared_ttl), 1) if ttl is not None else shared_ttl
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            pipe.set(key, data, ex=ttl)
+            # Ключи пользователя для invalidate_user живут не дольше самих записей
+            pipe.sadd(_user_keys_key(user.pk), key)
+            pipe.expire(_user_keys_key(user.pk), shared_ttl)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Failed to cache user {user.pk} in Redis: {str(e)}")
+
+
+def invalidate_user(user_id):
+    """Drops the user's entries for every token."""
+    prefix = user_cache_key(user_id, '')
+    with _lock:
+        local = _local_cache()
+        for key in [key for key in local.keys() if key.startswith(prefix)]:
+            local.pop(key, None)
+    if _shared_enabled():
+        try:
+            redis = get_redis()
+            keys_key = _user_keys_key(user_id)
+            redis.delete(keys_key, *redis.smembers(keys_key))
+        except RedisError as e:
+            logger.warning(f"Failed to drop cached user {user_id} from Redis: {str(e)}")
+
+
+def clear_local_cache():
+    with _lock:
+        _local_cache().clear()
@@ -0,0 +1,88 @@
+"""HTTP plumbing for the Google sign-in in GoogleOAuthCallbackView.
+
+One pooled requests.Session with timeouts for the code exchange, and a
+google-auth transport that keeps Google's ID token signing certificates
+in the process until their Cache-Control max-age runs out, instead of
+downloading them on every login.
+"""
+import re
+import threading
+import time
+import requests
+from django.conf import settings
+from google.auth.transport import requests as google_requests
+from requests.adapters import HTTPAdapter
+from core.profiling import track_google
+
+MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+_session = None
+_transport = None
+_lock = threading.Lock()
+
+
+def get_session():
+    """Shared session for the process, keeps connections to Google open between logins."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                session.mount('https://', HTTPAdapter(pool_maxsize=settings.GOOGLE_OAUTH_POOL_SIZE))
+                _session = session
+    return _session
+
+
+def cache_lifetime(headers):
+    """Seconds a response may be reused for per its Cache-Control and Age headers, 0 if not at all."""
+    cache_control = headers.get('Cache-Control', '')
+    if 'no-store' in cache_control or 'no-cache' in cache_control:
+        return 0
+    match = MAX_AGE_RE.search(cache_control)
+    if not match:
+        return 0
+    try:
+        age = int(headers.get('Age', 0))
+    except ValueError:
+        age = 0
+    return max(0, int(match.group(1)) - age)
+
+
+class CachedCertsRequest(google_requests.Request):
+    """google-auth transport over the shared session, GET responses are reused for their max-age.
+
+    The only GET made while verifying an ID token is the certificates download.
+    """
+
+    def __init__(self):
+        super().__init__(session=get_session())
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+
+    def __call__(self, url, method='GET', body=None, headers=None, timeout=None, **kwargs):
+        timeout = timeout or settings.GOOGLE_OAUTH_HTTP_TIMEOUT
+        if method != 'GET':
+            with track_google():
+                return super().__call__(url, method=method, body=body, headers=headers, timeout=timeout, **kwargs)
+
+        with self._cache_lock:
+            cached = self._cache.get(url)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        with track_google():
+            response = super().__call__(url, method=method, body=body, headers=headers, timeout=timeout, **kwargs)
+        lifetime = cache_lifetime(response.headers)
+        if response.status == 200 and lifetime:
+            with self._cache_lock:
+                self._cache[url] = (time.monotonic() + lifetime, response)
+        return response
+
+
+def get_transport():
+    global _transport
+    if _transport is None:
+        with _lock:
+            if _transport is None:
+                _transport = CachedCertsRequest()
+    return _transport
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+def copy_google_profile(apps, schema_editor):
+    """Fills User.name and User.picture from the Google account's extra_data.
+
+    Users who signed in before these columns existed only get them on their
+    next login otherwise. Values already set on the user are kept.
+    """
+    SocialAccount = apps.get_model('socialaccount', 'SocialAccount')
+    User = apps.get_model('users', 'User')
+    accounts = (
+        SocialAccount.objects.filter(provider='google')
+        .select_related('user')
+        .order_by('pk')
+    )
+    changed = []
+    for account in accounts.iterator(chunk_size=BATCH_SIZE):
+        user = account.user
+        extra_data = account.extra_data if isinstance(account.extra_data, dict) else {}
+        updated = False
+        for field in ('name', 'picture'):
+            value = extra_data.get(field)
+            if isinstance(value, str) and value and not getattr(user, field):
+                setattr(user, field, value[:User._meta.get_field(field).max_length])
+                updated = True
+        if updated:
+            changed.append(user)
+        if len(changed) >= BATCH_SIZE:
+            User.objects.bulk_update(changed, ['name', 'picture'])
+            changed = []
+    if changed:
+        User.objects.bulk_update(changed, ['name', 'picture'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_name'),
+        ('socialaccount', '0006_alter_socialaccount_extra_data'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_google_profile, migrations.RunPython.noop),
+    ]
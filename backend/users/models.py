@@ -4,6 +4,7 @@ from django.contrib.auth.models import AbstractUser
 class User(AbstractUser):
     email = models.EmailField(unique=True, db_index=True)
     picture = models.URLField(blank=True, help_text="Profile picture URL")
+    name = models.CharField(max_length=255, blank=True, help_text="Display name from the Google profile")
     is_email_verified = models.BooleanField(default=True, help_text="Verification status")
 
     USERNAME_FIELD = 'email'
@@ -0,0 +1,14 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .cache import invalidate_user
+
+User = get_user_model()
+
+
+# Любое сохранение (в т.ч. is_active, смена пароля, last_login) сбрасывает закешированного пользователя.
+# QuerySet.update() сигналов не шлет - после него нужен явный invalidate_user
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
@@ -0,0 +1,25 @@
+import logging
+from celery import shared_task
+from redis.exceptions import RedisError
+from .tokens import flush_expired_tokens, sync_token_blacklist
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def prune_expired_tokens():
+    deleted = flush_expired_tokens()
+    logger.info(f"Pruned {deleted} expired refresh tokens")
+    return deleted
+
+
+@shared_task
+def sync_token_blacklist_task():
+    try:
+        copied = sync_token_blacklist()
+    except RedisError as e:
+        # Без маркера проверки и так идут в БД
+        logger.warning(f"Failed to sync token blacklist to Redis: {str(e)}")
+        return 0
+    logger.info(f"Synced {copied} blacklisted tokens to Redis")
+    return copied
@@ -1,3 +1,252 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from importlib import import_module
+from unittest import mock
+import requests
+from allauth.socialaccount.models import SocialAccount, SocialApp
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from redis.exceptions import RedisError
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from .authentication import JWTCookieAuthentication
+from .cache import _local_cache, clear_local_cache, get_cached_user, invalidate_user, user_cache_key
+from .google_oauth import CachedCertsRequest, cache_lifetime
+from .serializers import UserSerializer
+from .tasks import prune_expired_tokens
+from .tokens import READY_KEY, CachedRefreshToken
+from .views.auth import _handle_user_profile
 
-# Create your tests here.
+User = get_user_model()
+
+
+@override_settings(AUTH_USER_CACHE_BACKEND='memory')
+class AuthUserCacheTests(TestCase):
+    def setUp(self):
+        clear_local_cache()
+        self.addCleanup(clear_local_cache)
+        self.user = User.objects.create_user(username='teacher', email='teacher@example.com', password='secret')
+        self.token = AccessToken.for_user(self.user)
+        self.auth = JWTCookieAuthentication()
+        self.factory = APIRequestFactory()
+
+    def authenticate(self, token=None):
+        request = self.factory.get('/api/auth/user/')
+        request.COOKIES['access_token'] = str(token or self.token)
+        return self.auth.authenticate(request)[0]
+
+    def cached_user(self):
+        return get_cached_user(self.user.pk, self.token['jti'])
+
+    def test_second_request_skips_db(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.email, 'teacher@example.com')
+        self.assertFalse(user._state.adding)
+
+    def test_entries_are_per_token(self):
+        self.authenticate()
+        with self.assertNumQueries(1):
+            self.authenticate(AccessToken.for_user(self.user))
+        invalidate_user(self.user.pk)
+        self.assertEqual(len(_local_cache()), 0)
+
+    def test_password_hash_is_not_cached(self):
+        self.authenticate()
+        self.assertNotIn('password', json.loads(_local_cache()[user_cache_key(self.user.pk, self.token['jti'])]))
+
+        user = self.authenticate()
+        self.assertIn('password', user.get_deferred_fields())
+        user.first_name = 'Changed'
+        user.save()
+        user.refresh_from_db()
+        self.assertTrue(user.check_password('secret'))
+
+    def test_cached_user_is_a_new_instance_each_time(self):
+        first = self.authenticate()
+        first.first_name = 'Changed'
+        self.assertEqual(self.authenticate().first_name, '')
+
+    def test_save_drops_cached_user(self):
+        self.authenticate()
+        self.user.first_name = 'Anna'
+        self.user.save()
+        self.assertIsNone(self.cached_user())
+        self.assertEqual(self.authenticate().first_name, 'Anna')
+
+    def test_deactivated_user_is_rejected(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_cached_inactive_user_is_rejected(self):
+        self.authenticate()
+        # update() без сигналов: в кеше остается активный пользователь, пока его не сбросят
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.authenticate()
+        invalidate_user(self.user.pk)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_delete_drops_cached_user(self):
+        self.authenticate()
+        user_id, jti = self.user.pk, self.token['jti']
+        self.user.delete()
+        self.assertIsNone(get_cached_user(user_id, jti))
+
+    def test_logout_drops_cached_user(self):
+        self.authenticate()
+        self.client.cookies['access_token'] = str(self.token)
+        self.client.cookies['refresh_token'] = str(RefreshToken.for_user(self.user))
+        response = self.client.post('/api/auth/logout/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(self.cached_user())
+
+    @override_settings(AUTH_USER_CACHE_BACKEND='off')
+    def test_cache_can_be_disabled(self):
+        self.authenticate()
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+
+class UserProfileTests(TestCase):
+    def test_google_profile_is_copied_onto_user(self):
+        user = User.objects.create(username='t@example.com', email='t@example.com')
+        _handle_user_profile(user, {'name': 'Anna Teacher', 'picture': 'https://example.com/a.png'})
+        user.refresh_from_db()
+        self.assertEqual(user.name, 'Anna Teacher')
+        self.assertEqual(user.picture, 'https://example.com/a.png')
+
+    def test_migration_copies_profile_from_social_account(self):
+        migration = import_module('users.migrations.0003_backfill_google_profile')
+        user = User.objects.create(username='t@example.com', email='t@example.com')
+        named = User.objects.create(username='n@example.com', email='n@example.com', name='Kept Name')
+        SocialAccount.objects.create(user=user, provider='google', uid='1', extra_data={
+            'name': 'Anna Teacher', 'picture': 'https://example.com/a.png',
+        })
+        SocialAccount.objects.create(user=named, provider='google', uid='2', extra_data={'name': 'Google Name'})
+
+        migration.copy_google_profile(apps, None)
+
+        user.refresh_from_db()
+        named.refresh_from_db()
+        self.assertEqual((user.name, user.picture), ('Anna Teacher', 'https://example.com/a.png'))
+        self.assertEqual((named.name, named.picture), ('Kept Name', ''))
+
+    def test_serializer_makes_no_queries(self):
+        user = User.objects.create(username='t@example.com', email='t@example.com', name='Anna Teacher')
+        with self.assertNumQueries(0):
+            data = UserSerializer(user).data
+        self.assertEqual(data['name'], 'Anna Teacher')
+
+
+class RefreshTokenBlacklistTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='t@example.com', email='t@example.com')
+
+    def refresh(self, token):
+        self.client.cookies['refresh_token'] = str(token)
+        return self.client.post('/api/auth/refresh/')
+
+    def test_rotated_token_is_rejected(self):
+        token = CachedRefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(token).status_code, 200)
+        self.assertEqual(self.refresh(token).status_code, 400)
+
+    def test_redis_answer_skips_db(self):
+        token = CachedRefreshToken.for_user(self.user)
+        with mock.patch('users.tokens.is_blacklisted', return_value=False), self.assertNumQueries(0):
+            token.check_blacklist()
+        with mock.patch('users.tokens.is_blacklisted', return_value=True), self.assertRaises(TokenError):
+            token.check_blacklist()
+
+    def test_falls_back_to_db_without_redis_answer(self):
+        token = CachedRefreshToken.for_user(self.user)
+        token.blacklist()
+        with mock.patch('users.tokens.is_blacklisted', return_value=None), self.assertRaises(TokenError):
+            token.check_blacklist()
+
+    def test_failed_redis_write_drops_ready_marker(self):
+        token = CachedRefreshToken.for_user(self.user)
+        redis = mock.Mock()
+        redis.set.side_effect = RedisError('read only')
+        with mock.patch('users.tokens.get_redis', return_value=redis):
+            token.blacklist()
+        redis.delete.assert_called_once_with(READY_KEY)
+        self.assertTrue(BlacklistedToken.objects.filter(token__jti=token['jti']).exists())
+
+    def test_prune_deletes_expired_tokens_in_batches(self):
+        now = timezone.now()
+        for i in range(5):
+            token = OutstandingToken.objects.create(
+                user=self.user, jti=f'expired-{i}', token='x', created_at=now - timedelta(days=8),
+                expires_at=now - timedelta(days=1),
+            )
+            BlacklistedToken.objects.create(token=token)
+        CachedRefreshToken.for_user(self.user)
+        with self.settings(AUTH_TOKEN_PRUNE_BATCH_SIZE=2):
+            self.assertEqual(prune_expired_tokens(), 5)
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+class GoogleOAuthTests(TestCase):
+    def certs_response(self, cache_control):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{}'
+        response.headers['Cache-Control'] = cache_control
+        return response
+
+    def test_cache_lifetime(self):
+        self.assertEqual(cache_lifetime({'Cache-Control': 'public, max-age=300', 'Age': '100'}), 200)
+        self.assertEqual(cache_lifetime({'Cache-Control': 'no-store, max-age=300'}), 0)
+        self.assertEqual(cache_lifetime({}), 0)
+
+    def test_certs_are_fetched_once_while_fresh(self):
+        transport = CachedCertsRequest()
+        with mock.patch.object(transport.session, 'request', return_value=self.certs_response('public, max-age=300')) as get:
+            transport('https://www.googleapis.com/oauth2/v1/certs')
+            transport('https://www.googleapis.com/oauth2/v1/certs')
+        self.assertEqual(get.call_count, 1)
+
+    def test_uncacheable_certs_are_fetched_every_time(self):
+        transport = CachedCertsRequest()
+        with mock.patch.object(transport.session, 'request', return_value=self.certs_response('no-cache')) as get:
+            transport('https://www.googleapis.com/oauth2/v1/certs')
+            transport('https://www.googleapis.com/oauth2/v1/certs')
+        self.assertEqual(get.call_count, 2)
+
+    @mock.patch('users.views.auth.create_google_calendar_task.delay')
+    @mock.patch('users.views.auth._handle_user_info_from_id_token')
+    @mock.patch('users.views.auth._handle_google_tokens_exchange')
+    def test_login_queues_calendar_setup(self, exchange, idinfo, delay):
+        SocialApp.objects.create(provider='google', name='Google', client_id='id', secret='secret')
+        exchange.return_value = {'access_token': 'a', 'refresh_token': 'r', 'id_token': 'i', 'expires_in': 3600}
+        idinfo.return_value = {'email': 'new@example.com', 'sub': '1', 'name': 'New Teacher'}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/google/', {'code': 'code'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        user = User.objects.get(email='new@example.com')
+        delay.assert_called_once_with(user_id=user.id)
+
+    @mock.patch('users.views.auth.create_google_calendar_task.delay', side_effect=ConnectionError('broker down'))
+    @mock.patch('users.views.auth._handle_user_info_from_id_token')
+    @mock.patch('users.views.auth._handle_google_tokens_exchange')
+    def test_login_succeeds_when_broker_is_down(self, exchange, idinfo, delay):
+        SocialApp.objects.create(provider='google', name='Google', client_id='id', secret='secret')
+        exchange.return_value = {'access_token': 'a', 'refresh_token': 'r', 'id_token': 'i', 'expires_in': 3600}
+        idinfo.return_value = {'email': 'new@example.com', 'sub': '1', 'name': 'New Teacher'}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/google/', {'code': 'code'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        delay.assert_called_once()
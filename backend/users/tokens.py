@@ -0,0 +1,161 @@
+"""Refresh tokens with the simplejwt blacklist mirrored into Redis.
+
+With ROTATE_REFRESH_TOKENS every refresh blacklists the old token, so the
+blacklist tables grow with every active session and are read on every
+refresh. Blacklisted jtis are also written to Redis as keys that expire
+together with the token, and checks read Redis first.
+
+A missing key only means "not blacklisted" while the ready marker is set:
+sync_token_blacklist sets it after copying the DB blacklist to Redis and
+renews it every run. Without the marker (task not running, Redis flushed)
+or with Redis down, checks go to the DB. A jti that can't be written
+drops the marker too, so checks go to the DB until the next full copy.
+Redis must not evict keys
+(maxmemory-policy noeviction, as the Celery broker needs anyway).
+"""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from redis.exceptions import RedisError
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+from core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+READY_KEY = 'auth:blacklist:ready'
+
+
+def blacklist_key(jti):
+    return f'auth:blacklist:{jti}'
+
+
+def remember_blacklisted(jti, expires_at):
+    ttl = int((expires_at - timezone.now()).total_seconds()) + 1
+    if ttl <= 0:
+        return
+    redis = get_redis()
+    try:
+        redis.set(blacklist_key(jti), 1, ex=ttl)
+    except RedisError as e:
+        # Без этого jti Redis отвечал бы "не в blacklist": снимаем маркер, проверки идут в БД,
+        # пока sync_token_blacklist не скопирует blacklist целиком
+        logger.warning(f"Failed to mirror blacklisted token {jti} to Redis, dropping ready marker: {str(e)}")
+        try:
+            redis.delete(READY_KEY)
+        except RedisError as e:
+            logger.error(f"Failed to drop token blacklist ready marker: {str(e)}")
+
+
+def is_blacklisted(jti):
+    """True/False from Redis, None if Redis can't answer and the DB has to."""
+    if not settings.AUTH_TOKEN_BLACKLIST_CACHE:
+        return None
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.exists(blacklist_key(jti))
+        pipe.exists(READY_KEY)
+        blacklisted, ready = pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Token blacklist cache unavailable, checking DB: {str(e)}")
+        return None
+    if blacklisted:
+        return True
+    return False if ready else None
+
+
+def sync_token_blacklist(full=False):
+    """Copies unexpired blacklisted jtis to Redis and renews the ready marker.
+
+    Without the marker (first run, Redis flushed) the whole blacklist is
+    copied, otherwise only the tokens blacklisted since the previous runs.
+    Returns the number of jtis copied.
+    """
+    interval = settings.AUTH_TOKEN_BLACKLIST_SYNC_INTERVAL
+    redis = get_redis()
+    full = full or not redis.exists(READY_KEY)
+    now = timezone.now()
+    tokens = BlacklistedToken.objects.filter(token__expires_at__gt=now)
+    if not full:
+        tokens = tokens.filter(blacklisted_at__gte=now - timedelta(seconds=2 * interval))
+
+    copied = 0
+    pipe = redis.pipeline(transaction=False)
+    for jti, expires_at in tokens.values_list('token__jti', 'token__expires_at').iterator(chunk_size=2000):
+        pipe.set(blacklist_key(jti), 1, ex=int((expires_at - now).total_seconds()) + 1)
+        copied += 1
+        if copied % 2000 == 0:
+            pipe.execute()
+    # Маркер живет три интервала: если задача перестанет запускаться, проверки уйдут в БД
+    pipe.set(READY_KEY, 1, ex=3 * interval)
+    pipe.execute()
+    return copied
+
+
+def flush_expired_tokens(batch_size=None):
+    """Deletes expired outstanding tokens (and their blacklist rows) in batches.
+
+    Like simplejwt's flushexpiredtokens, but in short transactions, so a
+    large backlog doesn't lock the tables. Returns the number of tokens deleted.
+    """
+    batch_size = batch_size or settings.AUTH_TOKEN_PRUNE_BATCH_SIZE
+    expired = OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+    deleted = 0
+    while True:
+        ids = list(expired.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        BlacklistedToken.objects.filter(token_id__in=ids).delete()
+        OutstandingToken.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+    return deleted
+
+
+class CachedRefreshToken(RefreshToken):
+    """RefreshToken whose blacklist checks and writes go through Redis."""
+
+    def check_blacklist(self):
+        blacklisted = is_blacklisted(self.payload[api_settings.JTI_CLAIM])
+        if blacklisted is None:
+            return super().check_blacklist()
+        if blacklisted:
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        # Как RefreshToken.blacklist, но пользователь загружается один раз на токен
+        token, _ = self._outstanding_token()
+        result = BlacklistedToken.objects.get_or_create(token=token)
+        if settings.AUTH_TOKEN_BLACKLIST_CACHE:
+            remember_blacklisted(self.payload[api_settings.JTI_CLAIM], datetime_from_epoch(self.payload['exp']))
+        return result
+
+    def outstand(self):
+        return self._outstanding_token()[0]
+
+    def _outstanding_token(self):
+        return OutstandingToken.objects.get_or_create(
+            jti=self.payload[api_settings.JTI_CLAIM],
+            defaults={
+                'user': self._user(),
+                'created_at': self.current_time,
+                'token': str(self),
+                'expires_at': datetime_from_epoch(self.payload['exp']),
+            },
+        )
+
+    def _user(self):
+        """Token owner, loaded once: rotation blacklists and outstands the same token.
+
+        Not through users.cache: its entries are per access token jti.
+        """
+        if not hasattr(self, '_owner'):
+            user_id = self.payload.get(api_settings.USER_ID_CLAIM)
+            User = get_user_model()
+            self._owner = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        return self._owner
@@ -1,17 +1,21 @@
 import logging
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenRefreshView
 from rest_framework.views import APIView
 from allauth.socialaccount.models import SocialAccount, SocialToken, SocialApp
 from dj_rest_auth.registration.views import SocialLoginView
 from dj_rest_auth.views import LogoutView
 from ..mixins import JWTCookieMixin
+from ..cache import invalidate_user
+from ..tokens import CachedRefreshToken
+from ..google_oauth import get_session, get_transport
+from core.profiling import track_google
 import requests as pyrequests
 from ..serializers import UserSerializer
 from google.oauth2 import id_token
@@ -32,9 +36,9 @@ def _handle_social_app(provider='google'):
 def _handle_user_info_from_id_token(id_token_str, client_id):
     """Helper function to get user information from the ID token."""
     from google.oauth2 import id_token as google_id_token
-    from google.auth.transport import requests as google_requests
     try:
-        return google_id_token.verify_oauth2_token(id_token_str, google_requests.Request(), client_id)
+        # Транспорт с кешем сертификатов Google: они не скачиваются заново при каждом входе
+        return google_id_token.verify_oauth2_token(id_token_str, get_transport(), client_id)
     except ValueError as e:
         logger.error(f'Invalid ID token: {e}')
         return None
@@ -47,6 +51,15 @@ def _handle_social_account(user, idinfo, provider='google'):
         defaults={'uid': idinfo.get('sub'), 'extra_data': idinfo}
     )
 
+def _handle_user_profile(user, idinfo):
+    """Helper function to copy the Google profile (name, picture) onto the User."""
+    profile = {'name': idinfo.get('name', ''), 'picture': idinfo.get('picture', '')}
+    changed = [field for field, value in profile.items() if value and getattr(user, field) != value]
+    for field in changed:
+        setattr(user, field, profile[field])
+    if changed:
+        user.save(update_fields=changed)
+
 def _handle_social_token(social_account, app, access_token, refresh_token, expires_at):
     """Helper function to update or create the SocialToken."""
     SocialToken.objects.update_or_create(
@@ -61,7 +74,7 @@ def _handle_social_token(social_account, app, access_token, refresh_token, expir
 
 def _handle_jwt_response(user):
     """Helper function to generate the JWT response."""
-    refresh = RefreshToken.for_user(user)
+    refresh = CachedRefreshToken.for_user(user)
     return {
         'user': UserSerializer(user).data,
         'token': str(refresh.access_token),
@@ -80,13 +93,18 @@ def _handle_google_tokens_exchange(code, social_app):
         "grant_type": "authorization_code"
     }
     try:
-        token_resp = pyrequests.post(token_url, data=data)
+        with track_google():
+            token_resp = get_session().post(token_url, data=data, timeout=settings.GOOGLE_OAUTH_HTTP_TIMEOUT)
         token_resp.raise_for_status()  # Raise an exception for bad status codes
         return token_resp.json()
     except pyrequests.exceptions.RequestException as e:
         logger.error(f"Failed to exchange code for tokens: {e}")
         return None
 
+def _dispatch_google_setup(user_id):
+    create_google_calendar_task.delay(user_id=user_id)
+    logger.info(f"Celery task 'create_google_calendar_task' dispatched for user {user_id}")
+
 class GoogleOAuthCallbackView(JWTCookieMixin, APIView):
     permission_classes = [AllowAny]
 
@@ -123,6 +141,7 @@ class GoogleOAuthCallbackView(JWTCookieMixin, APIView):
                 'is_email_verified': idinfo.get('email_verified', False),
             }
         )
+        _handle_user_profile(user, idinfo)
 
         social_account, _ = _handle_social_account(user, idinfo)
         _handle_social_token(social_account, social_app, access_token, refresh_token, expires_at)
@@ -132,9 +151,9 @@ class GoogleOAuthCallbackView(JWTCookieMixin, APIView):
  
         response = self.set_jwt_cookies(response, jwt_data['token'], jwt_data['refresh'])
 
-        create_google_calendar_task.delay(user.id)
-        logger.info(f"Celery task 'create_google_calendar_task' dispatched for user {user.id}")
-
+        # Сброс circuit breaker и создание календаря - в задаче, публикуем ее после коммита токенов.
+        # robust: недоступный брокер пишется в лог, но не ломает вход
+        transaction.on_commit(lambda: _dispatch_google_setup(user.id), robust=True)
         return response
 
 
@@ -168,8 +187,9 @@ class CookieLogoutView(LogoutView):
         try:
             refresh_token = request.COOKIES.get(settings.SIMPLE_JWT['AUTH_COOKIE_REFRESH'])
             if refresh_token:
-                token = RefreshToken(refresh_token)
+                token = CachedRefreshToken(refresh_token)
                 token.blacklist()
+            invalidate_user(request.user.id)
             response = Response({'message': 'Successfully logged out'}, status=status.HTTP_200_OK)
             response.delete_cookie(
                 settings.SIMPLE_JWT['AUTH_COOKIE'],
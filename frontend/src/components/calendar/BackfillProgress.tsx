@@ -0,0 +1,44 @@
+import React from 'react';
+import { RefreshCw, AlertCircle } from 'lucide-react';
+import { useBackfillProgress } from '../../hooks/useApi';
+
+// Отправка существующих событий в только что подключенный Google Calendar
+export const BackfillProgress: React.FC = () => {
+  const { data } = useBackfillProgress();
+  const backfill = data?.data;
+
+  if (!backfill || backfill.status === 'done') {
+    return null;
+  }
+
+  if (backfill.status === 'failed') {
+    return (
+      <div className="flex items-center gap-3 mb-8 rounded-lg border border-error-200 dark:border-error-800 bg-error-50 dark:bg-error-900/20 p-4 text-sm text-error-700 dark:text-error-400">
+        <AlertCircle className="h-5 w-5 flex-shrink-0" />
+        <span>
+          Google Calendar sync stopped after {backfill.pushed} of {backfill.total} events
+          {backfill.error && `: ${backfill.error}`}
+        </span>
+      </div>
+    );
+  }
+
+  return (
+    <div className="mb-8 rounded-lg border border-gray-200/50 dark:border-gray-700/50 bg-white/80 dark:bg-gray-800/80 backdrop-blur-sm p-4">
+      <div className="flex items-center gap-3 text-sm text-gray-700 dark:text-gray-300">
+        <RefreshCw className="h-5 w-5 flex-shrink-0 animate-spin text-primary-600 dark:text-primary-400" />
+        <span>
+          {backfill.status === 'pending'
+            ? 'Preparing to copy your events to Google Calendar...'
+            : `Copying your events to Google Calendar: ${backfill.pushed} of ${backfill.total}`}
+        </span>
+      </div>
+      <div className="mt-3 h-2 rounded-full bg-gray-200 dark:bg-gray-700 overflow-hidden">
+        <div
+          className="h-full bg-gradient-to-r from-primary-600 to-primary-500 transition-all duration-500"
+          style={{ width: `${backfill.percent}%` }}
+        />
+      </div>
+    </div>
+  );
+};
@@ -1,5 +1,6 @@
 import React, { createContext, useContext, useState, useEffect, ReactNode, useRef } from 'react';
-import { User, AuthContextType } from '../types';
+import { useQueryClient } from 'react-query';
+import { User, AuthContextType, Bootstrap, BootstrapPeriod } from '../types';
 import { authApi } from '../services/api';
 import toast from 'react-hot-toast';
 
@@ -12,6 +13,7 @@ interface AuthProviderProps {
 export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
   const [user, setUser] = useState<User | null>(null);
   const [isLoading, setIsLoading] = useState(true);
+  const [period, setPeriod] = useState<BootstrapPeriod | null>(null);
 
   // Флаг для предотвращения параллельных вызовов getUser
   const isCheckingAuth = useRef(false);
@@ -19,14 +21,29 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
   const refreshIntervalRef = useRef<NodeJS.Timeout | null>(null);
   // Флаг монтирования компонента
   const isMounted = useRef(true);
+  const queryClient = useQueryClient();
+
+  // Кладем данные из /api/bootstrap/ в кеш react-query под ключами хуков из useApi,
+  // чтобы дашборд не запрашивал их по отдельности
+  const loadSession = async (): Promise<User> => {
+    const { data }: { data: Bootstrap } = await authApi.bootstrap();
+    queryClient.setQueryData('subjects', { data: data.subjects });
+    queryClient.setQueryData('groups', { data: data.groups });
+    queryClient.setQueryData('plans', { data: data.plans });
+    queryClient.setQueryData(['events', data.period.start, data.period.end], { data: data.events });
+    queryClient.setQueryData(['stats', data.period.month, data.period.year], { data: data.stats });
+    // Ключ событий совпадает, только если дашборд запросит тот же start/end: отдаем ему период
+    setPeriod(data.period);
+    return data.user;
+  };
 
   const checkAuth = async () => {
     if (isCheckingAuth.current) return; 
     isCheckingAuth.current = true;
 
     try {
-      const response = await authApi.getUser();
-      if (isMounted.current) setUser(response.data);
+      const sessionUser = await loadSession();
+      if (isMounted.current) setUser(sessionUser);
     } catch (error) {
       if (isMounted.current) setUser(null);
     } finally {
@@ -69,8 +86,7 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
     try {
       setIsLoading(true);
       await authApi.googleLogin(code);
-      const response = await authApi.getUser();
-      setUser(response.data);
+      setUser(await loadSession());
       startTokenRefresh();
       toast.success('Welcome back!');
     } catch (error) {
@@ -88,6 +104,7 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
       toast.error('Logout failed');
     } finally {
       if (refreshIntervalRef.current) clearInterval(refreshIntervalRef.current);
+      queryClient.clear();
       setUser(null);
     }
   };
@@ -97,6 +114,7 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
       user,
       isAuthenticated: !!user,
       isLoading,
+      period,
       login,
       logout
     }}>
@@ -1,7 +1,7 @@
 import { useQuery, useMutation, useQueryClient } from 'react-query';
-import { subjectsApi, groupsApi, eventsApi, statsApi, plansApi } from '../services/api';
+import { subjectsApi, groupsApi, eventsApi, statsApi, plansApi, syncApi } from '../services/api';
 import type {Subject, Group, Event, MonthlyStats, ApiResponse, ApiError, CreateSubjectDto, UpdateSubjectDto, CreateGroupDto, UpdateGroupDto,
-  CreateEventDto, UpdateEventDto, CreatePlanDto, UpdatePlanDto, Plan} from '../types';
+  CreateEventDto, UpdateEventDto, CreatePlanDto, UpdatePlanDto, Plan, CalendarBackfill} from '../types';
 
 export const useSubjects = () => {
   return useQuery<ApiResponse<Subject[]>, ApiError>(
@@ -118,6 +118,8 @@ export const useEvents = (start?: string, end?: string) => {
       cacheTime: 5 * 60 * 1000, // Cache for 5 minutes
       refetchOnMount: true,
       refetchOnWindowFocus: false,
+      // При переходе на другой месяц показываем прежние события, пока грузятся новые
+      keepPreviousData: true,
     }
   );
 };
@@ -164,4 +166,18 @@ export const useMonthlyStats = (month?: number, year?: number) => {
       enabled: !!(month !== undefined && year !== undefined),
     }
   );
-};
\ No newline at end of file
+};
+
+// Google Calendar sync hooks
+export const useBackfillProgress = () => {
+  return useQuery<ApiResponse<CalendarBackfill | null>, ApiError>(
+    'backfill',
+    () => syncApi.getBackfillProgress(),
+    {
+      // Опрашиваем, пока события отправляются в только что подключенный календарь
+      refetchInterval: (result) =>
+        result?.data && ['pending', 'running'].includes(result.data.status) ? 2000 : false,
+      refetchOnWindowFocus: false,
+    }
+  );
+};
@@ -4,8 +4,9 @@ import { Button } from '../../components/ui/Button';
 import { useAuth } from '../../contexts/AuthContext';
 import Calendar from '../../components/calendar/Calendar';
 import EventModal from '../../components/calendar/EventModal';
-import { Event, CreateEventDto } from '../../types';
-import { format, isSameDay, parseISO } from 'date-fns';
+import { BackfillProgress } from '../../components/calendar/BackfillProgress';
+import { Event, CreateEventDto, BootstrapPeriod } from '../../types';
+import { addMonths, format, isSameDay, parseISO, startOfMonth } from 'date-fns';
 import toast from 'react-hot-toast';
 import { LoadingCard } from '../../components/ui/LoadingCard';
 import { useEvents, useEventMutations } from '../../hooks/useApi';
@@ -13,8 +14,18 @@ import { parseApiValidationError } from '../../utils/apiError';
 
 const ITEMS_PER_PAGE = 5;
 
+// Диапазон месяца выбранной даты. Для месяца из /api/bootstrap/ - те же строки start/end,
+// что и в ключе кеша, положенном AuthContext, чтобы события не запрашивались повторно
+const monthRange = (date: Date, period: BootstrapPeriod | null): [string, string] => {
+  if (period && date.getMonth() + 1 === period.month && date.getFullYear() === period.year) {
+    return [period.start, period.end];
+  }
+  const isoFormat = "yyyy-MM-dd'T'HH:mm:ssxxx";
+  return [format(startOfMonth(date), isoFormat), format(startOfMonth(addMonths(date, 1)), isoFormat)];
+};
+
 const DashboardPage: React.FC = () => {
-  const { user } = useAuth();
+  const { user, period } = useAuth();
   const [selectedDate, setSelectedDate] = useState<Date>(new Date());
   const [calendarView, setCalendarView] = useState<'month' | 'week' | 'day'>('month');
   const [isEventModalOpen, setIsEventModalOpen] = useState(false);
@@ -23,7 +34,8 @@ const DashboardPage: React.FC = () => {
   const [currentPage, setCurrentPage] = useState(0);
   const [validationErrors, setValidationErrors] = useState<Record<string, string>>({});
 
-  const { data: events, isLoading } = useEvents();
+  const [rangeStart, rangeEnd] = monthRange(selectedDate, period);
+  const { data: events, isLoading } = useEvents(rangeStart, rangeEnd);
   const { createEvent, updateEvent, deleteEvent } = useEventMutations();
   
   const handleEventClick = (event: Event) => {
@@ -118,6 +130,8 @@ const DashboardPage: React.FC = () => {
           <p className="text-gray-600 dark:text-gray-400 mt-1">Here's your teaching dashboard</p>
         </div>
 
+        <BackfillProgress />
+
         <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-4 gap-6 mb-8">
           <div className="group bg-gradient-to-br from-white to-gray-50/50 dark:from-gray-800 dark:to-gray-900/50 backdrop-blur-sm rounded-lg shadow-sm border border-gray-200/50 dark:border-gray-700/50 p-6 transition-all duration-300 hover:shadow-lg hover:shadow-primary-500/5 dark:hover:shadow-primary-500/10 hover:border-primary-300 dark:hover:border-primary-600">
             <div className="flex items-center">
@@ -139,7 +153,7 @@ const DashboardPage: React.FC = () => {
                 <Clock className="h-6 w-6 text-secondary-600 dark:text-secondary-400" />
               </div>
               <div className="ml-4">
-                <h2 className="text-sm font-medium text-gray-500 dark:text-gray-400">Total Events</h2>
+                <h2 className="text-sm font-medium text-gray-500 dark:text-gray-400">Events This Month</h2>
                 <p className="text-2xl font-semibold bg-clip-text text-transparent bg-gradient-to-r from-secondary-600 to-secondary-500">
                   {events?.data?.length || 0}
                 </p>
@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { ApiResponse, User, Subject, Group, Event, Plan, CreatePlanDto, UpdatePlanDto, CreateEventDto } from '../types';
+import { ApiResponse, User, Subject, Group, Event, Plan, CreatePlanDto, UpdatePlanDto, CreateEventDto, CalendarBackfill, Bootstrap } from '../types';
 
 import { handleError} from '../utils/errorHandler';
 
@@ -73,6 +73,16 @@ export const authApi = {
       throw handleError(error);
     }
   },
+
+  // Пользователь и все данные дашборда одним запросом
+  bootstrap: async (): Promise<ApiResponse<Bootstrap>> => {
+    try {
+      const response = await api.get<Bootstrap>('/api/bootstrap/');
+      return { data: response.data };
+    } catch (error) {
+      throw handleError(error);
+    }
+  },
 };
 
 export const subjectsApi = {
@@ -186,4 +196,19 @@ export const statsApi = {
   getAll: async () => api.get('/api/stats/'),
   getByMonth: async (month: number, year: number) => 
     api.get(`/api/stats/by_month/?month=${month}&year=${year}`),
-};
\ No newline at end of file
+};
+
+export const syncApi = {
+  // null, если календарь еще не подключался и backfill не запускался
+  getBackfillProgress: async (): Promise<ApiResponse<CalendarBackfill | null>> => {
+    try {
+      const response = await api.get<CalendarBackfill>('/api/sync/backfill/');
+      return { data: response.data };
+    } catch (error) {
+      if (axios.isAxiosError(error) && error.response?.status === 404) {
+        return { data: null };
+      }
+      throw handleError(error);
+    }
+  },
+};
@@ -83,10 +83,46 @@ export const MonthlyStatsSchema = z.object({
 
 export type MonthlyStats = z.infer<typeof MonthlyStatsSchema>;
 
+export const CalendarBackfillSchema = z.object({
+  id: z.number(),
+  status: z.enum(['pending', 'running', 'done', 'failed']),
+  total: z.number(),
+  pushed: z.number(),
+  failed: z.number(),
+  percent: z.number(),
+  error: z.string(),
+  created_at: z.string(),
+  started_at: z.string().nullable(),
+  finished_at: z.string().nullable(),
+});
+
+export type CalendarBackfill = z.infer<typeof CalendarBackfillSchema>;
+
+// Ответ /api/bootstrap/: все данные дашборда после входа одним запросом
+export const BootstrapSchema = z.object({
+  user: UserSchema,
+  subjects: z.array(SubjectSchema),
+  groups: z.array(GroupSchema),
+  plans: z.array(PlanSchema),
+  events: z.array(EventSchema),
+  stats: z.array(MonthlyStatsSchema),
+  period: z.object({
+    month: z.number(),
+    year: z.number(),
+    start: z.string(),
+    end: z.string(),
+  }),
+});
+
+export type Bootstrap = z.infer<typeof BootstrapSchema>;
+export type BootstrapPeriod = Bootstrap['period'];
+
 export interface AuthContextType {
   user: User | null;
   isAuthenticated: boolean;
   isLoading: boolean;
+  // Месяц, данные которого пришли с /api/bootstrap/ и уже лежат в кеше react-query
+  period: BootstrapPeriod | null;
   login: (code: string) => Promise<void>;
   logout: () => Promise<void>;
 }